@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='is_platform',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:11
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = {
+    "user_email_trgm_idx": "email",
+    "user_full_name_trgm_idx": "full_name",
+}
+
+
+def add_trigram_indexes(apps, schema_editor):
+    """PostgreSQL only: GIN trigram indexes behind the admin "contains" search."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON accounts_user USING gin (LOWER("{column}") gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_is_platform'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined', 'id'], name='accounts_us_date_jo_f42ef8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='user_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('full_name'), name='user_full_name_lower_idx'),
+        ),
+        migrations.RunPython(add_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -80,7 +81,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     otp_expired = models.DateTimeField(null=True, blank=True)
     reset_secret_key = models.UUIDField(blank=True, null=True)
     is_subscribe= models.BooleanField(default=False)
-    is_platform = models.BooleanField(default=False)
+    is_platform = models.BooleanField(default=False, db_index=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
@@ -109,6 +110,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["full_name"]
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["date_joined", "id"]),  # admin user list (keyset pages)
+            models.Index(Lower("email"), name="user_email_lower_idx"),  # admin prefix search
+            models.Index(Lower("full_name"), name="user_full_name_lower_idx"),
+        ]
+
     def __str__(self):
         return self.email
 
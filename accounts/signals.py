@@ -0,0 +1,34 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import User
+from . import user_cache
+
+
+# Platform account / referral code lookups are cached (see user_cache.py);
+# remember the stored code so a changed one stops resolving to this user
+@receiver(pre_save, sender=User)
+def remember_previous_distro_code(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_distro_code = (
+        User.objects.filter(pk=instance.pk).values_list("distro_code", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_lookups(sender, instance, **kwargs):
+    user_cache.invalidate(instance)
+
+
+# ... and so is the admin user count
+@receiver(post_save, sender=User)
+def invalidate_user_count_on_create(sender, instance, created, **kwargs):
+    if created:
+        user_cache.invalidate_count()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_count_on_delete(sender, instance, **kwargs):
+    user_cache.invalidate_count()
@@ -1,3 +1,59 @@
+from django.core.cache import cache
 from django.test import TestCase
 
+from .models import User
+from . import user_cache
+
 # Create your tests here.
+
+
+def make_user(email, **extra):
+    return User.objects.create_user(email=email, password="pass1234", full_name=email, terms_agreed=True, **extra)
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.stats.reset()
+        self.platform = make_user("platform@example.com", is_platform=True)
+        self.affiliate = make_user("affiliate@example.com")
+
+    def test_lookups_are_cached(self):
+        with self.assertNumQueries(2):
+            for _ in range(3):
+                self.assertEqual(user_cache.platform_user_id(), self.platform.pk)
+                self.assertEqual(user_cache.referrer_id(self.affiliate.distro_code), self.affiliate.pk)
+        self.assertEqual(user_cache.stats.snapshot(), {"hits": 4, "negative_hits": 0, "misses": 2, "hit_rate": 0.6667})
+
+        # the affiliate can't refer themselves
+        self.assertIsNone(user_cache.referrer_id(self.affiliate.distro_code, exclude=self.affiliate))
+
+    def test_unknown_and_malformed_codes_are_not_looked_up_twice(self):
+        with self.assertNumQueries(1):
+            for _ in range(5):
+                self.assertIsNone(user_cache.referrer_id("NOPE1234"))
+                self.assertIsNone(user_cache.referrer_id("X" * 200))
+                self.assertIsNone(user_cache.referrer_id(""))
+        self.assertEqual(user_cache.stats.negative_hits, 4)
+
+    def test_user_changes_invalidate_entries(self):
+        self.assertEqual(user_cache.platform_user_id(), self.platform.pk)
+        self.platform.is_platform = False
+        self.platform.save()
+        self.assertIsNone(user_cache.platform_user_id())
+
+        new_platform = make_user("platform2@example.com", is_platform=True)
+        self.assertEqual(user_cache.platform_user_id(), new_platform.pk)
+
+        code = self.affiliate.distro_code
+        self.assertEqual(user_cache.referrer_id(code), self.affiliate.pk)
+        self.affiliate.delete()
+        self.assertIsNone(user_cache.referrer_id(code))
+
+    def test_changed_code_stops_resolving(self):
+        old_code = self.affiliate.distro_code
+        self.assertEqual(user_cache.referrer_id(old_code), self.affiliate.pk)
+        self.affiliate.distro_code = "NEWCODE1"
+        self.affiliate.save()
+        self.assertIsNone(user_cache.referrer_id(old_code))
+        self.assertEqual(user_cache.referrer_id("NEWCODE1"), self.affiliate.pk)
@@ -0,0 +1,126 @@
+"""
+Cached user lookups for the payment hot paths.
+
+- `platform_user_id()`: the platform account credited with the platform share.
+- `referrer_id(code)`: distro_code -> user id of the affiliate.
+- `user_count()`: number of non-admin users for the admin user list.
+
+Both live in Django's cache (`USER_CACHE_ALIAS`) and are invalidated by the
+User post_save/post_delete receivers in accounts/signals.py (the user count
+only when a user is created or deleted, so it's also refreshed every
+`USER_COUNT_CACHE_TTL` seconds to pick up role changes). Unknown referral
+codes are cached too (negative entries, `USER_CACHE_NEGATIVE_TTL`) and
+malformed ones never reach the DB, so bogus codes can't hammer `User`.
+`stats.snapshot()` returns per-process hit/miss counters.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+PLATFORM_KEY = "users:platform"
+COUNT_KEY = "users:count"
+MISSING = ""  # cached "no such user" (user ids are never empty)
+MAX_CODE_LENGTH = 10  # User.distro_code max_length
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+def _cache():
+    return caches[getattr(settings, "USER_CACHE_ALIAS", "default")]
+
+
+def code_key(code):
+    return f"users:distro_code:{code}"
+
+
+def _cached(key, load):
+    value = _cache().get(key)
+    if value is not None:
+        stats.count("negative_hits" if value == MISSING else "hits")
+        return value or None
+    stats.count("misses")
+    value = load()
+    timeout = getattr(settings, "USER_CACHE_TTL", 3600) if value else getattr(settings, "USER_CACHE_NEGATIVE_TTL", 300)
+    _cache().set(key, value or MISSING, timeout)
+    return value
+
+
+def platform_user_id():
+    from .models import User
+
+    return _cached(
+        PLATFORM_KEY,
+        lambda: User.objects.filter(is_platform=True).order_by("pk").values_list("pk", flat=True).first(),
+    )
+
+
+def referrer_id(code, exclude=None):
+    """User id owning distro `code` (None if unknown, malformed or equal to `exclude`)."""
+    from .models import User
+
+    code = (code or "").strip()
+    if not code or len(code) > MAX_CODE_LENGTH:
+        return None
+    user_id = _cached(
+        code_key(code),
+        lambda: User.objects.filter(distro_code=code).values_list("pk", flat=True).first(),
+    )
+    if user_id is not None and user_id == getattr(exclude, "pk", exclude):
+        return None
+    return user_id
+
+
+def invalidate(user):
+    """Drop every entry `user` may affect (called on User save/delete)."""
+    cache = _cache()
+    for code in {user.distro_code, getattr(user, "_previous_distro_code", None)}:
+        if code:
+            cache.delete(code_key(code))
+    if user.is_platform or cache.get(PLATFORM_KEY) in (user.pk, MISSING):
+        cache.delete(PLATFORM_KEY)
+
+
+def user_count():
+    """Non-admin users, cached instead of a COUNT(*) per admin page view."""
+    from .models import User
+
+    cache = _cache()
+    count = cache.get(COUNT_KEY)
+    if count is not None:
+        stats.count("hits")
+        return count
+    stats.count("misses")
+    count = User.objects.exclude(role="admin").count()
+    cache.set(COUNT_KEY, count, getattr(settings, "USER_COUNT_CACHE_TTL", 300))
+    return count
+
+
+def invalidate_count():
+    _cache().delete(COUNT_KEY)
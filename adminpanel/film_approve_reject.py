@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from rest_framework import status
 from movie.models import Film
+from movie import feed_cache
 
 
 class FilmApproveRejectView(APIView):
@@ -43,6 +44,9 @@ class FilmApproveRejectView(APIView):
 
         film.save()
 
+        # Published/rejected films enter/leave the homepage feeds right away
+        feed_cache.bump_version()
+
         return Response({
             "status": "success",
             "message": msg,
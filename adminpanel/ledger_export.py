@@ -0,0 +1,166 @@
+"""
+Streaming ledger exports (Transaction / Withdrawal / MyFilms) for finance.
+
+Rows are read with `.values_list(...).iterator(chunk_size)` (a server-side
+cursor on PostgreSQL, fetchmany() elsewhere), encoded as CSV or NDJSON, glued
+into ~64 KB blocks and optionally gzipped on the fly, so memory stays flat no
+matter how big the ledger is.
+
+Exports run oldest first by (timestamp, id), which the (timestamp, id) indexes
+serve without a sort. To resume a broken export pass the timestamp and id of
+the last row you received: `?after=<timestamp>,<id>` / `--after` (the rest
+comes without a CSV header, ready to append; `manage.py export_ledger -o`
+appends it to the file).
+"""
+import csv
+import json
+import re
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from movie.models import MyFilms
+from movie.pagination import keyset_filter
+from subscription.models import Transaction, Withdrawal
+
+# dataset -> (model, timestamp column, exported columns; the first two are the resume key)
+EXPORTS = {
+    "transactions": (
+        Transaction, "created_at",
+        ("created_at", "id", "user_id", "film_id", "source", "tx_type", "amount", "balance_type", "status", "txn_id"),
+    ),
+    "withdrawals": (
+        Withdrawal, "requested_at",
+        ("requested_at", "id", "user_id", "amount", "status", "transaction_id", "processed_at"),
+    ),
+    "my_films": (
+        MyFilms, "start_date",
+        ("start_date", "id", "user_id", "film_id", "price", "access_type", "txn_id", "status", "end_date"),
+    ),
+}
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+BLOCK_SIZE = 64 * 1024
+
+
+def chunk_size():
+    return getattr(settings, "LEDGER_EXPORT_CHUNK_SIZE", 2000)
+
+
+# "...10:00:00 00:00": the "+" of a UTC offset pasted into a URL unencoded
+# arrives as a space
+_DECODED_PLUS = re.compile(r"(\d\d:\d\d(?::\d\d(?:\.\d+)?)?) (\d\d(?::?\d\d)?)$")
+
+
+def parse_after(after):
+    """"<timestamp>,<id>" -> (datetime, int); raises ValueError."""
+    timestamp, _, pk = (after or "").rpartition(",")
+    when = parse_datetime(_DECODED_PLUS.sub(r"\1+\2", timestamp.strip()))
+    if when is None:
+        raise ValueError("after must be '<ISO timestamp>,<id>'")
+    return when, int(pk)
+
+
+def export_rows(dataset, after=None, chunk=None):
+    """Tuples of EXPORTS[dataset] columns, oldest first, after the (timestamp, id) pair `after`."""
+    model, timestamp, columns = EXPORTS[dataset]
+    ordering = (timestamp, "id")
+    rows = model.objects.order_by(*ordering)
+    if after:
+        rows = rows.filter(keyset_filter(ordering, list(after)))
+    return rows.values_list(*columns).iterator(chunk_size=chunk or chunk_size())
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if isinstance(value, Decimal) else value
+
+
+class _Line:
+    """csv.writer target that hands back the formatted line."""
+    def write(self, line):
+        return line
+
+
+def encode(rows, columns, fmt="csv", header=True):
+    """Text lines for `rows` (CSV starts with a header line unless `header` is False)."""
+    if fmt == "csv":
+        writer = csv.writer(_Line())
+        if header:
+            yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([_cell(v) for v in row])
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, map(_cell, row))), separators=(",", ":")) + "\n"
+
+
+def blocks(lines, compress=False):
+    """Group lines into ~BLOCK_SIZE byte blocks, gzipping them if `compress`."""
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31 = gzip container
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            block = b"".join(buffer)
+            buffer, size = [], 0
+            block = gzip.compress(block) if gzip else block
+            if block:
+                yield block
+    block = b"".join(buffer)
+    if gzip:
+        block = gzip.compress(block) + gzip.flush()
+    if block:
+        yield block
+
+
+def export(dataset, fmt="csv", compress=False, after=None, chunk=None):
+    """Byte blocks of a whole export; a resumed one (`after`) has no CSV header, it continues a file."""
+    columns = EXPORTS[dataset][2]
+    return blocks(encode(export_rows(dataset, after, chunk), columns, fmt, header=after is None), compress)
+
+
+class LedgerExportView(APIView):
+    """
+    GET export/<dataset>?output=csv|ndjson&gzip=1&after=<timestamp>,<id>
+    dataset: transactions | withdrawals | my_films
+    (not ?format=, DRF keeps that one for renderer selection)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, dataset):
+        if dataset not in EXPORTS:
+            return Response({"message": f"Unknown export, choose one of: {', '.join(EXPORTS)}"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        fmt = request.query_params.get("output", "csv").lower()
+        if fmt not in FORMATS:
+            return Response({"message": "output must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+
+        after = request.query_params.get("after")
+        try:
+            after = parse_after(after) if after else None
+        except ValueError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        compress = request.query_params.get("gzip", "").lower() in ("1", "true", "yes")
+        filename = f"{dataset}.{fmt}" + (".gz" if compress else "")
+
+        response = StreamingHttpResponse(
+            export(dataset, fmt, compress, after),
+            content_type="application/gzip" if compress else FORMATS[fmt],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adminpanel import ledger_export
+
+
+class Command(BaseCommand):
+    help = "Stream a ledger table (transactions / withdrawals / my_films) as CSV or NDJSON, oldest first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(ledger_export.EXPORTS))
+        parser.add_argument("--format", choices=sorted(ledger_export.FORMATS), default="csv")
+        parser.add_argument("--gzip", action="store_true", help="gzip the output on the fly.")
+        parser.add_argument("--after", help="Resume after this '<timestamp>,<id>' (the last row already exported).")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Rows per DB fetch.")
+        parser.add_argument("-o", "--output", default="-", help="File to write (default: stdout).")
+
+    def handle(self, *args, **opts):
+        try:
+            after = ledger_export.parse_after(opts["after"]) if opts["after"] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        blocks = ledger_export.export(
+            opts["dataset"], opts["format"], opts["gzip"], after, opts["chunk_size"]
+        )
+        if opts["output"] == "-":
+            out = sys.stdout.buffer
+            for block in blocks:
+                out.write(block)
+            out.flush()
+            return
+
+        # append when resuming so the file picks up where it broke off
+        with open(opts["output"], "ab" if after else "wb") as out:
+            for block in blocks:
+                out.write(block)
+        self.stderr.write(f"Wrote {opts['dataset']} to {opts['output']}")
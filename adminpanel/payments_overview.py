@@ -1,65 +1,83 @@
+from datetime import date, datetime, time, timedelta
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
+from rest_framework import status
 from django.db.models import Sum, Count, Q
+from django.utils import timezone
 from decimal import Decimal
 from subscription.models import Transaction
 from movie.views import MyPagination
 
+FILM_TX_TYPES = ["purchase", "rent"]
+PAYMENT_METHODS = ["stripe", "paypal", "reelbux"]
+STATUSES = ["completed", "pending", "failed"]
+LIST_FIELDS = ("id", "tx_type", "amount", "source", "status", "created_at", "user__id", "user__full_name")
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
 
 class FilmTransactionOverview(APIView):
+    """
+    Purchase / rent ledger overview. Filters: ?since=YYYY-MM-DD&until=YYYY-MM-DD
+    (inclusive days) and ?source=stripe|paypal|reelbux, served by the
+    Transaction(tx_type, created_at) / (source, tx_type, created_at) indexes.
+    All stats come from ONE conditional aggregate and the list is paginated in
+    the database (page numbers, or ?pagination=cursor), so memory stays flat.
+    """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         # ------------------- Transactions (only purchase & rent) -------------------
-        transactions = Transaction.objects.filter(
-            tx_type__in=["purchase", "rent"]
-        ).select_related("user")
-
-        # ------------------- Earnings (1 query) -------------------
-        earnings = transactions.aggregate(
-            completed=Sum("amount", filter=Q(status="completed")),
-            pending=Sum("amount", filter=Q(status="pending")),
-            failed=Sum("amount", filter=Q(status="failed")),
-        )
+        transactions = Transaction.objects.filter(tx_type__in=FILM_TX_TYPES)
 
-        stats = {
-            "total_completed_earning": float(earnings["completed"] or Decimal(0)),
-            "total_pending_earning": float(earnings["pending"] or Decimal(0)),
-            "total_failed_earning": float(earnings["failed"] or Decimal(0)),
-        }
+        try:
+            since = request.query_params.get("since")
+            until = request.query_params.get("until")
+            if since:
+                transactions = transactions.filter(created_at__gte=_day_start(date.fromisoformat(since)))
+            if until:
+                transactions = transactions.filter(created_at__lt=_day_start(date.fromisoformat(until) + timedelta(days=1)))
+        except ValueError:
+            return Response({"message": "since / until must be YYYY-MM-DD dates"}, status=status.HTTP_400_BAD_REQUEST)
+
+        source = request.query_params.get("source")
+        if source:
+            transactions = transactions.filter(source=source.lower())
 
-        # ------------------- Transfer status counts (1 query) -------------------
-        counts = transactions.aggregate(
-            completed=Count("id", filter=Q(status="completed")),
-            pending=Count("id", filter=Q(status="pending")),
-            failed=Count("id", filter=Q(status="failed")),
+        # ------------------- Earnings, status counts & payment methods (1 query) -------------------
+        totals = transactions.order_by().aggregate(
+            total=Count("id"),
+            **{f"{s}_amount": Sum("amount", filter=Q(status=s)) for s in STATUSES},
+            **{f"{s}_count": Count("id", filter=Q(status=s)) for s in STATUSES},
+            **{f"{m}_count": Count("id", filter=Q(source=m)) for m in PAYMENT_METHODS},
         )
 
-        transfer_status = {
-            "completed_count": counts["completed"],
-            "pending_count": counts["pending"],
-            "failed_count": counts["failed"],
+        stats = {
+            f"total_{s}_earning": float(totals[f"{s}_amount"] or Decimal(0)) for s in STATUSES
         }
 
-        # ------------------- Payment methods (transaction count per method) -------------------
-        method_totals = transactions.values("source").annotate(total=Count("id"))
-        total_count = sum(m["total"] or 0 for m in method_totals)
+        transfer_status = {f"{s}_count": totals[f"{s}_count"] for s in STATUSES}
 
         # Prepare all payment methods (even if 0 transactions)
-        all_methods = ["stripe", "paypal", "reelbux"]
-        method_dict = {m["source"]: m["total"] for m in method_totals}
-
+        total_count = totals["total"]
         payment_overview = {}
-        for method in all_methods:
-            count = int(method_dict.get(method, 0) or 0)
+        for method in PAYMENT_METHODS:
+            count = totals[f"{method}_count"]
             payment_overview[method.capitalize()] = {
                 "total": count,
                 "percentage": round(count / total_count * 100, 2) if total_count else 0,
             }
 
-        # ------------------- Transaction list -------------------
-        transaction_list = [
+        # ------------------- Transaction list (one page from the DB) -------------------
+        paginator = MyPagination(ordering=("-created_at", "-id"))
+        page = paginator.paginate_queryset(
+            transactions.select_related("user").only(*LIST_FIELDS).order_by("-created_at", "-id"), request
+        )
+        paginated_transactions = [
             {
                 "tx_type": t.tx_type,
                 "user": t.user.full_name,
@@ -68,17 +86,13 @@ class FilmTransactionOverview(APIView):
                 "date": t.created_at.date(),
                 "status": t.get_status_display(),
             }
-            for t in transactions
+            for t in page
         ]
 
-        # ------------------- Pagination only for transactions -------------------
-        paginator = MyPagination()
-        paginated_transactions = paginator.paginate_queryset(transaction_list, request)
-
         pagination_data = {
-            "count": paginator.page.paginator.count,
-            "total_pages": paginator.page.paginator.num_pages,
-            "current_page": paginator.page.number,
+            "count": paginator.get_count(),
+            "total_pages": None if paginator.cursor_mode else paginator.page.paginator.num_pages,
+            "current_page": None if paginator.cursor_mode else paginator.page.number,
             "next": paginator.get_next_link(),
             "previous": paginator.get_previous_link(),
         }
@@ -1,3 +1,283 @@
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from movie.models import Film
+from subscription.models import Transaction
+from . import user_directory
+from .ledger_export import LedgerExportView, export_rows
+from .payments_overview import FilmTransactionOverview
+from .views import AdminFilmsView, UserManagementView
+
+
+def make_user(email, **extra):
+    extra.setdefault("full_name", email)
+    return User.objects.create_user(email=email, password="pass1234", terms_agreed=True, **extra)
+
+
+class PaymentsOverviewTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = make_user("admin@example.com", is_staff=True)
+        self.buyer = make_user("buyer@example.com")
+
+    def add_transactions(self, n, source="stripe", status="completed", tx_type="purchase", days_ago=0):
+        rows = Transaction.objects.bulk_create([
+            Transaction(user=self.buyer, source=source, tx_type=tx_type, amount=Decimal("2.50"), status=status)
+            for _ in range(n)
+        ])
+        if days_ago:
+            Transaction.objects.filter(id__in=[t.id for t in rows]).update(
+                created_at=timezone.now() - timedelta(days=days_ago)
+            )
+
+    def get(self, **params):
+        request = self.factory.get("/api/admin/payments-overview", params)
+        force_authenticate(request, user=self.admin)
+        return FilmTransactionOverview.as_view()(request)
+
+    def test_stats_come_from_one_aggregate(self):
+        self.add_transactions(3, "stripe", "completed")
+        self.add_transactions(1, "paypal", "pending")
+        self.add_transactions(1, "reelbux", "failed", tx_type="rent")
+        self.add_transactions(2, "stripe", tx_type="deposit")  # not a film payment
+
+        response = self.get()
+        self.assertEqual(response.data["stats"]["total_completed_earning"], 7.5)
+        self.assertEqual(response.data["transfer_status"], {"completed_count": 3, "pending_count": 1, "failed_count": 1})
+        self.assertEqual(response.data["payment_method"]["Stripe"], {"total": 3, "percentage": 60.0})
+        self.assertEqual(response.data["pagination"]["count"], 5)
+
+    def test_query_count_does_not_grow_with_the_ledger(self):
+        self.add_transactions(5)
+        with CaptureQueriesContext(connection) as small:
+            self.get()
+        self.add_transactions(200, "paypal")
+        with CaptureQueriesContext(connection) as large:
+            response = self.get()
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(response.data["transactions_list"]), 10)
+        self.assertEqual(response.data["pagination"]["total_pages"], 21)
+
+    def test_date_and_source_filters(self):
+        self.add_transactions(2, "stripe")
+        self.add_transactions(4, "paypal", days_ago=10)
+        today = timezone.now().date()
+
+        recent = self.get(since=(today - timedelta(days=1)).isoformat())
+        self.assertEqual(recent.data["pagination"]["count"], 2)
+        old = self.get(until=(today - timedelta(days=5)).isoformat(), source="PayPal")
+        self.assertEqual(old.data["transfer_status"]["completed_count"], 4)
+        self.assertEqual(self.get(source="stripe", since=today.isoformat()).data["pagination"]["count"], 2)
+        self.assertEqual(self.get(since="last week").status_code, 400)
+
+    def test_cursor_mode_walks_the_ledger(self):
+        self.add_transactions(15)
+        first = self.get(pagination="cursor")
+        self.assertIsNone(first.data["pagination"]["total_pages"])
+        cursor = parse_qs(urlparse(first.data["pagination"]["next"]).query)["cursor"][0]
+        second = self.get(cursor=cursor)
+        self.assertEqual(len(first.data["transactions_list"]) + len(second.data["transactions_list"]), 15)
+        self.assertIsNone(second.data["pagination"]["next"])
+
+
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = make_user("admin@example.com", is_staff=True)
+        self.buyer = make_user("buyer@example.com")
+        Transaction.objects.bulk_create([
+            Transaction(user=self.buyer, source="stripe", tx_type="purchase", amount=Decimal(i), status="completed")
+            for i in range(25)
+        ])
+
+    def get(self, dataset="transactions", **params):
+        request = self.factory.get(f"/api/admin/export/{dataset}", params)
+        force_authenticate(request, user=self.admin)
+        return LedgerExportView.as_view()(request, dataset=dataset)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_csv_streams_every_row_oldest_first(self):
+        response = self.get()
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(self.body(response).decode())))
+        self.assertEqual(rows[0][:2], ["created_at", "id"])
+        ids = [int(row[1]) for row in rows[1:]]
+        self.assertEqual(ids, sorted(Transaction.objects.values_list("id", flat=True)))
+
+    def test_gzip_ndjson_and_resume(self):
+        response = self.get(output="ndjson", gzip="1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        rows = [json.loads(line) for line in gzip.decompress(self.body(response)).splitlines()]
+        self.assertEqual(len(rows), 25)
+
+        last = rows[9]
+        resumed = self.get(output="ndjson", after=f"{last['created_at']},{last['id']}")
+        rest = [json.loads(line) for line in self.body(resumed).splitlines()]
+        self.assertEqual([r["id"] for r in rest], [r["id"] for r in rows[10:]])
+
+    def test_resume_survives_an_unencoded_cursor(self):
+        rows = list(export_rows("transactions"))
+        when, pk = rows[9][:2]
+        self.assertIn("+00:00", when.isoformat())
+        request = self.factory.get(f"/api/admin/export/transactions?output=ndjson&after={when.isoformat()},{pk}")
+        force_authenticate(request, user=self.admin)
+        response = LedgerExportView.as_view()(request, dataset="transactions")
+        self.assertEqual(response.status_code, 200)
+        rest = [json.loads(line)["id"] for line in self.body(response).splitlines()]
+        self.assertEqual(rest, [row[1] for row in rows[10:]])
+
+    def test_command_resumes_a_broken_csv_file(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "transactions.csv")
+            call_command("export_ledger", "transactions", output=path, stderr=io.StringIO())
+            with open(path) as f:
+                full = f.read()
+
+            lines = full.splitlines(keepends=True)
+            with open(path, "w") as f:
+                f.writelines(lines[:11])  # header + 10 rows, then the export broke off
+            last = next(csv.reader([lines[10]]))
+            call_command("export_ledger", "transactions", output=path, after=f"{last[0]},{last[1]}", stderr=io.StringIO())
+            with open(path) as f:
+                self.assertEqual(f.read(), full)  # one header, every row once
+
+    def test_rows_are_fetched_in_chunks(self):
+        rows = list(export_rows("transactions", chunk=7))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(self.get(after="yesterday").status_code, 400)
+        self.assertEqual(self.get(dataset="users").status_code, 404)
+
+
+class UserManagementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.admin = make_user("admin@example.com", is_staff=True, role="admin")
+        for i in range(12):
+            make_user(f"viewer{i:02d}@example.com", full_name=f"Viewer {i:02d}")
+        make_user("jo@example.com", full_name="Joan Smith")
+        make_user("someone@example.com", full_name="John Doe")
+
+    def get(self, **params):
+        request = self.factory.get("/api/admin/manage-users", params)
+        force_authenticate(request, user=self.admin)
+        return UserManagementView.as_view()(request)
+
+    def cursor(self, link):
+        return parse_qs(urlparse(link).query)["cursor"][0]
+
+    def test_keyset_pages_walk_every_user_once(self):
+        first = self.get(page_size=10)
+        self.assertEqual(first.data["total_users"], 14)
+        second = self.get(page_size=10, cursor=self.cursor(first.data["next"]))
+        emails = [u["email"] for u in first.data["users"] + second.data["users"]]
+        self.assertEqual(len(emails), 14)
+        self.assertEqual(len(set(emails)), 14)
+        self.assertNotIn("admin@example.com", emails)
+        self.assertIsNone(second.data["next"])
+
+    def test_total_comes_from_the_cached_counter(self):
+        self.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.get()
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"]])
+        self.assertFalse([q for q in queries if "avatar" in q["sql"] or "otp" in q["sql"]])
+
+        make_user("new@example.com")
+        self.assertEqual(self.get().data["total_users"], 15)
+
+    def test_prefix_and_contains_search(self):
+        prefix = self.get(search="JO")
+        self.assertEqual(sorted(u["email"] for u in prefix.data["users"]), ["jo@example.com", "someone@example.com"])
+        self.assertEqual(prefix.data["total_users"], 2)
+
+        contains = self.get(search="smith", match="contains")
+        self.assertEqual([u["email"] for u in contains.data["users"]], ["jo@example.com"])
+        self.assertEqual(self.get(search="sm", match="contains").status_code, 400)
+
+    def test_search_count_is_capped(self):
+        with self.settings(USER_SEARCH_COUNT_CAP=5):
+            response = self.get(search="viewer")
+        self.assertEqual(response.data["total_users"], 5)
+        self.assertFalse(response.data["total_users_exact"])
+
+    def test_prefix_search_uses_the_expression_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite query plan")
+        queryset = user_directory.search(user_directory.directory(), "jo")
+        plan = queryset.explain()
+        self.assertIn("user_email_lower_idx", plan)
+        self.assertIn("user_full_name_lower_idx", plan)
+
+
+class AdminFilmsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.admin = make_user("admin@example.com", is_staff=True, role="admin")
+        self.filmmakers = [make_user(f"maker{i}@example.com") for i in range(3)]
+
+    def add_films(self, n, status):
+        for i in range(n):
+            Film.objects.create(
+                filmmaker=self.filmmakers[i % 3], title=f"{status} {Film.objects.count()}", status=status,
+                film_type="MOVIE",
+            )
+
+    def get(self, **params):
+        request = self.factory.get("/api/admin/films", params)
+        force_authenticate(request, user=self.admin)
+        return AdminFilmsView.as_view()(request)
+
+    def test_query_count_is_fixed(self):
+        self.add_films(2, "REVIEW")
+        self.add_films(2, "PUBLISHED")
+        cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            self.get()
+        self.add_films(15, "REVIEW")
+        self.add_films(10, "PUBLISHED")
+        self.add_films(5, "REJECTED")
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            response = self.get()
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(response.data["stats"]["total_films"], 34)
+        self.assertEqual(len(response.data["review_films"]), 10)
+        self.assertEqual(response.data["review_pagination"]["count"], 17)
+        self.assertEqual(response.data["track_pagination"]["count"], 17)
+        self.assertEqual(
+            {f["filmmaker"] for f in response.data["track_all_films"]}, {u.email for u in self.filmmakers}
+        )
+
+    def test_queues_page_independently(self):
+        self.add_films(12, "REVIEW")
+        self.add_films(3, "PUBLISHED")
+        first = self.get()
+        titles = [f["title"] for f in first.data["review_films"]]
+        self.assertEqual(titles, [f"REVIEW {i}" for i in range(10)])  # oldest submission first
 
-# Create your tests here.
+        cursor = parse_qs(urlparse(first.data["review_pagination"]["next"]).query)["review_cursor"][0]
+        second = self.get(review_cursor=cursor)
+        self.assertEqual([f["title"] for f in second.data["review_films"]], ["REVIEW 10", "REVIEW 11"])
+        self.assertEqual(len(second.data["track_all_films"]), 3)  # the tracking list stays on its first page
+        self.assertIsNone(second.data["track_pagination"]["next"])
@@ -4,6 +4,7 @@ from .film_delete import *
 from .film_approve_reject import *
 from .distro_reports import *
 from .payments_overview import *
+from .ledger_export import LedgerExportView
 
 urlpatterns = [
     #1 Admin Dashboard
@@ -19,6 +20,7 @@ urlpatterns = [
 
     #4 Payments
     path('payments-overview', FilmTransactionOverview.as_view(), name='payments_overview'),
+    path('export/<str:dataset>', LedgerExportView.as_view(), name='ledger_export'),
 
     #5 Distro
     path('distro-report', FilmDistroReportView.as_view(), name='distro_report'),
@@ -0,0 +1,54 @@
+"""
+Admin user directory: search + totals for UserManagementView.
+
+- Prefix search (default): LOWER(email) / LOWER(full_name) range scans on the
+  expression indexes, so typeahead stays an index seek however many users
+  there are.
+- `?match=contains`: substring search (3+ characters), served by GIN
+  trigram indexes on PostgreSQL (accounts migration 0003); other databases
+  scan, bounded by the page size.
+
+Totals never run a full COUNT(*): the unfiltered list uses the cached counter
+in accounts.user_cache, searches count at most USER_SEARCH_COUNT_CAP matches.
+"""
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from accounts import user_cache
+from accounts.models import User
+
+LIST_FIELDS = ("id", "full_name", "email", "date_joined")  # no avatar / OTP / phone columns
+ORDERING = ("-date_joined", "-id")
+MATCHES = ("prefix", "contains")
+MIN_CONTAINS_LENGTH = 3
+
+
+def directory():
+    """Non-admin users, slim projection."""
+    return User.objects.exclude(role="admin").only(*LIST_FIELDS)
+
+
+def search(users, query, match="prefix"):
+    query = query.lower()
+    users = users.alias(email_lower=Lower("email"), name_lower=Lower("full_name"))
+    if match == "contains":
+        return users.filter(Q(email_lower__contains=query) | Q(name_lower__contains=query))
+    # [query, query + max code point) is exactly "starts with query" and seeks the index
+    end = query + "\U0010ffff"
+    return users.filter(
+        Q(email_lower__gte=query, email_lower__lt=end) | Q(name_lower__gte=query, name_lower__lt=end)
+    )
+
+
+def count_cap():
+    return getattr(settings, "USER_SEARCH_COUNT_CAP", 1000)
+
+
+def total(users, searching):
+    """(count, exact): the cached total, or a search count capped at USER_SEARCH_COUNT_CAP."""
+    if not searching:
+        return user_cache.user_count(), True
+    cap = count_cap()
+    count = users.order_by()[: cap + 1].count()
+    return min(count, cap), count <= cap
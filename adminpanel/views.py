@@ -2,37 +2,54 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from rest_framework import status
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 
 from accounts.models import User
-from movie.models import Film
+from movie.models import Film, FilmDailyStats
+from movie import counters as film_counters
+from movie.pagination import MyPagination
 from .serializers import ManageUserSerializer
+from . import user_directory
 from subscription.models import UserSubscription
 
 class UserManagementView(APIView):
     permission_classes = [IsAdminUser]  # Only admins can access
 
-    # GET: list all non-admin users, with optional search
+    # GET: non-admin users, newest first, keyset pages (?cursor=...), optional search
+    # ?search=<prefix of email or full name>&match=prefix|contains (see user_directory.py)
     def get(self, request):
         search_query = request.GET.get("search", "").strip()
+        match = request.GET.get("match", "prefix")
+        if match not in user_directory.MATCHES:
+            return Response({
+                "status": "error",
+                "message": "match must be prefix or contains"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if match == "contains" and 0 < len(search_query) < user_directory.MIN_CONTAINS_LENGTH:
+            return Response({
+                "status": "error",
+                "message": f"contains search needs at least {user_directory.MIN_CONTAINS_LENGTH} characters"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Exclude admin
-        users = User.objects.exclude(role="admin")
-
-        # If search query provided, filter
+        # Exclude admin, only the listed columns
+        users = user_directory.directory()
         if search_query:
-            users = users.filter(
-                Q(full_name__icontains=search_query) | Q(email__icontains=search_query)
-            )
+            users = user_directory.search(users, search_query, match)
+
+        total_users, exact = user_directory.total(users, bool(search_query))
 
-        total_users = users.count()
-        serializer = ManageUserSerializer(users, many=True)
+        paginator = MyPagination(ordering=user_directory.ORDERING, default_mode="cursor")
+        page = paginator.paginate_queryset(users.order_by(*user_directory.ORDERING), request)
+        serializer = ManageUserSerializer(page, many=True)
 
         return Response({
             "status": "success",
             "message": "Users fetched successfully",
             "total_users": total_users,
-            "users": serializer.data
+            "total_users_exact": exact,  # False: there are more than total_users matches
+            "users": serializer.data,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
         })
 
     # DELETE: remove a user by ID (only non-admin users)
@@ -64,19 +81,48 @@ class UserManagementView(APIView):
 
 # =========================== Films ============================
 class AdminFilmsView(APIView):
+    """
+    Moderation queue (REVIEW films, oldest submission first) and tracking list
+    (PUBLISHED / REJECTED, newest first), each keyset-paginated on its own
+    cursor: ?review_cursor=... / ?track_cursor=... (?pagination=page with
+    ?review_page= / ?track_page= for page numbers), ?page_size= for both.
+    A fixed number of queries whatever the catalog size.
+    """
     permission_classes = [IsAdminUser]  # Only admins can access
 
-    def get(self, request):
-        films = Film.objects.all()
+    REVIEW_ORDERING = ("created_at", "id")
+    TRACK_ORDERING = ("-created_at", "-id")
+    REVIEW_FIELDS = ("id", "title", "film_type", "thumbnail", "created_at")
+    TRACK_FIELDS = (
+        "id", "title", "film_type", "status", "created_at", "total_views", "total_earning",
+        "filmmaker__id", "filmmaker__email",
+    )
+
+    def paginator(self, ordering, prefix):
+        paginator = MyPagination(ordering=ordering, default_mode="cursor")
+        paginator.page_query_param = f"{prefix}_page"
+        paginator.cursor_query_param = f"{prefix}_cursor"
+        return paginator
 
+    def get(self, request):
+        # film counts in one conditional aggregate, earnings from the daily rollups (one aggregate)
+        counts = Film.objects.order_by().aggregate(
+            total_films=Count("id"),
+            under_review=Count("id", filter=Q(status="REVIEW")),
+            tracked=Count("id", filter=Q(status__in=["PUBLISHED", "REJECTED"])),
+        )
+        earnings = FilmDailyStats.objects.aggregate(buy=Sum("buy_earning"), rent=Sum("rent_earning"))
         stats = {
-            "total_films": films.count(),
-            "total_buy": films.aggregate(total=Sum("total_buy_earning"))["total"] or 0,
-            "total_rent": films.aggregate(total=Sum("total_rent_earning"))["total"] or 0,
+            "total_films": counts["total_films"],
+            "total_buy": earnings["buy"] or 0,
+            "total_rent": earnings["rent"] or 0,
         }
 
-        # Get only under review films
-        under_review_films = Film.objects.filter(status="REVIEW")
+        # ---- Under review films (moderation queue, first come first served) ----
+        review_paginator = self.paginator(self.REVIEW_ORDERING, "review")
+        under_review_films = review_paginator.paginate_queryset(
+            Film.objects.filter(status="REVIEW").only(*self.REVIEW_FIELDS).order_by(*self.REVIEW_ORDERING), request
+        )
         review_films = [
             {
                 "id": f.id,
@@ -89,8 +135,16 @@ class AdminFilmsView(APIView):
             for f in under_review_films
         ]
 
-        # Filter films where status is either "PUBLISHED" or "REJECTED"
-        track_all_films = Film.objects.filter(status__in=["PUBLISHED", "REJECTED"])
+        # ---- Published / rejected films (filmmaker joined, live view counters in one query) ----
+        track_paginator = self.paginator(self.TRACK_ORDERING, "track")
+        track_all_films = track_paginator.paginate_queryset(
+            Film.objects.filter(status__in=["PUBLISHED", "REJECTED"])
+            .select_related("filmmaker")
+            .only(*self.TRACK_FIELDS)
+            .order_by(*self.TRACK_ORDERING),
+            request,
+        )
+        live = film_counters.totals_for_films([f.id for f in track_all_films])
 
         track_films = [
             {
@@ -100,7 +154,7 @@ class AdminFilmsView(APIView):
                 "film_type": f.get_film_type_display(),
                 "status": f.get_status_display(),
                 "release_date": f.created_at.date(),
-                "total_views": f.total_views,
+                "total_views": live.get(f.id, {}).get("total_views", f.total_views),
                 "total_earning": f.total_earning
             }
             for f in track_all_films
@@ -111,7 +165,17 @@ class AdminFilmsView(APIView):
             "message": "Films fetched successfully",
             "stats": stats,
             "review_films": review_films,
+            "review_pagination": {
+                "count": counts["under_review"],
+                "next": review_paginator.get_next_link(),
+                "previous": review_paginator.get_previous_link(),
+            },
             "track_all_films": track_films,
+            "track_pagination": {
+                "count": counts["tracked"],
+                "next": track_paginator.get_next_link(),
+                "previous": track_paginator.get_previous_link(),
+            },
         })
 
 
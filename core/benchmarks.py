@@ -0,0 +1,86 @@
+"""
+Helpers shared by the `bench_*` management commands.
+
+Benchmarks never touch the real database: they run against a throwaway test
+database that is created before the run and destroyed afterwards.
+"""
+import time
+import statistics
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """Create a disposable test database, yield, then drop it."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+class Timer:
+    """Collects per-call latencies (seconds) and summarizes them."""
+
+    def __init__(self):
+        self.samples = []
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append(time.perf_counter() - start)
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            "calls": len(self.samples),
+            "total_s": round(sum(self.samples), 4),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(self.samples) * 1000, 3) if self.samples else 0.0,
+        }
+
+
+def make_users(count, prefix="bench"):
+    """Bulk-create `count` plain users (bypasses User.save, so no distro_code)."""
+    from accounts.models import User
+
+    users = [
+        User(email=f"{prefix}{i}@example.com", full_name=f"{prefix.title()} User {i}", terms_agreed=True)
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=1000)
+    return users
+
+
+def make_films(count, filmmaker, prefix="bench", **fields):
+    """Bulk-create `count` published films owned by `filmmaker`."""
+    from movie.models import Film, FilmStatus, FilmType
+
+    films = [
+        Film(
+            filmmaker=filmmaker,
+            title=f"{prefix.title()} Film {i}",
+            slug=f"{prefix}-film-{i}",
+            film_type=FilmType.MOVIE,
+            status=FilmStatus.PUBLISHED,
+            **fields,
+        )
+        for i in range(count)
+    ]
+    Film.objects.bulk_create(films, batch_size=1000)
+    return films
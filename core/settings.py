@@ -78,6 +78,7 @@ INSTALLED_APPS = [
     'subscription',
     'reelbux',
     'distro',
+    'adminpanel',
 ]
 
 # CustomUser Model
@@ -234,4 +235,89 @@ PAYPAL_CLIENT_SECRET = "EK3qr2n7kBdljYjLaVVNNKcHxzpu8S9sX0lkh4eYLtWUSf30cN04gkkv
 
 # CSRF_TRUSTED_ORIGINS = [
 #     'https://equal-evidently-terrier.ngrok-free.app',
-# ]
\ No newline at end of file
+# ]
+
+# Playback telemetry (movie/telemetry.py)
+# When enabled, views-count / watch-time-count only enqueue events; a background
+# timer flushes them with bulk writes and one counter UPDATE per film.
+TELEMETRY_BUFFERED = os.getenv("TELEMETRY_BUFFERED", "false").lower() == "true"
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "2.0"))  # seconds
+TELEMETRY_MAX_PENDING = int(os.getenv("TELEMETRY_MAX_PENDING", "10000"))  # events before an inline flush
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("ROLLUP_FLUSH_INTERVAL", "5.0"))  # seconds between FilmDailyStats batch writes (0 = every event)
+ROLLUP_MAX_PENDING = int(os.getenv("ROLLUP_MAX_PENDING", "5000"))  # queued (film, day) rows before an inline flush
+TELEMETRY_BATCH_MAX_EVENTS = int(os.getenv("TELEMETRY_BATCH_MAX_EVENTS", "500"))  # events per telemetry/batch request
+# Unique-view Bloom filter (movie/view_filter.py): new (film, viewer) pairs skip the
+# FilmView SELECT. Build it with `manage.py build_view_filter` after migrating; workers load the file.
+VIEW_FILTER_ENABLED = os.getenv("VIEW_FILTER_ENABLED", "true").lower() == "true"
+VIEW_FILTER_PATH = os.getenv("VIEW_FILTER_PATH", "")  # empty = var/view_filter-<db name>.bloom
+VIEW_FILTER_CAPACITY = int(os.getenv("VIEW_FILTER_CAPACITY", "1000000"))  # pairs (grown to 2x FilmView rows on build)
+VIEW_FILTER_ERROR_RATE = float(os.getenv("VIEW_FILTER_ERROR_RATE", "0.01"))  # target false-positive rate
+# HyperLogLog unique-viewer sketches per film per day (movie/hll.py): 2^p registers,
+# standard error ~1.04/sqrt(2^p). Keep it fixed once sketches exist: sketches of different precision don't merge.
+HLL_PRECISION = int(os.getenv("HLL_PRECISION", "11"))
+# Heartbeat backpressure: responses carry `next_report_in`, stretched from the base
+# interval toward the max as the buffer fills or writes slow down, with +/- jitter
+TELEMETRY_REPORT_INTERVAL = int(os.getenv("TELEMETRY_REPORT_INTERVAL", "30"))  # seconds, idle
+TELEMETRY_REPORT_INTERVAL_MAX = int(os.getenv("TELEMETRY_REPORT_INTERVAL_MAX", "300"))  # seconds, saturated
+TELEMETRY_REPORT_JITTER = float(os.getenv("TELEMETRY_REPORT_JITTER", "0.2"))  # fraction of the interval
+TELEMETRY_TARGET_WRITE_LATENCY = float(os.getenv("TELEMETRY_TARGET_WRITE_LATENCY", "0.05"))  # seconds per write
+
+# Sharded film counters (movie/counters.py)
+# 0 = update the Film row directly; N > 0 = spread increments over N shard rows,
+# folded back into Film by `python manage.py compact_film_counters`.
+FILM_COUNTER_SHARDS = int(os.getenv("FILM_COUNTER_SHARDS", "0"))
+FILM_COUNTER_CACHE_TTL = int(os.getenv("FILM_COUNTER_CACHE_TTL", "5"))  # seconds
+
+# Cache (locmem by default; point CACHE_BACKEND/CACHE_LOCATION at Redis/Memcached in production)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': os.getenv("CACHE_LOCATION", "officestreamlab"),
+    }
+}
+
+# Homepage feeds (movie/feed_cache.py)
+FEED_CACHE_ALIAS = "default"
+FEED_CACHE_TTL = int(os.getenv("FEED_CACHE_TTL", "60"))  # soft TTL, seconds
+FEED_CACHE_LOCK_TTL = 10  # max seconds one worker may spend rebuilding a feed
+
+# Trending (movie/trending.py): forward-decayed play scores
+TRENDING_HALF_LIFE_HOURS = int(os.getenv("TRENDING_HALF_LIFE_HOURS", "48"))
+TRENDING_WINDOW_DAYS = 30  # recompute_trending ignores older plays
+TRENDING_EPOCH = "2025-01-01"  # scores are stored in log space, so any age is fine
+
+# Film search index (movie/search.py): "auto" | "fts5" | "python"
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# FTS5 index file shared by all workers on the host ("" = var/search-<db name>.sqlite3);
+# ":memory:" = one index per process, kept current through the cache version stamp
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "")
+SEARCH_CACHE_ALIAS = "default"  # version stamp for per-process indexes
+
+# Platform account / referral code lookups (accounts/user_cache.py)
+USER_CACHE_ALIAS = "default"
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "3600"))
+USER_CACHE_NEGATIVE_TTL = 300  # unknown referral codes
+USER_COUNT_CACHE_TTL = int(os.getenv("USER_COUNT_CACHE_TTL", "300"))  # admin user list total
+USER_SEARCH_COUNT_CAP = 1000  # admin user search counts stop here ("1000+")
+
+# Per-user entitlement cache: owned films + rental ends (movie/entitlements.py)
+ENTITLEMENT_CACHE_ALIAS = "default"
+ENTITLEMENT_CACHE_TTL = int(os.getenv("ENTITLEMENT_CACHE_TTL", "60"))  # seconds; capped at 60 on a per-process (locmem) cache
+
+# Signed playback tokens (movie/playback_tokens.py). Give edge verifiers their own
+# PLAYBACK_TOKEN_SECRET rather than SECRET_KEY.
+PLAYBACK_TOKEN_SECRET = os.getenv("PLAYBACK_TOKEN_SECRET", "")  # empty = derive from SECRET_KEY
+PLAYBACK_TOKEN_TTL = int(os.getenv("PLAYBACK_TOKEN_TTL", "3600"))  # seconds (capped at the rental end)
+
+# Playback sessions (movie/playback.py)
+PLAYBACK_SESSION_WINDOW = int(os.getenv("PLAYBACK_SESSION_WINDOW", "300"))  # repeat starts within this many seconds reuse the play
+PLAYBACK_SESSION_MAX_AGE = 6 * 3600  # session ids expire after this many seconds
+PLAYBACK_SESSION_CACHE_SIZE = 100000  # open sessions kept in memory per process
+
+# Streaming ledger exports (adminpanel/ledger_export.py)
+LEDGER_EXPORT_CHUNK_SIZE = int(os.getenv("LEDGER_EXPORT_CHUNK_SIZE", "2000"))  # rows per DB fetch
+
+# Columnar ledger snapshots for NumPy analytics (subscription/snapshots.py, `snapshot_ledger` command)
+LEDGER_SNAPSHOT_DIR = os.getenv("LEDGER_SNAPSHOT_DIR", str(BASE_DIR / "var" / "ledger_snapshots"))
+LEDGER_SNAPSHOT_KEEP = int(os.getenv("LEDGER_SNAPSHOT_KEEP", "3"))  # older snapshots are deleted
+LEDGER_SNAPSHOT_CHUNK_SIZE = 10000  # rows per DB fetch / column write
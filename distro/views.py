@@ -6,7 +6,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from subscription.models import Wallet, Transaction
-from movie.models import Film
+from movie import trending
 
 
 class MyDistroView(APIView):
@@ -16,7 +16,7 @@ class MyDistroView(APIView):
         user = request.user
 
         # Top 10 trending films
-        top_trending = list(Film.objects.filter(status="PUBLISHED").order_by('-unique_views')[:10])
+        top_trending = trending.top_films(limit=10, fields=("id", "title", "film_type"))
 
         # Pick 3 random films from top 10
         random_films = random.sample(top_trending, min(3, len(top_trending)))
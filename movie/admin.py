@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Film, Genre, FilmView,FilmPlayView, MyFilms
+from .models import Film, Genre, FilmView,FilmPlayView, MyFilms, FilmCounterShard, FilmTrendingScore, FilmDailyStats
 
 class FilmAdmin(admin.ModelAdmin):
     list_display = ('id','title', 'year', 'status', 'created_at', 'updated_at', 'filmmaker')
@@ -16,6 +16,16 @@ class FilmViewAdmin(admin.ModelAdmin):
 class FilmPlayViewAdmin(admin.ModelAdmin):
     list_display =('id', 'film', 'viewer')
 
+class FilmCounterShardAdmin(admin.ModelAdmin):
+    list_display =('film', 'shard', 'total_views', 'unique_views', 'total_watch_time')
+
+class FilmTrendingScoreAdmin(admin.ModelAdmin):
+    list_display =('film', 'is_published', 'score', 'updated_at')
+
+class FilmDailyStatsAdmin(admin.ModelAdmin):
+    list_display =('film', 'day', 'plays', 'unique_viewers', 'watch_seconds', 'buy_earning', 'rent_earning')
+    list_filter = ('day',)
+
 class MyFilmsAdmin(admin.ModelAdmin):
     list_display =('user', 'film', 'access_type', 'start_date', 'end_date', 'status')
 
@@ -25,3 +35,6 @@ admin.site.register(Genre, GenreAdmin)
 admin.site.register(FilmView, FilmViewAdmin)
 admin.site.register(FilmPlayView, FilmPlayViewAdmin)
 admin.site.register(MyFilms, MyFilmsAdmin)
+admin.site.register(FilmCounterShard, FilmCounterShardAdmin)
+admin.site.register(FilmTrendingScore, FilmTrendingScoreAdmin)
+admin.site.register(FilmDailyStats, FilmDailyStatsAdmin)
@@ -0,0 +1,121 @@
+"""
+Per-film analytics series (views / earnings per day, week or month).
+
+Each series is ONE grouped query over a half-open range [start, end) with
+Trunc(...) buckets, instead of one `__date` filtered query per bucket.
+`views_by_period` / `earnings_by_period` read the FilmDailyStats rollups
+(see rollups.py) and `unique_viewers` merges their HyperLogLog viewer
+sketches (see hll.py); `series()` also works on the raw FilmPlayView / Transaction
+tables, backed by the composite indexes FilmPlayView(film, viewed_at) and
+Transaction(film, tx_type, created_at).
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import hll
+from .models import FilmDailyStats
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def period_start(day, granularity):
+    """First day of the day/week(Monday)/month containing `day`."""
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def next_period(start, granularity):
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(weeks=1)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def periods(count, granularity, until=None):
+    """
+    The last `count` periods (oldest first) as (start_date, end_date_exclusive);
+    the newest one contains `until` (default: today in the current timezone).
+    """
+    until = until or timezone.localdate()
+    start = period_start(until, granularity)
+    result = []
+    for _ in range(count):
+        result.append((start, next_period(start, granularity)))
+        start = period_start(start - timedelta(days=1), granularity)
+    result.reverse()
+    return result
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _as_date(bucket):
+    return timezone.localtime(bucket).date() if isinstance(bucket, datetime) else bucket
+
+
+def series(queryset, field, buckets, granularity, value):
+    """
+    Aggregate `value` per bucket of `field` (a DateField or DateTimeField) over
+    [first start, last end) in a single GROUP BY. Returns values aligned with
+    `buckets` (0 for empty ones).
+    """
+    if not buckets:
+        return []
+    start, end = buckets[0][0], buckets[-1][1]
+    if queryset.model._meta.get_field(field).get_internal_type() == "DateTimeField":
+        start, end = _aware(start), _aware(end)
+    rows = (
+        queryset.filter(**{f"{field}__gte": start, f"{field}__lt": end})
+        .order_by()
+        .annotate(bucket=Trunc(field, granularity))
+        .values("bucket")
+        .annotate(value=value)
+    )
+    by_start = {_as_date(r["bucket"]): r["value"] or 0 for r in rows}
+    return [by_start.get(start, 0) for start, _ in buckets]
+
+
+def views_by_period(film, count=7, granularity="day", until=None):
+    """[{"start", "end" (exclusive), "views"}] of plays per period, oldest first."""
+    buckets = periods(count, granularity, until)
+    values = series(FilmDailyStats.objects.filter(film=film), "day", buckets, granularity, Sum("plays"))
+    return [{"start": start, "end": end, "views": v} for (start, end), v in zip(buckets, values)]
+
+
+def earnings_by_period(film, count=7, granularity="week", until=None):
+    """[{"start", "end" (exclusive), "earning"}] of buy + rent amounts per period, oldest first."""
+    buckets = periods(count, granularity, until)
+    values = series(
+        FilmDailyStats.objects.filter(film=film), "day", buckets, granularity, Sum(F("buy_amount") + F("rent_amount"))
+    )
+    return [{"start": start, "end": end, "earning": v} for (start, end), v in zip(buckets, values)]
+
+
+def unique_viewers(film, windows=(7, 30), until=None):
+    """
+    {days: estimated distinct viewers over the last `days` days up to `until`}
+    for each window, from one query of daily sketches.
+    """
+    until = until or timezone.localdate()
+    rows = (
+        FilmDailyStats.objects.filter(film=film, day__gt=until - timedelta(days=max(windows)), day__lte=until)
+        .exclude(viewer_sketch=b"")
+        .values_list("day", "viewer_sketch")
+    )
+    sketches = list(rows)
+    return {
+        days: hll.merge(blob for day, blob in sketches if day > until - timedelta(days=days)).count()
+        for days in windows
+    }
@@ -0,0 +1,130 @@
+"""
+Sharded counters for Film.total_views, unique_views and total_watch_time.
+
+Every play / heartbeat used to UPDATE the same `Film` row, so one viral title
+serialized the whole platform. With `FILM_COUNTER_SHARDS = N` increments go to
+one of N `FilmCounterShard` rows picked at random; reads add the shards to the
+`Film` columns (cached for `FILM_COUNTER_CACHE_TTL` seconds), and the
+`compact_film_counters` command folds the shards back into `Film`.
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import Film, FilmCounterShard
+
+COUNTER_FIELDS = ("total_views", "unique_views", "total_watch_time")
+CACHE_PREFIX = "film_counters:"
+
+
+def shard_count():
+    return getattr(settings, "FILM_COUNTER_SHARDS", 0)
+
+
+def _cache_key(film_id):
+    return f"{CACHE_PREFIX}{film_id}"
+
+
+def increment(film_id, **deltas):
+    """Add `deltas` (e.g. total_views=1) to a film's counters."""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    shards = shard_count()
+    if shards <= 0:
+        Film.objects.filter(pk=film_id).update(**{f: F(f) + v for f, v in deltas.items()})
+        return
+
+    shard = random.randrange(shards)
+    changes = {f: F(f) + v for f, v in deltas.items()}
+    if FilmCounterShard.objects.filter(film_id=film_id, shard=shard).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            FilmCounterShard.objects.create(film_id=film_id, shard=shard, **deltas)
+    except IntegrityError:
+        # Another request created the shard first
+        FilmCounterShard.objects.filter(film_id=film_id, shard=shard).update(**changes)
+
+
+def increment_many(deltas_by_film):
+    """{film_id: {field: delta}} -> one shard UPDATE (or INSERT) per film."""
+    for film_id, deltas in deltas_by_film.items():
+        increment(film_id, **deltas)
+
+
+def totals_for_films(film_ids, use_cache=True):
+    """
+    {film_id: {"total_views", "unique_views", "total_watch_time"}} = Film columns + shard sums.
+    Uncached films are loaded together in one grouped query.
+    """
+    film_ids = list(dict.fromkeys(film_ids))
+    result = {}
+    if use_cache:
+        cached = cache.get_many([_cache_key(fid) for fid in film_ids])
+        for fid in film_ids:
+            value = cached.get(_cache_key(fid))
+            if value is not None:
+                result[fid] = value
+
+    missing = [fid for fid in film_ids if fid not in result]
+    if missing:
+        rows = (
+            Film.objects.filter(pk__in=missing)
+            .order_by()
+            .values("id", *COUNTER_FIELDS)
+            .annotate(**{f"shard_{f}": Sum(f"counter_shards__{f}") for f in COUNTER_FIELDS})
+        )
+        fresh = {
+            row["id"]: {f: row[f] + (row[f"shard_{f}"] or 0) for f in COUNTER_FIELDS}
+            for row in rows
+        }
+        result.update(fresh)
+        if fresh:
+            cache.set_many(
+                {_cache_key(fid): value for fid, value in fresh.items()},
+                getattr(settings, "FILM_COUNTER_CACHE_TTL", 5),
+            )
+    return result
+
+
+def totals(film_id, use_cache=True):
+    empty = {f: 0 for f in COUNTER_FIELDS}
+    return totals_for_films([film_id], use_cache=use_cache).get(film_id, empty)
+
+
+def compact(film_ids=None, batch_size=500):
+    """
+    Fold shard rows into the Film columns and delete them.
+    Returns the number of films compacted.
+    """
+    pending = FilmCounterShard.objects.order_by().values_list("film_id", flat=True).distinct()
+    if film_ids is not None:
+        pending = pending.filter(film_id__in=film_ids)
+    pending = list(pending)
+
+    compacted = 0
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        with transaction.atomic():
+            shards = list(
+                FilmCounterShard.objects.select_for_update().filter(film_id__in=batch)
+            )
+            sums = {}
+            for shard in shards:
+                film_sums = sums.setdefault(shard.film_id, dict.fromkeys(COUNTER_FIELDS, 0))
+                for f in COUNTER_FIELDS:
+                    film_sums[f] += getattr(shard, f)
+
+            FilmCounterShard.objects.filter(pk__in=[s.pk for s in shards]).delete()
+            for film_id, film_sums in sums.items():
+                changes = {f: F(f) + v for f, v in film_sums.items() if v}
+                if changes:
+                    Film.objects.filter(pk=film_id).update(**changes)
+        cache.delete_many([_cache_key(fid) for fid in batch])
+        compacted += len(batch)
+    return compacted
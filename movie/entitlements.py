@@ -0,0 +1,115 @@
+"""
+Per-user entitlement cache.
+
+`can_watch(user, film)` answers "does this user own the film or hold a running
+rental?" from one cache entry per user ({film_id: rental end timestamp, or None
+for a purchase}) in `ENTITLEMENT_CACHE_ALIAS`, so buy/rent pre-checks and the
+player don't query MyFilms. Rental ends are compared with now on every check,
+so an entry never grants an ended rental.
+
+Only positive answers are served from the cache: a "no" is re-checked against
+MyFilms (and the entry refreshed), so a payment recorded by another worker
+can't be refused playback and can't be sold twice.
+
+New MyFilms rows are written through to a cached entry (after commit, see
+signals.py); expiries (`rentals.rental_expired`), edits and deletes drop the
+user's entry and the next check reloads it in one query. Those drops only reach
+other workers through a shared cache, so on a per-process backend (locmem)
+entries live at most LOCAL_TTL seconds. `stats.snapshot()` returns per-process
+hit/miss counters.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+from accounts.user_cache import CacheStats
+from .models import MyFilms
+from .rentals import ACTIVE_STATUSES, unexpired
+
+stats = CacheStats()
+LOCAL_TTL = 60  # seconds: cap for a cache other workers can't invalidate
+
+
+def _cache():
+    return caches[getattr(settings, "ENTITLEMENT_CACHE_ALIAS", "default")]
+
+
+def _ttl():
+    ttl = getattr(settings, "ENTITLEMENT_CACHE_TTL", LOCAL_TTL)
+    return min(ttl, LOCAL_TTL) if isinstance(_cache(), LocMemCache) else ttl
+
+
+def user_key(user_id):
+    return f"entitlements:{user_id}"
+
+
+def _id(obj):
+    return getattr(obj, "pk", obj)
+
+
+def _merge(entitlements, film_id, access_type, end_date):
+    if access_type == "Buy" or end_date is None:
+        entitlements[film_id] = None  # owned for good
+    elif entitlements.get(film_id, 0) is not None:
+        entitlements[film_id] = max(entitlements.get(film_id, 0), end_date.timestamp())
+
+
+def load(user_id, now=None):
+    """{film_id: rental end timestamp or None (owned)} straight from MyFilms."""
+    entitlements = {}
+    rows = MyFilms.objects.filter(unexpired(now), user_id=user_id, status__in=ACTIVE_STATUSES).values_list(
+        "film_id", "access_type", "end_date"
+    )
+    for film_id, access_type, end_date in rows:
+        _merge(entitlements, film_id, access_type, end_date)
+    return entitlements
+
+
+def for_user(user, fresh=False):
+    """The user's entitlements from the cache, or (on a miss / `fresh`) from MyFilms."""
+    user_id = _id(user)
+    entitlements = None if fresh else _cache().get(user_key(user_id))
+    if entitlements is not None:
+        stats.count("hits")
+        return entitlements
+    stats.count("misses")
+    entitlements = load(user_id)
+    _cache().set(user_key(user_id), entitlements, _ttl())
+    return entitlements
+
+
+def _check(entitlements, film_id, now):
+    if film_id not in entitlements:
+        return False, None
+    end = entitlements[film_id]
+    return end is None or end > (now or timezone.now()).timestamp(), end
+
+
+def lookup(user, film, now=None):
+    """(can_watch, rental end timestamp or None for a purchase); a cached "no" is re-checked in MyFilms."""
+    film_id = _id(film)
+    allowed, end = _check(for_user(user), film_id, now)
+    if not allowed:
+        allowed, end = _check(for_user(user, fresh=True), film_id, now)
+    return allowed, end
+
+
+def can_watch(user, film, now=None):
+    """True if `user` bought `film` or rents it until after `now`."""
+    return lookup(user, film, now)[0]
+
+
+def grant(my_film):
+    """Write a new MyFilms row through to the user's cached entry (if any)."""
+    if my_film.status not in ACTIVE_STATUSES:
+        return invalidate(my_film.user_id)
+    key = user_key(my_film.user_id)
+    entitlements = _cache().get(key)
+    if entitlements is not None:
+        _merge(entitlements, my_film.film_id, my_film.access_type, my_film.end_date)
+        _cache().set(key, entitlements, _ttl())
+
+
+def invalidate(user_id):
+    _cache().delete(user_key(user_id))
@@ -0,0 +1,79 @@
+"""
+Cached, versioned homepage feeds (trending / latest).
+
+Feeds are identical for every user, so the rendered JSON bytes are stored in
+Django's cache (`FEED_CACHE_ALIAS`, locmem by default) under a key that
+includes a global feed version. Film save/delete signals and film moderation
+bump the version, which makes every cached feed a miss at once.
+
+Stampede protection: on a miss (new version or soft TTL expired) only the
+worker that wins `cache.add(lock)` rebuilds the feed; the others keep serving
+the last rendered bytes until the new ones land.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.renderers import JSONRenderer
+
+VERSION_KEY = "feed:version"
+
+
+def _cache():
+    return caches[getattr(settings, "FEED_CACHE_ALIAS", "default")]
+
+
+def current_version():
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        # First use (or evicted): start a fresh version so stale entries are never reused
+        version = int(time.time() * 1000)
+        if not _cache().add(VERSION_KEY, version, timeout=None):
+            version = _cache().get(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached feed."""
+    cache = _cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(VERSION_KEY, version, timeout=None)
+        return version
+
+
+def cached_feed(name, build):
+    """
+    Return the rendered JSON bytes for feed `name`.
+    `build()` returns the response dict; it runs at most once per version/TTL
+    window across workers sharing the cache.
+    """
+    cache = _cache()
+    ttl = getattr(settings, "FEED_CACHE_TTL", 60)
+    version = current_version()
+    entry_key = f"feed:{name}:v{version}"
+    stale_key = f"feed:{name}:latest"
+    lock_key = f"feed:{name}:lock"
+
+    entry = cache.get(entry_key)
+    if entry is not None and entry["expires"] > time.time():
+        return entry["body"]
+
+    if cache.add(lock_key, 1, timeout=getattr(settings, "FEED_CACHE_LOCK_TTL", 10)):
+        try:
+            body = JSONRenderer().render(build())
+            entry = {"body": body, "expires": time.time() + ttl}
+            # keep the versioned entry around after its soft TTL so it can be served stale
+            cache.set_many({entry_key: entry, stale_key: entry}, timeout=ttl * 10)
+            return body
+        finally:
+            cache.delete(lock_key)
+
+    # Someone else is rebuilding: serve whatever we have, newest first
+    stale = entry or cache.get(stale_key)
+    if stale is not None:
+        return stale["body"]
+    # Cold cache and the lock is taken: build without caching rather than fail
+    return JSONRenderer().render(build())
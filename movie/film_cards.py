@@ -0,0 +1,57 @@
+"""
+Read-optimized film "card" serialization shared by Trending / Latest /
+Details / Related.
+
+A page of cards costs a constant number of queries: one for the film columns
+(only() the card fields) and one prefetch for all of their genres, instead of
+one `genre.all()` query per film.
+"""
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
+
+from .models import Genre
+
+CARD_FIELDS = (
+    "id", "title", "slug", "year", "logline", "film_type",
+    "buy_price", "rent_price", "full_film_duration", "thumbnail", "trailer_hls_url",
+)
+
+
+def genre_prefetch():
+    return Prefetch("genre", queryset=Genre.objects.only("id", "name"))
+
+
+def card_queryset(queryset):
+    """Limit a Film queryset to card columns and prefetch genres."""
+    return queryset.only(*CARD_FIELDS).prefetch_related(genre_prefetch())
+
+
+def film_card(film, with_duration=False):
+    card = {
+        "id": film.id,
+        "title": film.title,
+        "slug": film.slug,
+        "year": film.year,
+        "logline": film.logline,
+        "film_type": film.get_film_type_display(),
+        "genre": [g.name for g in film.genre.all()],
+        "buy_price": film.buy_price,
+        "rent_price": film.rent_price,
+    }
+    if with_duration:
+        card["full_film_duration"] = film.full_film_duration
+    card["thumbnail"] = film.thumbnail.url if film.thumbnail else None
+    card["trailer_hls_url"] = film.trailer_hls_url
+    return card
+
+
+def film_cards(films, with_duration=False):
+    """
+    Serialize a queryset or list of films. Querysets are narrowed with
+    card_queryset(); lists of instances get their genres prefetched in one query.
+    """
+    if isinstance(films, QuerySet):
+        films = list(card_queryset(films))
+    else:
+        films = list(films)
+        prefetch_related_objects(films, genre_prefetch())
+    return [film_card(f, with_duration=with_duration) for f in films]
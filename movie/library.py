@@ -0,0 +1,64 @@
+"""
+"My Library" read model.
+
+A page of library entries costs a constant number of queries: one conditional
+aggregate for the buy/rent stats, the paginator's COUNT, and ONE query for the
+page itself (film columns via select_related, the viewer's `current_watch_time`
+via a FilmView subquery), instead of a film fetch + FilmView query per row.
+
+Rental expiry is evaluated at read time (`end_date` vs now): GET requests no
+longer run an UPDATE to expire rentals (the `expire_rentals` command does, see
+rentals.py).
+"""
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import FilmView, MyFilms
+from .rentals import unexpired
+
+ENTRY_FIELDS = (
+    "id", "access_type", "status", "start_date", "end_date",
+    "film__id", "film__title", "film__film_type", "film__full_film_duration", "film__thumbnail", "film__film_hls_url",
+)
+
+
+def library_queryset(user, now=None):
+    """The user's active, unexpired titles, newest first."""
+    return MyFilms.objects.filter(unexpired(now), user=user, status__iexact="active").order_by("-start_date", "-id")
+
+
+def library_stats(queryset):
+    """{"total_buy", "total_rent"} in one conditional aggregate."""
+    return queryset.order_by().aggregate(
+        total_buy=Count("id", filter=Q(access_type__iexact="Buy")),
+        total_rent=Count("id", filter=Q(access_type__iexact="Rent")),
+    )
+
+
+def with_watch_progress(queryset, user):
+    """Narrow to entry columns, join the film and annotate the viewer's current_watch_time."""
+    watch_time = FilmView.objects.filter(film=OuterRef("film"), viewer=user).values("current_watch_time")[:1]
+    return (
+        queryset.select_related("film")
+        .only(*ENTRY_FIELDS)
+        .annotate(current_watch_time=Coalesce(Subquery(watch_time), Value(0), output_field=IntegerField()))
+    )
+
+
+def library_entry(entry):
+    film = entry.film
+    full_duration = film.full_film_duration or 1  # avoid division by zero
+    progress_percent = min(round((entry.current_watch_time / full_duration) * 100, 2), 100.0)
+    return {
+        "film_id": film.id,
+        "title": film.title,
+        "film_type": film.get_film_type_display(),
+        "full_film_duration": film.full_film_duration,
+        "access_type": "Purchase" if entry.access_type == "Buy" else "Rented",
+        "status": entry.status,
+        "expiry_time": entry.end_date if entry.access_type == "Rent" else None,
+        "thumbnail": film.thumbnail.url if film.thumbnail else None,
+        "film_hls_url": None if entry.status == "Expired" else film.film_hls_url,
+        "watch_progress": progress_percent,
+        "current_watch_time": entry.current_watch_time,
+    }
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from movie import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild FilmDailyStats rollups from FilmPlayView and Transaction (safe to re-run; run once after deploying rollups)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, default=None, help="First day (YYYY-MM-DD), default: earliest data.")
+        parser.add_argument("--until", type=date.fromisoformat, default=None, help="Last day (YYYY-MM-DD), default: today.")
+        parser.add_argument("--film", type=str, action="append", dest="film_ids", help="Only this film id (repeatable).")
+        parser.add_argument("--days-per-batch", type=int, default=31)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        written = rollups.backfill(
+            since=opts["since"],
+            until=opts["until"],
+            film_ids=opts["film_ids"],
+            days_per_batch=opts["days_per_batch"],
+            batch_size=opts["batch_size"],
+        )
+        self.stdout.write(f"Wrote {written} daily stats row(s)")
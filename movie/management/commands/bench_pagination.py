@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarks import Timer, scratch_database, make_films, make_users
+from movie.models import Film
+from movie.pagination import MyPagination, encode_cursor
+
+
+class Command(BaseCommand):
+    help = "Page-number vs keyset cursor latency at increasing depth of a filmmaker's titles (scratch DB)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--depths", default="1,100,1000,4000", help="Page numbers to measure.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        size = opts["page_size"]
+        with scratch_database():
+            filmmaker = make_users(1, prefix="maker")[0]
+            make_films(opts["rows"], filmmaker)
+            titles = Film.objects.filter(filmmaker=filmmaker).order_by("-created_at", "-id")
+            ordering = ("-created_at", "-id")
+
+            self.stdout.write(f"{opts['rows']:,d} titles, {size} per page")
+            for page in [int(d) for d in opts["depths"].split(",")]:
+                if (page - 1) * size >= opts["rows"]:
+                    continue
+                # the cursor a client would hold after walking to this page
+                cursor = None
+                if page > 1:
+                    last = titles.values_list("created_at", "id")[(page - 1) * size - 1]
+                    cursor = encode_cursor(list(last))
+
+                numbered = self._measure(titles, {"page": page, "page_size": size}, ordering, opts["repeat"])
+                params = {"cursor": cursor} if cursor else {"pagination": "cursor"}
+                keyset = self._measure(titles, {**params, "page_size": size}, ordering, opts["repeat"])
+                self.stdout.write(
+                    f"page {page:>6d}  page-number p50 {numbered['p50_ms']:8.3f} ms  "
+                    f"cursor p50 {keyset['p50_ms']:8.3f} ms"
+                )
+
+    def _measure(self, queryset, params, ordering, repeat):
+        factory = APIRequestFactory()
+        timer = Timer()
+        for _ in range(repeat):
+            request = Request(factory.get("/", params))
+            paginator = MyPagination(ordering=ordering)
+            with timer.measure():
+                rows = paginator.paginate_queryset(queryset, request)
+                len(rows)
+                paginator.get_count()
+        return timer.summary()
@@ -0,0 +1,35 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie import playback_tokens
+
+
+class Command(BaseCommand):
+    help = "Playback token issue / verify throughput (in memory, no DB)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tokens", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        count = opts["tokens"]
+        pairs = [(f"u{rng.randrange(10**9):09d}", f"f{rng.randrange(10**6):06d}") for _ in range(count)]
+        now = time.time()
+
+        start = time.perf_counter()
+        tokens = [playback_tokens.issue(user_id, film_id, now=now)[0] for user_id, film_id in pairs]
+        issue_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for token, (_, film_id) in zip(tokens, pairs):
+            playback_tokens.verify(token, film_id=film_id, now=now)
+        verify_s = time.perf_counter() - start
+
+        for label, elapsed in (("issue", issue_s), ("verify", verify_s)):
+            self.stdout.write(
+                f"{label:7s} {count / elapsed:12,.0f} tokens/s  ({elapsed * 1e6 / count:6.2f} us/token, {count} tokens)"
+            )
+        self.stdout.write(f"token size {len(tokens[0])} bytes")
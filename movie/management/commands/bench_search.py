@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import Timer
+from movie.search import SearchDocument, make_index
+
+SYLLABLES = ["ka", "ri", "mo", "ne", "ta", "lu", "shi", "ven", "dor", "al", "ex", "qui", "zo", "ber", "an", "tor"]
+GENRES = [
+    "Drama", "Thriller", "Comedy", "Horror", "Noir", "Romance", "Action", "Documentary", "Sci-Fi", "Western",
+    "Animation", "Crime", "Mystery", "Fantasy", "War", "Musical", "Family", "Sport", "History", "Biography",
+]
+
+
+class Command(BaseCommand):
+    help = "Search latency (p50/p99) per backend on synthetic catalogs of 10k / 100k / 1M films (in memory, no DB)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000")
+        parser.add_argument("--backends", default="fts5,python")
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("--vocabulary", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        vocab = self._vocabulary(rng, opts["vocabulary"])
+
+        for size in [int(s) for s in opts["sizes"].split(",")]:
+            docs = [self._document(rng, vocab, i) for i in range(size)]
+            queries = self._queries(rng, docs, opts["queries"])
+            for backend in opts["backends"].split(","):
+                index = make_index(backend)
+                start = time.perf_counter()
+                index.build(docs)
+                build_s = time.perf_counter() - start
+
+                timer = Timer()
+                for query in queries:
+                    with timer.measure():
+                        index.search(query, limit=10)
+                stats = timer.summary()
+                self.stdout.write(
+                    f"{size:>9,d} films  {backend:6s}  build {build_s:7.2f}s  "
+                    f"p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms"
+                )
+                del index
+            del docs
+
+    def _vocabulary(self, rng, size):
+        words = set()
+        while len(words) < size:
+            words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+        return sorted(words)
+
+    def _document(self, rng, vocab, i):
+        title = " ".join(rng.choice(vocab).title() for _ in range(rng.randint(1, 4)))
+        logline = " ".join(rng.choice(vocab) for _ in range(rng.randint(6, 12)))
+        return SearchDocument(f"f{i:09d}", title, logline, rng.sample(GENRES, rng.randint(1, 2)))
+
+    def _queries(self, rng, docs, count):
+        queries = []
+        for _ in range(count):
+            words = rng.choice(docs).title.lower().split()
+            if len(words) > 1 and rng.random() < 0.3:
+                last = words[1]
+                queries.append(f"{words[0]} {last[:rng.randint(1, len(last))]}")  # "word pre" typeahead
+            else:
+                word = rng.choice(words)
+                queries.append(word[:rng.randint(2, len(word))])  # prefix of a title word
+        return queries
@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.benchmarks import scratch_database, make_users, make_films
+from movie.models import Film
+from movie.telemetry import telemetry_buffer
+from movie.views import RecordFilmViewAPIView, RecordWatchTimeAPIView
+
+
+class Command(BaseCommand):
+    help = "Compare events/sec of the per-request telemetry path against the buffered pipeline (scratch DB)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=5000)
+        parser.add_argument("--films", type=int, default=20)
+        parser.add_argument("--viewers", type=int, default=200)
+        parser.add_argument("--heartbeats-per-play", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        with scratch_database():
+            filmmaker = make_users(1, prefix="maker")[0]
+            viewers = make_users(opts["viewers"], prefix="viewer")
+            films = make_films(opts["films"], filmmaker)
+
+            rng = random.Random(opts["seed"])
+            events = []
+            every = opts["heartbeats_per_play"] + 1
+            for i in range(opts["events"]):
+                kind = "view" if i % every == 0 else "watch"
+                events.append((kind, rng.choice(films).id, rng.choice(viewers), rng.randint(5, 30)))
+
+            direct = self._run(events, buffered=False)
+            self._reset()
+            buffered = self._run(events, buffered=True)
+
+        for label, elapsed in (("per-request", direct), ("buffered", buffered)):
+            self.stdout.write(
+                f"{label:12s} {len(events) / elapsed:10.0f} events/s  ({elapsed:.3f}s for {len(events)} events)"
+            )
+        self.stdout.write(f"speedup      {direct / buffered:.1f}x")
+
+    def _reset(self):
+        from movie import rollups
+        from movie.models import FilmView, FilmPlayView
+        from movie.playback import recent_plays
+
+        recent_plays.clear()  # sessions point at the play rows deleted below
+        rollups.pending.clear()
+        FilmView.objects.all().delete()
+        FilmPlayView.objects.all().delete()
+        Film.objects.update(total_views=0, unique_views=0, total_watch_time=0)
+
+    def _run(self, events, buffered):
+        factory = APIRequestFactory()
+        view_endpoint = RecordFilmViewAPIView.as_view()
+        watch_endpoint = RecordWatchTimeAPIView.as_view()
+
+        with override_settings(TELEMETRY_BUFFERED=buffered, TELEMETRY_FLUSH_INTERVAL=0):
+            start = time.perf_counter()
+            for kind, film_id, viewer, seconds in events:
+                if kind == "view":
+                    request = factory.post("/api/flims/views-count", {"film_id": film_id}, format="json")
+                    force_authenticate(request, user=viewer)
+                    view_endpoint(request)
+                else:
+                    request = factory.post(
+                        "/api/flims/watch-time-count", {"film_id": film_id, "watch_time": seconds}, format="json"
+                    )
+                    force_authenticate(request, user=viewer)
+                    watch_endpoint(request)
+            if buffered:
+                telemetry_buffer.flush()
+            elapsed = time.perf_counter() - start
+        return elapsed
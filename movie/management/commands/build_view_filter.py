@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from movie.view_filter import unique_views
+
+
+class Command(BaseCommand):
+    help = "Rebuild the unique-view Bloom filter from FilmView and save it for the workers to load (VIEW_FILTER_PATH)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **opts):
+        unique_views.build(batch_size=opts["batch_size"])
+        if unique_views.path:
+            unique_views.save()
+            self.stdout.write(f"Saved to {unique_views.path}")
+        else:
+            self.stdout.write("In-memory database: nothing saved")
+
+        stats = unique_views.stats()
+        self.stdout.write(
+            f"{stats['items']} pairs, {stats['memory_bytes'] / 1024:.1f} KiB "
+            f"({stats['bits']} bits, {stats['hashes']} hashes), "
+            f"expected false-positive rate {stats['expected_fp_rate']:.4%}"
+        )
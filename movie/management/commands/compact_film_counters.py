@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie import counters as film_counters
+
+
+class Command(BaseCommand):
+    help = "Fold FilmCounterShard rows back into the Film counter columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--loop", type=float, default=0, help="Repeat every N seconds (0 = run once).")
+
+    def handle(self, *args, **opts):
+        while True:
+            compacted = film_counters.compact(batch_size=opts["batch_size"])
+            self.stdout.write(f"Compacted counters for {compacted} film(s)")
+            if not opts["loop"]:
+                break
+            time.sleep(opts["loop"])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from movie import rentals
+
+
+class Command(BaseCommand):
+    help = "Mark MyFilms rentals past their end_date as expired (bounded batches, one rental_expired signal each)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after N batches (default: all due).")
+        parser.add_argument(
+            "--loop", type=float, default=0,
+            help="Keep running, waking at the next rental deadline or every N seconds, whichever is sooner.",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["loop"]:
+            rentals.run_forever(interval=opts["loop"], batch_size=opts["batch_size"], log=self.stdout.write)
+            return
+        expired = rentals.expire_due(batch_size=opts["batch_size"], max_batches=opts["max_batches"])
+        self.stdout.write(f"Expired {expired} rental(s)")
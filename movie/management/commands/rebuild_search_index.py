@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from movie import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the film search index from the database (the shared index file, see movie/search.py)."
+
+    def handle(self, *args, **opts):
+        indexed = search.rebuild_index()
+        self.stdout.write(f"Indexed {indexed} published film(s)")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from movie import feed_cache, trending
+
+
+class Command(BaseCommand):
+    help = "Rebuild time-decayed trending scores from FilmPlayView."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--window-days", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        written = trending.recompute(window_days=opts["window_days"], batch_size=opts["batch_size"])
+        feed_cache.bump_version()
+        self.stdout.write(f"Recomputed trending scores for {written} film(s)")
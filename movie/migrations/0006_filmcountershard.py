@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0005_film_thumbnail_public_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('total_views', models.PositiveIntegerField(default=0)),
+                ('unique_views', models.PositiveIntegerField(default=0)),
+                ('total_watch_time', models.PositiveIntegerField(default=0)),
+                ('film', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='movie.film')),
+            ],
+            options={
+                'unique_together': {('film', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0006_filmcountershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmTrendingScore',
+            fields=[
+                ('film', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='movie.film')),
+                ('is_published', models.BooleanField(default=False)),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_published', '-score'], name='movie_filmt_is_publ_8a9c95_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0007_filmtrendingscore'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filmplayview',
+            index=models.Index(fields=['film', 'viewed_at'], name='movie_filmp_film_id_a688ac_idx'),
+        ),
+    ]
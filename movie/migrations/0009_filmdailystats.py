@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0008_filmplayview_movie_filmp_film_id_a688ac_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('watch_seconds', models.PositiveBigIntegerField(default=0)),
+                ('buy_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rent_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('buy_earning', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rent_earning', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('commission_earning', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('film', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='movie.film')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='movie_filmd_day_3b9f1e_idx')],
+                'unique_together': {('film', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0009_filmdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filmdailystats',
+            name='viewer_sketch',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0010_filmdailystats_viewer_sketch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='myfilms',
+            index=models.Index(fields=['status', 'end_date'], name='movie_myfil_status_dd5ac6_idx'),
+        ),
+    ]
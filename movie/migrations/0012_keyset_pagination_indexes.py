@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0011_myfilms_status_end_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='film',
+            index=models.Index(fields=['filmmaker', 'created_at'], name='movie_film_filmmak_a72a30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='myfilms',
+            index=models.Index(fields=['user', 'start_date'], name='movie_myfil_user_id_4ce091_idx'),
+        ),
+    ]
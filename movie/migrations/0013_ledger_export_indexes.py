@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0012_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='myfilms',
+            index=models.Index(fields=['start_date', 'id'], name='movie_myfil_start_d_870ba7_idx'),
+        ),
+    ]
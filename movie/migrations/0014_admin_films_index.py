@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0013_ledger_export_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='film',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='movie_film_status_997df5_idx'),
+        ),
+    ]
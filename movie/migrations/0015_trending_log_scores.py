@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:29
+
+import math
+
+from django.db import migrations, models
+
+NO_PLAYS = -1e9
+
+
+def scores_to_log2(apps, schema_editor):
+    """Linear forward-decay sums -> log2 (0 / overflowed rows -> no plays; recompute_trending refills them)."""
+    FilmTrendingScore = apps.get_model("movie", "FilmTrendingScore")
+    rows = []
+    for row in FilmTrendingScore.objects.only("film_id", "score").iterator(chunk_size=1000):
+        row.score = math.log2(row.score) if 0 < row.score < math.inf else NO_PLAYS
+        rows.append(row)
+    FilmTrendingScore.objects.bulk_update(rows, ["score"], batch_size=1000)
+
+
+def scores_to_linear(apps, schema_editor):
+    FilmTrendingScore = apps.get_model("movie", "FilmTrendingScore")
+    rows = []
+    for row in FilmTrendingScore.objects.only("film_id", "score").iterator(chunk_size=1000):
+        row.score = 0.0 if row.score <= NO_PLAYS else 2.0 ** min(row.score, 1023.0)
+        rows.append(row)
+    FilmTrendingScore.objects.bulk_update(rows, ["score"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0014_admin_films_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='filmtrendingscore',
+            name='score',
+            field=models.FloatField(default=-1000000000.0),
+        ),
+        migrations.RunPython(scores_to_log2, scores_to_linear),
+    ]
@@ -77,6 +77,10 @@ class Film(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["filmmaker", "created_at"]),  # My titles (keyset pages)
+            models.Index(fields=["status", "created_at", "id"]),  # admin moderation queue / tracking list
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug or (self.pk and Film.objects.filter(pk=self.pk, title=self.title).exists() is False):
@@ -121,11 +125,72 @@ class FilmPlayView(models.Model):
 
     class Meta:
         ordering = ['-viewed_at']
+        indexes = [
+            models.Index(fields=['film', 'viewed_at']),  # per-film analytics ranges
+        ]
 
     def __str__(self):
         return f"{self.viewer} viewed {self.film.title} at {self.viewed_at}"
 
 
+# Sharded hot counters per Flims (folded back into Film by compact_film_counters)
+class FilmCounterShard(models.Model):
+    film = models.ForeignKey(Film, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    total_views = models.PositiveIntegerField(default=0)
+    unique_views = models.PositiveIntegerField(default=0)
+    total_watch_time = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('film', 'shard')
+
+    def __str__(self):
+        return f"{self.film_id} shard {self.shard}"
+
+
+# Time-decayed trending score per Flims (see movie/trending.py)
+NO_TRENDING_PLAYS = -1e9  # FilmTrendingScore.score without plays (log2 of 0, see trending.py)
+
+
+class FilmTrendingScore(models.Model):
+    film = models.OneToOneField(Film, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    is_published = models.BooleanField(default=False)  # copy of Film.status so the index covers the filter
+    score = models.FloatField(default=NO_TRENDING_PLAYS)  # log2 of sum of 2^((viewed_at - TRENDING_EPOCH) / half-life)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_published', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.film_id} trending {self.score}"
+
+
+# Per film per day rollup for analytics/reports (see movie/rollups.py)
+class FilmDailyStats(models.Model):
+    film = models.ForeignKey(Film, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    plays = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    watch_seconds = models.PositiveBigIntegerField(default=0)
+    buy_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)   # paid by buyers
+    rent_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # paid by renters
+    buy_earning = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # filmmaker share
+    rent_earning = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # filmmaker share
+    commission_earning = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # affiliate share
+    viewer_sketch = models.BinaryField(default=b"", blank=True)  # HyperLogLog of the day's viewers (see hll.py)
+
+    class Meta:
+        unique_together = ('film', 'day')
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.film_id} on {self.day}"
+
+
 
 
 #
@@ -152,6 +217,11 @@ class MyFilms(models.Model):
         verbose_name_plural = "My Films"
         # unique_together = ("user", "film", "access_type")
         ordering = ["-start_date"]  # ✅ Ensures stable ordering for pagination
+        indexes = [
+            models.Index(fields=["status", "end_date"]),  # rental expiry scan (see rentals.py)
+            models.Index(fields=["user", "start_date"]),  # My library (keyset pages)
+            models.Index(fields=["start_date", "id"]),  # ledger export (resume point)
+        ]
 
     def save(self, *args, **kwargs):
         # Fix: rental_hours is in hours, use timedelta(hours=...)
@@ -0,0 +1,153 @@
+"""
+Pagination for the "My ..." list endpoints.
+
+`MyPagination` is DRF page-number pagination (`?page=N&page_size=M`) plus an
+opt-in keyset mode: `?pagination=cursor` (or any `?cursor=`) walks the queryset
+by its ordering columns, e.g. (created_at, id), with opaque next/previous
+cursors. A deep page is then an index range seek instead of an OFFSET scan,
+and the COUNT(*) is skipped unless the client asks for it (`?with_count=1`).
+Plain lists (not querysets) always use page numbers.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+TRUTHY = ("1", "true", "yes")
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(values, reverse); raises ValueError for anything that isn't one of ours."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return list(data["v"]), bool(data["r"])
+    except (TypeError, KeyError, UnicodeDecodeError, json.JSONDecodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Rows strictly after `values` in `ordering` (e.g. ("-created_at", "-id")):
+    a <= v1 AND ((a < v1) OR (a = v1 AND b < v2) ...), flipped for ascending
+    fields / `reverse`. The redundant leading bound lets the index seek.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith("-")
+        name = field.lstrip("-")
+        lookup = "lt" if descending != reverse else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    first = ordering[0]
+    bound = "lte" if first.startswith("-") != reverse else "gte"
+    return Q(**{f"{first.lstrip('-')}__{bound}": values[0]}) & condition
+
+
+def flip(ordering):
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+class MyPagination(PageNumberPagination):
+    page_size = 10                   # default items per page
+    page_size_query_param = "page_size"  # frontend can set ?page_size=20
+    max_page_size = 100
+
+    mode_query_param = "pagination"
+    cursor_query_param = "cursor"
+    count_query_param = "with_count"
+
+    def __init__(self, ordering=("-created_at", "-id"), default_mode="page"):
+        self.ordering = list(ordering)  # keyset columns; the last one must be unique
+        self.default_mode = default_mode  # "cursor" makes keyset the default (?pagination=page opts out)
+        self.cursor_mode = False
+
+    def wants_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param, self.default_mode) == "cursor"
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if not isinstance(queryset, QuerySet) or not self.wants_cursor(request):
+            return super().paginate_queryset(queryset, request, view)
+        return self._paginate_keyset(queryset, request)
+
+    # ---- keyset mode ----
+    def _paginate_keyset(self, queryset, request):
+        self.cursor_mode = True
+        size = self.get_page_size(request)
+        model = queryset.model
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, "").lower() in TRUTHY:
+            self.count = queryset.count()
+
+        reverse = False
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                values, reverse = decode_cursor(cursor)
+                fields = [model._meta.get_field(f.lstrip("-")) for f in self.ordering]
+                values = [field.to_python(value) for field, value in zip(fields, values)]
+            except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+                raise NotFound("Invalid cursor")
+            if len(values) != len(self.ordering):
+                raise NotFound("Invalid cursor")
+            queryset = queryset.filter(keyset_filter(self.ordering, values, reverse))
+
+        rows = list(queryset.order_by(*(flip(self.ordering) if reverse else self.ordering))[: size + 1])
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        # forward: a next page if we over-fetched, a previous one if we came from a cursor;
+        # backward: the mirror image
+        has_next, has_previous = (bool(cursor), more) if reverse else (more, bool(cursor))
+        self.next_cursor = encode_cursor(self._position(rows[-1])) if rows and has_next else None
+        self.previous_cursor = encode_cursor(self._position(rows[0]), reverse=True) if rows and has_previous else None
+        return rows
+
+    def _position(self, row):
+        return [getattr(row, field.lstrip("-")) for field in self.ordering]
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    # ---- shared accessors (both modes) ----
+    def get_count(self):
+        """Total rows, or None in cursor mode unless ?with_count=1."""
+        return self.count if self.cursor_mode else self.page.paginator.count
+
+    def get_next_link(self):
+        return self._link(self.next_cursor) if self.cursor_mode else super().get_next_link()
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor) if self.cursor_mode else super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            "count": self.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
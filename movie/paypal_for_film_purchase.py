@@ -12,8 +12,10 @@ from rest_framework import status
 import paypalrestsdk
 
 from .models import Film, MyFilms
-from accounts.models import User
-from subscription.models import Wallet, Transaction
+from . import entitlements
+from accounts import user_cache
+from subscription.models import Transaction
+from subscription.ledger import FilmSale, PreconditionFailed
 
 # ---------------- PAYPAL CONFIG ----------------
 paypalrestsdk.configure({
@@ -40,7 +42,7 @@ class CreatePaypalFilmPurchaseView(APIView):
             return Response({"message": "Invalid film price"}, status=400)
 
         # Check if user already owns the film
-        if MyFilms.objects.filter(user=user, film=film, status="active").exists():
+        if entitlements.can_watch(user, film):
             return Response({"message": "You already own this film"}, status=400)
 
         txn_id = f"buy_{uuid.uuid4().hex[:12]}"
@@ -106,7 +108,7 @@ class ExecutePaypalFilmPurchaseView(APIView):
         if not film:
             return Response({"message": "Film not found"}, status=404)
 
-        platform_user = User.objects.filter(is_platform=True).first()
+        platform_user = user_cache.platform_user_id()
         if not platform_user:
             return Response({"message": "Platform user not configured"}, status=500)
 
@@ -122,7 +124,8 @@ class ExecutePaypalFilmPurchaseView(APIView):
         if payment.execute({"payer_id": payer_id}):
             try:
                 with transaction.atomic():
-                    transaction_obj = Transaction.objects.select_related("user").get(
+                    # locked: a replayed redirect waits here, then finds the payment no longer pending
+                    transaction_obj = Transaction.objects.select_for_update().select_related("user").get(
                         txn_id=txn_id, status="pending"
                     )
                     transaction_obj.status = "completed"
@@ -145,7 +148,12 @@ class ExecutePaypalFilmPurchaseView(APIView):
                         paypal_fee   = Decimal("0.00")
                         net_amount   = Decimal(price)
 
-                    # ---- Record Film ownership ----
+                    # ---- Revenue Split (based on net_amount) as one ledger unit ----
+                    referrer = user_cache.referrer_id(referral_code, exclude=user)
+                    film_sale = FilmSale(film, "buy", "paypal", txn_id, price, platform_user, referrer=referrer, net_amount=net_amount)
+                    film_sale.commit(precondition=lambda: not MyFilms.objects.filter(txn_id=txn_id).exists())
+
+                    # ---- Record Film ownership (after the split: the precondition checks it) ----
                     MyFilms.objects.create(
                         user=user,
                         film=film,
@@ -156,70 +164,7 @@ class ExecutePaypalFilmPurchaseView(APIView):
                         status="active"
                     )
 
-                    # ---- Revenue Split (based on net_amount) ----
-                    filmmaker_share = (net_amount * Decimal("0.70")).quantize(Decimal("0.01"))
-                    affiliate_share = Decimal("0.00")
-                    platform_share  = (net_amount - filmmaker_share).quantize(Decimal("0.01"))
-
-                    # ---- Affiliate commission ----
-                    if referral_code:
-                        referrer = User.objects.filter(distro_code=referral_code).first()
-                        if referrer and referrer != user:
-                            affiliate_share = (net_amount * Decimal("0.20")).quantize(Decimal("0.01"))
-                            filmmaker_share = (net_amount * Decimal("0.70")).quantize(Decimal("0.01"))
-                            platform_share  = (net_amount - filmmaker_share - affiliate_share).quantize(Decimal("0.01"))
-
-                            # Credit affiliate wallet
-                            aff_wallet, _ = Wallet.objects.get_or_create(user=referrer)
-                            aff_wallet.distro_balance += affiliate_share
-                            aff_wallet.save()
-
-                            Transaction.objects.create(
-                                user=referrer,
-                                film=film,
-                                source="paypal",
-                                tx_type="commission",
-                                amount=affiliate_share,
-                                txn_id=f"aff_{txn_id}",
-                                balance_type="distro",
-                                status="completed",
-                                description=f"Affiliate commission for film {film.title}"
-                            )
-
-                    # ---- Filmmaker payout ----
-                    if film.filmmaker:
-                        maker_wallet, _ = Wallet.objects.get_or_create(user=film.filmmaker)
-                        maker_wallet.reel_bux_balance += filmmaker_share
-                        maker_wallet.save()
-
-                        Transaction.objects.create(
-                            user=film.filmmaker,
-                            film=film,
-                            source="paypal",
-                            tx_type="filmmaker_earning",
-                            amount=filmmaker_share,
-                            txn_id=f"maker_{txn_id}",
-                            balance_type="reelbux",
-                            status="completed",
-                            description=f"Earning for film {film.title}",
-                        )
-
-                    # ---- Platform payout ----
-                    platform_wallet, _ = Wallet.objects.get_or_create(user=platform_user)
-                    platform_wallet.reel_bux_balance += platform_share
-                    platform_wallet.save()
-
-                    Transaction.objects.create(
-                        user=platform_user,
-                        film=film,
-                        source="paypal",
-                        tx_type="platform_earning",
-                        amount=platform_share,
-                        txn_id=f"platform_{txn_id}",
-                        balance_type="reelbux",
-                        status="completed",
-                        description=f"Platform earning for film {film.title}",
-                    )
+                    filmmaker_share, affiliate_share, platform_share = film_sale.split
 
                     # ---- Update buyer transaction with net amount and fee ----
                     transaction_obj.amount = price
@@ -227,11 +172,8 @@ class ExecutePaypalFilmPurchaseView(APIView):
                     transaction_obj.description = f"Paid {price} USD for {film.title} (PayPal fee: {paypal_fee})"
                     transaction_obj.save(update_fields=["amount", "status", "description"])
 
-                    # ---- Update Film total earning & total buy earning ----
-                    film.total_earning = (film.total_earning or Decimal("0.00")) + filmmaker_share.quantize(Decimal("0.00"))
-                    film.total_buy_earning = (film.total_buy_earning or Decimal("0.00")) + filmmaker_share.quantize(Decimal("0.00"))
-                    film.save(update_fields=["total_earning", "total_buy_earning"])
-
+            except PreconditionFailed:
+                return Response({"status": "already recorded"})
             except Exception as e:
                 return Response({"message": "Failed to record purchase", "error": str(e)}, status=500)
 
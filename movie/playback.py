@@ -0,0 +1,184 @@
+"""
+Playback sessions.
+
+`playback/start` records one play (a `FilmPlayView` row, plus the viewer's
+`FilmView` and counters) and returns a signed `session_id` that carries the
+ids of those rows. `playback/heartbeat` then updates both rows by primary key:
+no per-heartbeat `order_by('-viewed_at').first()` scans.
+
+Repeated starts (retries, double taps, player re-inits) for the same
+(film, viewer) within `PLAYBACK_SESSION_WINDOW` seconds reuse the open session
+instead of inserting another play. The open sessions live in a bounded
+in-process LRU (`recent_plays`), which the legacy views-count /
+watch-time-count endpoints share.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import F
+
+from .models import FilmPlayView, FilmView
+from . import counters as film_counters
+from . import rollups, trending
+from .view_filter import unique_views
+from .telemetry import telemetry_buffer, write_latency
+
+SALT = "movie.playback"
+
+Session = namedtuple("Session", "film_id viewer_id play_id view_id started")
+
+
+def session_window():
+    return getattr(settings, "PLAYBACK_SESSION_WINDOW", 300)
+
+
+def session_max_age():
+    return getattr(settings, "PLAYBACK_SESSION_MAX_AGE", 6 * 3600)
+
+
+class RecentPlays:
+    """Bounded LRU of the latest session per (film_id, viewer_id)."""
+
+    def __init__(self, max_size=None):
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._max_size = max_size
+
+    @property
+    def max_size(self):
+        return self._max_size or getattr(settings, "PLAYBACK_SESSION_CACHE_SIZE", 100000)
+
+    def latest(self, film_id, viewer_id):
+        """Last session started in this process for the pair (any age)."""
+        with self._lock:
+            session = self._sessions.get((film_id, viewer_id))
+            if session is not None:
+                self._sessions.move_to_end((film_id, viewer_id))
+            return session
+
+    def open(self, film_id, viewer_id):
+        """The pair's session if it started less than PLAYBACK_SESSION_WINDOW seconds ago."""
+        session = self.latest(film_id, viewer_id)
+        if session is not None and time.monotonic() - session.started < session_window():
+            return session
+        return None
+
+    def live(self, film_id, viewer_id):
+        """The pair's session if it started less than PLAYBACK_SESSION_MAX_AGE seconds ago."""
+        session = self.latest(film_id, viewer_id)
+        if session is not None and time.monotonic() - session.started < session_max_age():
+            return session
+        return None
+
+    def remember(self, session):
+        with self._lock:
+            self._sessions[(session.film_id, session.viewer_id)] = session
+            self._sessions.move_to_end((session.film_id, session.viewer_id))
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def forget(self, film_id, viewer_id, unsaved_only=False):
+        """Drop the pair's session (with `unsaved_only`, only one that has no play row yet)."""
+        with self._lock:
+            session = self._sessions.get((film_id, viewer_id))
+            if session is not None and not (unsaved_only and session.play_id is not None):
+                del self._sessions[(film_id, viewer_id)]
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+recent_plays = RecentPlays()
+
+
+# ---- session ids ----
+def session_id(session):
+    return signing.dumps(
+        {"f": session.film_id, "v": session.viewer_id, "p": session.play_id, "u": session.view_id}, salt=SALT
+    )
+
+
+def read_session_id(value):
+    """Session for a signed id; raises signing.BadSignature (or SignatureExpired)."""
+    data = signing.loads(value, salt=SALT, max_age=session_max_age())
+    return Session(data["f"], data["v"], data["p"], data["u"], None)
+
+
+# ---- writes ----
+def record_play(film_id, viewer_id):
+    """
+    One play: FilmPlayView row, unique FilmView and counters in one transaction;
+    trending, the rollup and the open session follow once it commits. Returns a Session.
+    """
+    with transaction.atomic():
+        first_today = rollups.is_first_play_today(film_id, viewer_id)
+        play = FilmPlayView.objects.create(film_id=film_id, viewer_id=viewer_id)
+        # repeat viewers are the common case: the Bloom filter skips the SELECT for new ones
+        view_id, created = unique_views.get_or_create(film_id, viewer_id, defaults={"watch_time": 0})
+        # increment total (and unique) views on a counter shard, not the hot Film row
+        film_counters.increment(film_id, total_views=1, unique_views=1 if created else 0)
+
+        session = Session(film_id, viewer_id, play.pk, view_id, time.monotonic())
+        transaction.on_commit(lambda: trending.record_plays(film_id))
+        rollups.pending.add(film_id, viewer_id if first_today else None, plays=1, unique_viewers=1 if first_today else 0)
+        transaction.on_commit(lambda: recent_plays.remember(session))
+    return session
+
+
+def start(film_id, viewer_id):
+    """(session, deduplicated): reuse the open session for the pair, or record a new play."""
+    session = recent_plays.open(film_id, viewer_id)
+    if session is not None and session.play_id is not None:
+        return session, True
+    return record_play(film_id, viewer_id), False
+
+
+def claim_play(film_id, viewer_id):
+    """
+    For plays written later in bulk (buffer / batch endpoint): False if the pair
+    already has an open session, else open one without row ids and return True.
+    """
+    if recent_plays.open(film_id, viewer_id) is not None:
+        return False
+    recent_plays.remember(Session(film_id, viewer_id, None, None, time.monotonic()))
+    return True
+
+
+def release_play(film_id, viewer_id):
+    """Undo claim_play() when the bulk write it was made for failed."""
+    recent_plays.forget(film_id, viewer_id, unsaved_only=True)
+
+
+def start_buffered(film_id, viewer_id):
+    """start() for TELEMETRY_BUFFERED: the play is queued (no row id yet). Returns `deduplicated`."""
+    if not claim_play(film_id, viewer_id):
+        return True
+    telemetry_buffer.record_view(film_id, viewer_id)
+    return False
+
+
+def record_watch_time(session, watch_time):
+    """
+    Add a heartbeat to the session's rows by primary key, in one transaction.
+    Returns False (and writes nothing) if the play row is gone.
+    """
+    started = time.monotonic()
+    with transaction.atomic():
+        if not FilmPlayView.objects.filter(pk=session.play_id).update(watch_time=F("watch_time") + watch_time):
+            return False
+        FilmView.objects.filter(pk=session.view_id).update(
+            watch_time=F("watch_time") + watch_time, current_watch_time=watch_time
+        )
+        film_counters.increment(session.film_id, total_watch_time=watch_time)
+        # queued once the transaction commits
+        rollups.pending.add(session.film_id, watch_seconds=watch_time)
+    write_latency.observe(time.monotonic() - started)
+    return True
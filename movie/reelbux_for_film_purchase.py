@@ -1,5 +1,4 @@
 import uuid
-from decimal import Decimal
 from django.utils import timezone
 from django.db import transaction
 from rest_framework.views import APIView
@@ -8,8 +7,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 
 from .models import Film, MyFilms
-from accounts.models import User
-from subscription.models import Wallet, Transaction
+from . import entitlements, rentals
+from accounts import user_cache
+from subscription.ledger import FilmSale, InsufficientBalance, PreconditionFailed
 
 
 class FilmPurchaseReelBuxView(APIView):
@@ -29,32 +29,40 @@ class FilmPurchaseReelBuxView(APIView):
         if price <= 0:
             return Response({"message": "Invalid film price"}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Check if user already owns the film
+        if entitlements.can_watch(user, film):
+            return Response({"message": "You already own this film."}, status=status.HTTP_400_BAD_REQUEST)
+
         # 1. Get platform/system user (dedicated platform user recommended)
-        platform_user = User.objects.filter(is_platform=True).first()
+        platform_user = user_cache.platform_user_id()
         if not platform_user:
             return Response({"message": "Platform user not configured"}, status=500)
 
         # Generate unique transaction ID
         txn_id = f"buy_{uuid.uuid4().hex[:12]}"
 
-        try:
-            with transaction.atomic():
-                # --- Wallet creation inside atomic transaction ---
-                wallet, _ = Wallet.objects.select_for_update().get_or_create(user=user)
+        # Affiliate (optional)
+        referrer = user_cache.referrer_id(referral_code, exclude=user)
 
-                # Check if user already purchased this film
-                already_owned = MyFilms.objects.filter(user=user, film=film, status="active").exists()
-                if already_owned:
-                    return Response({"message": "You already own this film."}, status=status.HTTP_400_BAD_REQUEST)
+        def not_owned_yet():
+            return not rentals.has_access(user, film)
 
-                if wallet.reel_bux_balance < price:
-                    return Response({"message": "Insufficient ReelBux balance"}, status=status.HTTP_400_BAD_REQUEST)
-
-                # Deduct buyer's balance
-                wallet.reel_bux_balance -= price
-                wallet.save()
+        try:
+            with transaction.atomic():
+                # 2. Revenue split + buyer debit as one ledger unit (ownership re-checked under the wallet locks)
+                sale = FilmSale(film, "buy", "reelbux", txn_id, price, platform_user, referrer=referrer)
+                sale.debit(
+                    user, "reelbux", price,
+                    film=film,
+                    source="reelbux",
+                    tx_type="purchase",
+                    txn_id=txn_id,
+                    status="completed",
+                    description=f"Debit {price} ReelBux for film purchase",
+                )
+                wallets = sale.commit(precondition=not_owned_yet)
 
-                # 2. Create MyFilms entry
+                # 3. Create MyFilms entry
                 MyFilms.objects.create(
                     user=user,
                     film=film,
@@ -65,99 +73,20 @@ class FilmPurchaseReelBuxView(APIView):
                     end_date=None,  # lifetime
                     status="active"
                 )
-                
-                # ---- Buyer transaction log ----
-                Transaction.objects.create(
-                    user=user,
-                    film=film,
-                    source="reelbux",
-                    tx_type="purchase",
-                    amount=price,
-                    txn_id=txn_id,
-                    balance_type="reelbux",
-                    status="completed",
-                    description=f"Debit {price} ReelBux for film purchase",
-                )
-
-                # 3. Revenue split
-                filmmaker_share = price * Decimal("0.70")
-                affiliate_share = Decimal("0.00")
-                platform_share = price * Decimal("0.30")
-
-                # ---- Affiliate commission ----
-                if referral_code:
-                    referrer = User.objects.filter(distro_code=referral_code).first()
-                    if referrer and referrer != user:
-                        affiliate_share = price * Decimal("0.20")
-                        filmmaker_share = price * Decimal("0.70")
-                        platform_share = price - (filmmaker_share + affiliate_share)
-
-                        # credit affiliate wallet
-                        aff_wallet, _ = Wallet.objects.get_or_create(user=referrer)
-                        aff_wallet.distro_balance += affiliate_share
-                        aff_wallet.save()
-
-                        # log affiliate transaction
-                        Transaction.objects.create(
-                            user=referrer,
-                            film=film,
-                            source="reelbux",
-                            tx_type="commission",
-                            amount=affiliate_share,
-                            txn_id=f"aff_{txn_id}",
-                            balance_type="distro",
-                            status="completed",
-                            description=f"Affiliate commission for film {film.title}",
-                        )
-
-                # ---- Filmmaker payout ----
-                if film.filmmaker:
-                    maker_wallet, _ = Wallet.objects.get_or_create(user=film.filmmaker)
-                    maker_wallet.reel_bux_balance += filmmaker_share
-                    maker_wallet.save()
-
-                    Transaction.objects.create(
-                        user=film.filmmaker,
-                        film=film,
-                        source="reelbux",
-                        tx_type="filmmaker_earning",
-                        amount=filmmaker_share,
-                        txn_id=f"maker_{txn_id}",
-                        balance_type="reelbux",
-                        status="completed",
-                        description=f"Earning for film {film.title}",
-                    )
-
-                # ---- Platform/systems payout ----
-                platform_wallet, _ = Wallet.objects.get_or_create(user=platform_user)
-                platform_wallet.reel_bux_balance += platform_share
-                platform_wallet.save()
-
-                Transaction.objects.create(
-                    user=platform_user,
-                    film=film,
-                    source="reelbux",
-                    tx_type="platform_earning",
-                    amount=platform_share,
-                    txn_id=f"platform_{txn_id}",
-                    balance_type="reelbux",
-                    status="completed",
-                    description=f"Platform earning for film {film.title}",
-                )
-
-                # ---- Update Film total earning & total buy earning ----
-                film.total_earning = (film.total_earning or Decimal("0.00")) + filmmaker_share.quantize(Decimal("0.00"))
-                film.total_buy_earning = (film.total_buy_earning or Decimal("0.00")) + filmmaker_share.quantize(Decimal("0.00"))
-                film.save(update_fields=["total_earning", "total_buy_earning"])
 
+        except PreconditionFailed:
+            return Response({"message": "You already own this film."}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientBalance:
+            return Response({"message": "Insufficient ReelBux balance"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"message": "Purchase failed", "error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        filmmaker_share, affiliate_share, platform_share = sale.split
         return Response({
             "message": "Film purchased successfully",
             "film": film.title,
             "subscription_id": txn_id,
-            "new_balance": wallet.reel_bux_balance,
+            "new_balance": wallets[user.id].reel_bux_balance,
             "filmmaker_share": filmmaker_share,
             "affiliate_share": affiliate_share,
             "platform_share": platform_share,
@@ -0,0 +1,89 @@
+"""
+Rental expiry.
+
+Rentals end at `MyFilms.end_date`. Access checks compare `end_date` with now
+at read time, so nothing has to be written for a rental to stop working; the
+`expire_rentals` command (run from cron or with `--loop`) then flips due rows
+to "expired" in bounded batches via the MyFilms(status, end_date) index and
+sends `rental_expired` once per row so caches can drop the entitlement.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import Min, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import MyFilms
+
+ACTIVE = "active"
+EXPIRED = "expired"
+ACTIVE_STATUSES = (ACTIVE, "Active")  # the model default is "Active"; payment paths write "active"
+
+# sent after commit for every rental flipped to expired: kwargs user_id, film_id, my_film_id, end_date
+rental_expired = Signal()
+
+
+def unexpired(now=None):
+    """Purchases, and rentals whose end_date hasn't passed."""
+    return Q(access_type__iexact="Buy") | Q(end_date__isnull=True) | Q(end_date__gte=now or timezone.now())
+
+
+def has_access(user, film, now=None):
+    """True if `user` owns `film` or holds a rental that hasn't ended."""
+    return MyFilms.objects.filter(unexpired(now), user=user, film=film, status__in=ACTIVE_STATUSES).exists()
+
+
+def due(now=None):
+    """Active rentals past their end_date (an index range on (status, end_date); purchases have none)."""
+    return MyFilms.objects.filter(status__in=ACTIVE_STATUSES, end_date__lt=now or timezone.now())
+
+
+def next_deadline():
+    """The earliest end_date among active rentals, or None."""
+    return (
+        MyFilms.objects.filter(status__in=ACTIVE_STATUSES, end_date__isnull=False)
+        .aggregate(first=Min("end_date"))["first"]
+    )
+
+
+def expire_due(now=None, batch_size=500, max_batches=None):
+    """
+    Flip rentals that ended before `now` to "expired", `batch_size` rows per
+    transaction, oldest deadline first. Returns the number of rows expired.
+    """
+    now = now or timezone.now()
+    expired = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = list(
+                due(now).select_for_update().order_by("end_date").values_list("id", "user_id", "film_id", "end_date")[
+                    :batch_size
+                ]
+            )
+            if not rows:
+                break
+            MyFilms.objects.filter(id__in=[row[0] for row in rows], status__in=ACTIVE_STATUSES).update(status=EXPIRED)
+
+        for my_film_id, user_id, film_id, end_date in rows:
+            rental_expired.send(
+                sender=MyFilms, user_id=user_id, film_id=film_id, my_film_id=my_film_id, end_date=end_date
+            )
+        expired += len(rows)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+    return expired
+
+
+def run_forever(interval=60, batch_size=500, log=print):
+    """Expire due rentals, then sleep until the next deadline (at most `interval` seconds)."""
+    while True:
+        expired = expire_due(batch_size=batch_size)
+        if expired:
+            log(f"Expired {expired} rental(s)")
+        deadline = next_deadline()
+        wait = interval
+        if deadline is not None:
+            wait = min(interval, max((deadline - timezone.now()).total_seconds(), 0) + 1)
+        time.sleep(wait)
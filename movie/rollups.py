@@ -0,0 +1,362 @@
+"""
+Daily per-film rollups (`FilmDailyStats`).
+
+Analytics and report views read these instead of rescanning FilmPlayView /
+Transaction. Plays and heartbeats on the request path only queue their deltas
+in `pending` (coalesced per film and day); a daemon timer writes the queue in
+one batch every ROLLUP_FLUSH_INTERVAL seconds (inline once ROLLUP_MAX_PENDING
+rows are queued, and at exit), so a busy film costs one UPDATE per interval per
+worker instead of one per event. A worker that is killed loses at most one
+interval of deltas; the backfill recovers them. Telemetry flushes and the
+buy/rent payment paths bump rows directly.
+
+Rows are rebuilt from the raw tables with `python manage.py
+backfill_film_daily_stats` (idempotent). Run it once after deploying rollups
+so the history recorded before them shows up in MyTitles / the admin stats.
+
+Days are in the current timezone (TIME_ZONE).
+"""
+import atexit
+import logging
+import threading
+import time as clock
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Substr, TruncDate
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import FilmDailyStats, FilmPlayView, MyFilms
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = (
+    "plays", "unique_viewers", "watch_seconds",
+    "buy_amount", "rent_amount", "buy_earning", "rent_earning", "commission_earning",
+)
+
+
+def today():
+    return timezone.localdate()
+
+
+def day_start(day=None):
+    """Aware midnight starting `day` (default today)."""
+    return timezone.make_aware(datetime.combine(day or today(), time.min))
+
+
+# ---- incremental maintenance ----
+def bump(film_id, day=None, **deltas):
+    """Add `deltas` (STAT_FIELDS) to the film's row for `day` (default today)."""
+    deltas = {f: v for f, v in deltas.items() if v}
+    if not deltas:
+        return
+    day = day or today()
+    updates = {f: F(f) + v for f, v in deltas.items()}
+    if FilmDailyStats.objects.filter(film_id=film_id, day=day).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            FilmDailyStats.objects.create(film_id=film_id, day=day, **deltas)
+    except IntegrityError:
+        FilmDailyStats.objects.filter(film_id=film_id, day=day).update(**updates)
+
+
+def bump_many(deltas_by_film, day=None):
+    """`deltas_by_film`: {film_id: {field: delta}}; one UPDATE per film."""
+    for film_id, deltas in deltas_by_film.items():
+        bump(film_id, day, **deltas)
+
+
+def add_viewers(film_id, viewer_ids, day=None):
+    """Add viewers to the day's unique-viewer sketch (call for each viewer's first play of the day)."""
+    viewer_ids = [v for v in viewer_ids if v]
+    if not viewer_ids:
+        return
+    with transaction.atomic():
+        row, _ = (
+            FilmDailyStats.objects.select_for_update()
+            .only("id", "viewer_sketch")
+            .get_or_create(film_id=film_id, day=day or today())
+        )
+        sketch = HyperLogLog.from_bytes(row.viewer_sketch).update(viewer_ids)
+        FilmDailyStats.objects.filter(pk=row.pk).update(viewer_sketch=sketch.to_bytes())
+
+
+class PendingRollups:
+    """Request-path rollup deltas, coalesced per (film, day) until the next batch write."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._deltas = defaultdict(lambda: defaultdict(int))
+            self._viewers = defaultdict(set)
+            self._last_flush = clock.monotonic()
+
+    @property
+    def interval(self):
+        return getattr(settings, "ROLLUP_FLUSH_INTERVAL", 5.0)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, "ROLLUP_MAX_PENDING", 5000)
+
+    def __len__(self):
+        return len(self._deltas.keys() | self._viewers.keys())
+
+    def add(self, film_id, viewer_id=None, day=None, **deltas):
+        """
+        Queue `deltas` (STAT_FIELDS) and, for a first play of the day, `viewer_id`
+        for the sketch, once the surrounding transaction commits.
+        """
+        key = (film_id, day or today())
+        transaction.on_commit(lambda: self._add(key, viewer_id, deltas))
+
+    def _add(self, key, viewer_id, deltas):
+        with self._lock:
+            for field, value in deltas.items():
+                if value:
+                    self._deltas[key][field] += value
+            if viewer_id:
+                self._viewers[key].add(viewer_id)
+            due = not self.interval or len(self) >= self.max_pending
+        if due:
+            self.flush()
+        elif self._thread is None or not self._thread.is_alive():
+            self.start()
+
+    def flush(self):
+        """Write everything queued. Returns the number of (film, day) rows touched."""
+        with self._flush_lock:
+            with self._lock:
+                deltas, viewers = self._deltas, self._viewers
+                self._deltas, self._viewers = defaultdict(lambda: defaultdict(int)), defaultdict(set)
+                self._last_flush = clock.monotonic()
+            if not deltas and not viewers:
+                return 0
+            try:
+                with transaction.atomic():
+                    for (film_id, day), values in deltas.items():
+                        bump(film_id, day, **values)
+                    for (film_id, day), viewer_ids in viewers.items():
+                        add_viewers(film_id, sorted(viewer_ids), day)
+            except Exception:
+                self._requeue(deltas, viewers)
+                raise
+            return len(deltas.keys() | viewers.keys())
+
+    def _requeue(self, deltas, viewers):
+        with self._lock:
+            for key, values in deltas.items():
+                for field, value in values.items():
+                    self._deltas[key][field] += value
+            for key, viewer_ids in viewers.items():
+                self._viewers[key] |= viewer_ids
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="rollup-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self, flush=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not len(self):
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Rollup flush failed; the deltas stay queued")
+            finally:
+                close_old_connections()
+
+
+pending = PendingRollups()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        pending.stop(flush=True)
+    except Exception:
+        logger.exception("Rollup flush at exit failed")
+
+
+def is_first_play_today(film_id, viewer_id):
+    """True if `viewer_id` has no play of this film yet today (call before recording the play)."""
+    return not FilmPlayView.objects.filter(
+        film_id=film_id, viewer_id=viewer_id, viewed_at__gte=day_start()
+    ).exists()
+
+
+def viewers_seen_today(film_ids, viewer_ids):
+    """{(film_id, viewer_id)} pairs that already played today, in one query."""
+    return set(
+        FilmPlayView.objects.filter(film_id__in=film_ids, viewer_id__in=viewer_ids, viewed_at__gte=day_start())
+        .order_by()
+        .values_list("film_id", "viewer_id")
+        .distinct()
+    )
+
+
+def record_sale(film_id, access, amount, earning, commission=Decimal("0.00")):
+    """
+    A completed buy (`access="buy"`) or rent (`access="rent"`): `amount` paid by
+    the viewer, `earning` the filmmaker share, `commission` the affiliate share.
+    """
+    bump(film_id, **{
+        f"{access}_amount": Decimal(amount),
+        f"{access}_earning": Decimal(earning).quantize(Decimal("0.01")),
+        "commission_earning": Decimal(commission).quantize(Decimal("0.01")),
+    })
+
+
+# ---- rebuild from raw rows ----
+def _plays_by_day(since, until, film_ids):
+    plays = FilmPlayView.objects.filter(viewed_at__gte=day_start(since), viewed_at__lt=day_start(until))
+    if film_ids:
+        plays = plays.filter(film_id__in=film_ids)
+    return (
+        plays.order_by()
+        .annotate(day=TruncDate("viewed_at"))
+        .values("film_id", "day")
+        .annotate(plays=Count("id"), unique_viewers=Count("viewer", distinct=True), watch_seconds=Sum("watch_time"))
+    )
+
+
+def _viewer_sketches(since, until, film_ids):
+    """{(film_id, day): sketch bytes} from the distinct viewers of each day."""
+    plays = FilmPlayView.objects.filter(
+        viewer__isnull=False, viewed_at__gte=day_start(since), viewed_at__lt=day_start(until)
+    )
+    if film_ids:
+        plays = plays.filter(film_id__in=film_ids)
+    sketches = defaultdict(HyperLogLog)
+    rows = plays.order_by().annotate(day=TruncDate("viewed_at")).values_list("film_id", "day", "viewer_id").distinct()
+    for film_id, day, viewer_id in rows.iterator(chunk_size=10000):
+        sketches[(film_id, day)].add(viewer_id)
+    return {key: sketch.to_bytes() for key, sketch in sketches.items()}
+
+
+def _sales_by_day(since, until, film_ids):
+    from subscription.models import Transaction
+
+    txs = Transaction.objects.filter(
+        film__isnull=False,
+        status="completed",
+        created_at__gte=day_start(since),
+        created_at__lt=day_start(until),
+    )
+    if film_ids:
+        txs = txs.filter(film_id__in=film_ids)
+    grouped = txs.order_by().annotate(day=TruncDate("created_at"))
+
+    yield from (
+        grouped.filter(tx_type__in=("purchase", "rent", "commission"))
+        .values("film_id", "day", "tx_type")
+        .annotate(total=Sum("amount"))
+    )
+
+    # Filmmaker earnings carry no buy/rent flag: the payment paths log them as
+    # "maker_<MyFilms.txn_id>", so look up the access type of that MyFilms row.
+    access = MyFilms.objects.filter(
+        film_id=OuterRef("film_id"), txn_id=Substr(OuterRef("txn_id"), len("maker_") + 1)
+    ).values("access_type")[:1]
+    yield from (
+        grouped.filter(tx_type="filmmaker_earning")
+        .annotate(access=Subquery(access))
+        .values("film_id", "day", "tx_type", "access")
+        .annotate(total=Sum("amount"))
+    )
+
+
+def _sale_field(row):
+    if row["tx_type"] == "purchase":
+        return "buy_amount"
+    if row["tx_type"] == "rent":
+        return "rent_amount"
+    if row["tx_type"] == "commission":
+        return "commission_earning"
+    return "rent_earning" if row["access"] == "Rent" else "buy_earning"  # unmatched: counted as buy
+
+
+def backfill(since=None, until=None, film_ids=None, days_per_batch=31, batch_size=1000):
+    """
+    Recompute rows for days in [since, until] (default: first play/transaction
+    through today) from FilmPlayView and completed Transactions, `days_per_batch`
+    days at a time. The range's rows are deleted and rewritten, so re-running is
+    safe and rows with no source data left go away. This process's queued
+    deltas are flushed first (they are in the raw tables already); run it where
+    no worker is mid-interval for today, e.g. from cron. Watch time is credited
+    to the day of its play (live bumps credit the heartbeat's day). Returns the
+    number of rows written.
+    """
+    from subscription.models import Transaction
+
+    pending.flush()
+
+    if since is None:
+        firsts = [
+            FilmPlayView.objects.aggregate(first=Min("viewed_at"))["first"],
+            Transaction.objects.filter(film__isnull=False).aggregate(first=Min("created_at"))["first"],
+        ]
+        firsts = [timezone.localtime(f).date() for f in firsts if f]
+        if not firsts:
+            return 0
+        since = min(firsts)
+    until = until or today()
+
+    written = 0
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=days_per_batch), until + timedelta(days=1))  # exclusive
+        stats = defaultdict(lambda: {f: 0 for f in STAT_FIELDS})
+
+        for row in _plays_by_day(start, end, film_ids):
+            stat = stats[(row["film_id"], row["day"])]
+            stat["plays"] = row["plays"]
+            stat["unique_viewers"] = row["unique_viewers"]
+            stat["watch_seconds"] = row["watch_seconds"] or 0
+        for row in _sales_by_day(start, end, film_ids):
+            stats[(row["film_id"], row["day"])][_sale_field(row)] += row["total"] or 0
+        sketches = _viewer_sketches(start, end, film_ids)
+
+        stale = FilmDailyStats.objects.filter(day__gte=start, day__lt=end)
+        if film_ids:
+            stale = stale.filter(film_id__in=film_ids)
+        with transaction.atomic():
+            stale.delete()
+            FilmDailyStats.objects.bulk_create(
+                [
+                    FilmDailyStats(film_id=film_id, day=day, viewer_sketch=sketches.get((film_id, day), b""), **values)
+                    for (film_id, day), values in stats.items()
+                ],
+                batch_size=batch_size,
+                update_conflicts=True,  # a live bump may have re-created a row meanwhile
+                unique_fields=["film", "day"],
+                update_fields=[*STAT_FIELDS, "viewer_sketch"],
+            )
+        written += len(stats)
+        start = end
+    return written
@@ -0,0 +1,483 @@
+"""
+Film search index for GlobalSearchListView.
+
+Replaces `title__icontains` (full table scan, no ranking) with an inverted
+index over published films: title, genre names and logline tokens, plus title
+trigrams for substring matches. The last query token is matched as a prefix,
+so the same search serves typeahead. Results are ranked by field weight
+(title > genre > logline), exact-over-prefix matches and title prefix;
+trigram (mid-word) title matches fill up the rest.
+
+Two backends share one interface:
+- "fts5":   SQLite FTS5 (stdlib sqlite3, separate index database so it works
+            whatever the main DB is); ranked with bm25.
+- "python": pure-Python postings lists, used when FTS5 is unavailable.
+
+`SEARCH_BACKEND = "auto"` picks FTS5 when the sqlite3 build supports it. The
+FTS5 index lives in one file (SEARCH_INDEX_PATH) shared by every worker on the
+host (by default var/search-<db name>.sqlite3): it is built from the DB once
+(or with `rebuild_search_index`) and the Film signals in signals.py write each
+change into it, so all workers see it.
+
+In-process indexes (the python backend, or SEARCH_INDEX_PATH=":memory:") are
+built on first search; film changes bump a version stamp in the cache
+(SEARCH_CACHE_ALIAS) and other workers rebuild their copy when it moves, which
+needs a cache shared between processes.
+"""
+import bisect
+import heapq
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+SearchDocument = namedtuple("SearchDocument", ["film_id", "title", "logline", "genres"])
+
+FIELD_WEIGHTS = {"title": 3.0, "genres": 2.0, "logline": 1.0}
+PREFIX_FACTOR = 0.6        # a prefix match scores 60% of an exact token match
+TITLE_PREFIX_BONUS = 2.0   # whole query is a prefix of the title
+MAX_PREFIX_EXPANSIONS = 64
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def trigrams(text):
+    text = (text or "").lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# ---------------------------------------------------------------------------
+# Pure-Python backend
+# ---------------------------------------------------------------------------
+class PythonSearchIndex:
+    """
+    Postings lists (array of internal doc ids) per field and token, a sorted
+    vocabulary for prefix expansion, and title trigram postings. Updates
+    tombstone the old internal id and append a new one.
+    """
+    name = "python"
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._docs = []          # internal id -> (film_id, title) | None
+            self._internal = {}      # film_id -> internal id
+            self._postings = {field: {} for field in FIELD_WEIGHTS}
+            self._trigrams = {}
+            self._vocab = []         # sorted tokens across all fields
+            self._vocab_set = set()
+
+    def __len__(self):
+        return len(self._internal)
+
+    def _add_token(self, token):
+        if token not in self._vocab_set:
+            self._vocab_set.add(token)
+            bisect.insort(self._vocab, token)
+
+    def _add(self, doc, bulk=False):
+        doc_id = len(self._docs)
+        self._docs.append((doc.film_id, doc.title))
+        self._internal[doc.film_id] = doc_id
+        fields = {"title": doc.title, "genres": " ".join(doc.genres), "logline": doc.logline}
+        for field, text in fields.items():
+            postings = self._postings[field]
+            for token in set(tokenize(text)):
+                postings.setdefault(token, array("I")).append(doc_id)
+                if bulk:
+                    self._vocab_set.add(token)
+                else:
+                    self._add_token(token)
+        for gram in trigrams(doc.title):
+            self._trigrams.setdefault(gram, array("I")).append(doc_id)
+
+    def build(self, documents):
+        with self._lock:
+            self.clear()
+            for doc in documents:
+                self._add(doc, bulk=True)
+            self._vocab = sorted(self._vocab_set)
+
+    def upsert(self, doc):
+        with self._lock:
+            self._remove(doc.film_id)
+            self._add(doc)
+
+    def remove(self, film_id):
+        with self._lock:
+            self._remove(film_id)
+
+    def _remove(self, film_id):
+        doc_id = self._internal.pop(film_id, None)
+        if doc_id is not None:
+            self._docs[doc_id] = None
+
+    def _expand(self, prefix):
+        start = bisect.bisect_left(self._vocab, prefix)
+        expansions = []
+        for token in self._vocab[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(prefix):
+                break
+            expansions.append(token)
+        return expansions
+
+    def _term_scores(self, term, as_prefix):
+        scores = {}
+        tokens = self._expand(term) if as_prefix else [term]
+        for token in tokens:
+            factor = 1.0 if token == term else PREFIX_FACTOR
+            for field, weight in FIELD_WEIGHTS.items():
+                score = weight * factor
+                for doc_id in self._postings[field].get(token, ()):
+                    if scores.get(doc_id, 0) < score:
+                        scores[doc_id] = score
+        return scores
+
+    def search(self, query, limit=10):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        needle = query.strip().lower()
+        with self._lock:
+            # AND over terms; the last term is a prefix (typeahead)
+            plan = [(term, False) for term in dict.fromkeys(terms[:-1])] + [(terms[-1], True)]
+            total = None
+            for term, as_prefix in plan:
+                term_scores = self._term_scores(term, as_prefix=as_prefix)
+                if total is None:
+                    total = term_scores
+                else:
+                    total = {d: s + term_scores[d] for d, s in total.items() if d in term_scores}
+                if not total:
+                    break
+
+            ranked = []
+            for doc_id, score in (total or {}).items():
+                doc = self._docs[doc_id]
+                if doc is None:
+                    continue
+                if doc[1].lower().startswith(needle):
+                    score += TITLE_PREFIX_BONUS
+                ranked.append((score, doc))
+            results = heapq.nsmallest(limit, ranked, key=lambda r: (-r[0], r[1][1]))
+            found = [doc for _, doc in results]
+
+            if len(found) < limit and len(needle) >= 3:
+                found += self._substring(needle, limit - len(found), exclude={d[0] for d in found})
+            return found
+
+    def _substring(self, needle, limit, exclude):
+        grams = sorted(trigrams(needle), key=lambda g: len(self._trigrams.get(g, ())))
+        if not grams or grams[0] not in self._trigrams:
+            return []
+        candidates = set(self._trigrams[grams[0]])
+        for gram in grams[1:]:
+            candidates.intersection_update(self._trigrams.get(gram, ()))
+            if not candidates:
+                return []
+        matches = []
+        for doc_id in candidates:
+            doc = self._docs[doc_id]
+            if doc is not None and doc[0] not in exclude and needle in doc[1].lower():
+                matches.append(doc)
+        return sorted(matches, key=lambda d: d[1])[:limit]
+
+
+# ---------------------------------------------------------------------------
+# SQLite FTS5 backend
+# ---------------------------------------------------------------------------
+class FTS5SearchIndex:
+    """FTS5 token index (bm25-ranked, prefix-indexed) + FTS5 trigram index on titles."""
+    name = "fts5"
+
+    def __init__(self, path=":memory:"):
+        self._lock = threading.RLock()
+        self.shared = path != ":memory:"
+        if self.shared:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if self.shared:
+            self._conn.execute("PRAGMA journal_mode=WAL")  # readers in other workers don't block writers
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS film_docs (
+                rowid INTEGER PRIMARY KEY, film_id TEXT UNIQUE NOT NULL, title TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS film_search USING fts5(
+                title, genres, logline, prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS film_title_trigram USING fts5(title, tokenize='trigram');
+        """)
+        w = FIELD_WEIGHTS
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO film_search(film_search, rank) VALUES ('rank', ?)",
+                (f"bm25({w['title']}, {w['genres']}, {w['logline']})",),
+            )
+
+    @staticmethod
+    def available():
+        try:
+            conn = sqlite3.connect(":memory:")
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+            conn.close()
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM film_docs").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.executescript(
+                "DELETE FROM film_docs; DELETE FROM film_search; DELETE FROM film_title_trigram;"
+            )
+
+    def _insert(self, doc):
+        rowid = self._conn.execute(
+            "INSERT INTO film_docs(film_id, title) VALUES (?, ?)", (doc.film_id, doc.title)
+        ).lastrowid
+        self._conn.execute(
+            "INSERT INTO film_search(rowid, title, genres, logline) VALUES (?, ?, ?, ?)",
+            (rowid, doc.title, " ".join(doc.genres), doc.logline or ""),
+        )
+        self._conn.execute("INSERT INTO film_title_trigram(rowid, title) VALUES (?, ?)", (rowid, doc.title))
+
+    def _delete(self, film_id):
+        row = self._conn.execute("SELECT rowid FROM film_docs WHERE film_id = ?", (film_id,)).fetchone()
+        if row:
+            for table in ("film_search", "film_title_trigram", "film_docs"):
+                self._conn.execute(f"DELETE FROM {table} WHERE rowid = ?", row)
+
+    def is_built(self):
+        return self._conn.execute("SELECT 1 FROM index_meta WHERE key = 'built'").fetchone() is not None
+
+    def build(self, documents):
+        with self._lock, self._conn:
+            self._conn.executescript(
+                "DELETE FROM film_docs; DELETE FROM film_search; DELETE FROM film_title_trigram;"
+            )
+            for doc in documents:
+                self._insert(doc)
+            self._conn.execute("INSERT OR REPLACE INTO index_meta(key, value) VALUES ('built', datetime('now'))")
+
+    def upsert(self, doc):
+        with self._lock, self._conn:
+            self._delete(doc.film_id)
+            self._insert(doc)
+
+    def remove(self, film_id):
+        with self._lock, self._conn:
+            self._delete(film_id)
+
+    def search(self, query, limit=10):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        needle = query.strip().lower()
+        # Tokens are \w+ so quoting them is safe. Pass 1: titles starting with the
+        # query (^ "tok1" + "last"*); pass 2: every field, AND over tokens.
+        quoted = [f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*']
+        title_prefix = "{title} : ^ " + " + ".join(quoted)
+        anywhere = " ".join(quoted)
+        with self._lock:
+            rowids = []
+            for match in (title_prefix, anywhere):
+                if len(rowids) >= limit:
+                    break
+                rows = self._conn.execute(
+                    "SELECT rowid FROM film_search WHERE film_search MATCH ? ORDER BY rank LIMIT ?",
+                    (match, limit + len(rowids)),
+                ).fetchall()
+                rowids += [r[0] for r in rows if r[0] not in rowids]
+            rowids = rowids[:limit]
+
+            titles = {}
+            if rowids:
+                titles = {
+                    r[0]: (r[1], r[2]) for r in self._conn.execute(
+                        f"SELECT rowid, film_id, title FROM film_docs WHERE rowid IN ({','.join('?' * len(rowids))})",
+                        rowids,
+                    )
+                }
+            found = [titles[r] for r in rowids if r in titles]
+
+            if len(found) < limit and len(needle) >= 3:
+                seen = {r[0] for r in found}
+                rows = self._conn.execute(
+                    """
+                    SELECT d.film_id, d.title
+                    FROM film_title_trigram t JOIN film_docs d ON d.rowid = t.rowid
+                    WHERE t.title LIKE ? ESCAPE '\\'
+                    ORDER BY d.title
+                    LIMIT ?
+                    """,
+                    (f"%{_like_escape(needle)}%", limit + len(seen)),
+                ).fetchall()
+                found += [tuple(r) for r in rows if r[0] not in seen][:limit - len(found)]
+            return found
+
+
+def _like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# ---------------------------------------------------------------------------
+# Shared index + DB loading
+# ---------------------------------------------------------------------------
+def documents_from_db(film_ids=None, chunk_size=2000):
+    """Yield SearchDocuments for published films (2 queries for the whole set)."""
+    from .models import Film, FilmStatus
+
+    films = Film.objects.filter(status=FilmStatus.PUBLISHED)
+    if film_ids is not None:
+        films = films.filter(pk__in=film_ids)
+
+    genres = {}
+    for film_id, name in Film.genre.through.objects.filter(film__in=films).values_list("film_id", "genre__name"):
+        genres.setdefault(film_id, []).append(name)
+
+    for film_id, title, logline in films.values_list("id", "title", "logline").iterator(chunk_size=chunk_size):
+        yield SearchDocument(film_id, title, logline or "", genres.get(film_id, []))
+
+
+def _backend():
+    backend = getattr(settings, "SEARCH_BACKEND", "auto")
+    if backend == "auto":
+        backend = "fts5" if FTS5SearchIndex.available() else "python"
+    return backend
+
+
+def _path():
+    """SEARCH_INDEX_PATH, or by default var/search-<db name>.sqlite3 (in memory for an in-memory test DB)."""
+    path = getattr(settings, "SEARCH_INDEX_PATH", "")
+    if path:
+        return path
+    from django.db import connection
+
+    if connection.vendor == "sqlite" and connection.is_in_memory_db():
+        return ":memory:"
+    name = os.path.splitext(os.path.basename(str(connection.settings_dict["NAME"])))[0]
+    return os.path.join(settings.BASE_DIR, "var", f"search-{name}.sqlite3")
+
+
+def uses_shared_index():
+    return _backend() == "fts5" and _path() != ":memory:"
+
+
+def make_index(backend=None, path=None):
+    backend = backend or _backend()
+    if backend == "fts5":
+        return FTS5SearchIndex(path or _path())
+    return PythonSearchIndex()
+
+
+# ---- version stamp for in-process indexes ----
+VERSION_KEY = "search:version"
+
+
+def _cache():
+    return caches[getattr(settings, "SEARCH_CACHE_ALIAS", "default")]
+
+
+def index_version():
+    return _cache().get(VERSION_KEY, 0)
+
+
+def bump_version():
+    cache = _cache()
+    cache.add(VERSION_KEY, 0, None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:  # evicted between add and incr
+        cache.set(VERSION_KEY, 1, None)
+        return 1
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    This process's handle on the index. The shared file index is built once
+    for all workers; an in-process index is (re)built whenever the cached
+    version stamp moves.
+    """
+    global _index, _index_version
+    index = _index
+    if index is not None and (index.shared or _index_version == index_version()):
+        return index
+    with _index_lock:
+        version = index_version()
+        if _index is None or (not _index.shared and _index_version != version):
+            index = make_index()
+            if not (index.shared and index.is_built()):
+                index.build(documents_from_db())
+            _index, _index_version = index, version
+    return _index
+
+
+def reset_index():
+    global _index, _index_version
+    _index = _index_version = None
+
+
+def rebuild_index():
+    """Rebuild the index from the DB (the shared file for every worker, or this process's copy)."""
+    reset_index()
+    index = make_index()
+    index.build(documents_from_db())
+    if not index.shared:
+        bump_version()
+    return len(index)
+
+
+def _changed():
+    """The index to apply a film change to (None: nothing built yet, the build will read the change)."""
+    global _index, _index_version
+    if uses_shared_index():
+        with _index_lock:
+            if _index is None:
+                index = make_index()
+                if not index.is_built():  # never build the whole index from a save
+                    return None
+                _index, _index_version = index, index_version()
+            return _index
+    version = bump_version()  # other workers rebuild their copy on their next search
+    if _index is not None and _index_version == version - 1:
+        _index_version = version  # ... this one is patched in place below
+    return _index
+
+
+def reindex_film(film_id):
+    """Refresh one film in the index."""
+    index = _changed()
+    if index is None:
+        return
+    docs = list(documents_from_db(film_ids=[film_id]))
+    if docs:
+        index.upsert(docs[0])
+    else:
+        index.remove(film_id)
+
+
+def remove_film(film_id):
+    index = _changed()
+    if index is not None:
+        index.remove(film_id)
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Film, MyFilms
+from . import entitlements, feed_cache, search, trending
+from .rentals import rental_expired
+
+
+# Any film change can move it in/out of the homepage feeds
+@receiver(post_save, sender=Film)
+@receiver(post_delete, sender=Film)
+def invalidate_film_feeds(sender, **kwargs):
+    feed_cache.bump_version()
+
+
+@receiver(post_save, sender=Film)
+def sync_trending_status(sender, instance, created, **kwargs):
+    if not created:  # new films have no score row yet
+        trending.sync_status(instance)
+
+
+# Keep the search index current once the change commits (no-op until it has been built)
+@receiver(post_save, sender=Film)
+def reindex_film(sender, instance, **kwargs):
+    film_id = instance.pk
+    transaction.on_commit(lambda: search.reindex_film(film_id))
+
+
+@receiver(m2m_changed, sender=Film.genre.through)
+def reindex_film_genres(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Film):
+        film_id = instance.pk
+        transaction.on_commit(lambda: search.reindex_film(film_id))
+
+
+@receiver(post_delete, sender=Film)
+def unindex_film(sender, instance, **kwargs):
+    film_id = instance.pk  # cleared on the instance once the delete finishes
+    transaction.on_commit(lambda: search.remove_film(film_id))
+
+
+# Per-user entitlement cache (see entitlements.py): new rows are written through
+# once committed, anything else drops the user's entry
+@receiver(post_save, sender=MyFilms)
+def sync_entitlements(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: entitlements.grant(instance))
+    else:
+        transaction.on_commit(lambda: entitlements.invalidate(instance.user_id))
+
+
+@receiver(post_delete, sender=MyFilms)
+def drop_entitlements(sender, instance, **kwargs):
+    transaction.on_commit(lambda: entitlements.invalidate(instance.user_id))
+
+
+@receiver(rental_expired)
+def expire_entitlements(sender, user_id, **kwargs):
+    entitlements.invalidate(user_id)
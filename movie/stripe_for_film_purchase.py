@@ -10,8 +10,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
 from accounts.models import User
-from subscription.models import Wallet, Transaction
+from accounts import user_cache
+from subscription.models import Transaction
+from subscription.ledger import FilmSale, PreconditionFailed
 from .models import Film, MyFilms
+from . import entitlements
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 STRIPE_WEBHOOK_SECRET = settings.STRIPE_WEBHOOK_SECRET
@@ -35,7 +38,7 @@ class CreateStripePurchaseCheckoutSessionView(APIView):
             return Response({"message": "Invalid film price"}, status=400)
 
         # Already owns
-        if MyFilms.objects.filter(user=user, film=film, status="active").exists():
+        if entitlements.can_watch(user, film):
             return Response({"message": "You already own this film"}, status=400)
 
         try:
@@ -119,7 +122,7 @@ class StripeWebhookPurchaseView(APIView):
             try:
                 user = User.objects.get(id=user_id)
                 film = Film.objects.get(id=film_id)
-                platform_user = User.objects.filter(is_platform=True).first()
+                platform_user = user_cache.platform_user_id()
                 if not platform_user:
                     return Response({"message": "Platform user not configured"}, status=500)
 
@@ -145,99 +148,39 @@ class StripeWebhookPurchaseView(APIView):
                     
 
                 # ---------- Save Purchase + Revenue Split ----------
-                with transaction.atomic():
-                    # Buyer Transaction
-                    Transaction.objects.create(
-                        user=user,
-                        film=film,
-                        source="stripe",
-                        tx_type="purchase",
-                        amount=amount,
-                        status="completed",
-                        txn_id=payment_id,
-                        description=f"Paid {amount} USD for {film.title} (Stripe fee: {stripe_fee})"
-                    )
-
-                    # Film ownership
-                    MyFilms.objects.get_or_create(
-                        user=user,
-                        film=film,
-                        defaults={
-                            "access_type": "Buy",
-                            "txn_id": payment_id,
-                            "price": amount,
-                            "start_date": timezone.now(),
-                            "status": "active"
-                        }
-                    )
-
-                    # Revenue Split
-                    filmmaker_share = (net_amount * Decimal("0.70")).quantize(Decimal("0.01"))
-                    affiliate_share = Decimal("0.00")
-                    platform_share = (net_amount - filmmaker_share).quantize(Decimal("0.01"))
-
-                    # Affiliate
-                    if referral_code:
-                        referrer = User.objects.filter(distro_code=referral_code).first()
-                        if referrer and referrer != user:
-                            affiliate_share = (net_amount * Decimal("0.20")).quantize(Decimal("0.01"))
-                            platform_share = (net_amount - filmmaker_share - affiliate_share).quantize(Decimal("0.01"))
-
-                            aff_wallet, _ = Wallet.objects.get_or_create(user=referrer)
-                            aff_wallet.distro_balance += affiliate_share
-                            aff_wallet.save()
-
-                            Transaction.objects.create(
-                                user=referrer,
-                                film=film,
-                                source="stripe",
-                                tx_type="commission",
-                                amount=affiliate_share,
-                                balance_type="distro",
-                                txn_id=f"aff_{payment_id}",
-                                status="completed",
-                                description=f"Affiliate commission for {film.title}"
-                            )
-
-                    # Filmmaker payout
-                    if film.filmmaker:
-                        maker_wallet, _ = Wallet.objects.get_or_create(user=film.filmmaker)
-                        maker_wallet.reel_bux_balance += filmmaker_share
-                        maker_wallet.save()
-
-                        Transaction.objects.create(
-                            user=film.filmmaker,
+                referrer = user_cache.referrer_id(referral_code, exclude=user)
+
+                def not_recorded_yet():
+                    # Stripe retries deliveries: a replayed event must not credit the shares twice
+                    return not MyFilms.objects.filter(user=user, film=film, txn_id=payment_id).exists()
+
+                try:
+                    with transaction.atomic():
+                        # Buyer Transaction + Revenue Split (on the net amount) as one ledger unit (replays re-checked under the wallet locks)
+                        sale = FilmSale(film, "buy", "stripe", payment_id, amount, platform_user, referrer=referrer, net_amount=net_amount)
+                        sale.record(
+                            user, amount,
                             film=film,
                             source="stripe",
-                            tx_type="filmmaker_earning",
-                            amount=filmmaker_share,
-                            balance_type="reelbux",
-                            txn_id=f"maker_{payment_id}",
+                            tx_type="purchase",
                             status="completed",
-                            description=f"Filmmaker earning for {film.title}"
+                            txn_id=payment_id,
+                            description=f"Paid {amount} USD for {film.title} (Stripe fee: {stripe_fee})"
                         )
+                        sale.commit(precondition=not_recorded_yet)
 
-                    # Platform payout
-                    platform_wallet, _ = Wallet.objects.get_or_create(user=platform_user)
-                    platform_wallet.reel_bux_balance += platform_share
-                    platform_wallet.save()
-
-                    Transaction.objects.create(
-                        user=platform_user,
-                        film=film,
-                        source="stripe",
-                        tx_type="platform_earning",
-                        amount=platform_share,
-                        balance_type="reelbux",
-                        txn_id=f"platform_{payment_id}",
-                        status="completed",
-                        description=f"Platform earning for {film.title}"
-                    )
-
-                    # ---- Update Film total earning & total buy earning ----
-                    film.total_earning = (film.total_earning or Decimal("0.00")) + filmmaker_share.quantize(Decimal("0.00"))
-                    film.total_buy_earning = (film.total_buy_earning or Decimal("0.00")) + filmmaker_share.quantize(Decimal("0.00"))
-                    film.save(update_fields=["total_earning", "total_buy_earning"])
+                        # Film ownership (one row per payment: an ended rental doesn't block a new one)
+                        MyFilms.objects.create(
+                            user=user,
+                            film=film,
+                            txn_id=payment_id,
+                            access_type="Buy",
+                            price=amount,
+                            start_date=timezone.now(),
+                            status="active",
+                        )
+                except PreconditionFailed:
+                    return Response({"status": "already recorded"}, status=200)
 
                 return Response({"status": "success"}, status=200)
 
@@ -0,0 +1,439 @@
+"""
+Buffered playback telemetry ingestion.
+
+`RecordFilmViewAPIView` / `RecordWatchTimeAPIView` used to do 5-8 writes per
+request, all serializing on the `Film` row. With `TELEMETRY_BUFFERED = True`
+they only enqueue an event here; events are coalesced per (film, viewer) and a
+background timer flushes them with bulk_create/bulk_update plus ONE counter
+increment per film (see counters.py).
+
+Every telemetry response also carries `next_report_in`: how many seconds the
+client should wait (accumulating watch time locally) before its next report.
+It stretches with buffer depth and write latency so a premiere spike sheds
+heartbeat load instead of hitting the DB in lockstep.
+"""
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Max
+
+from .models import FilmView, FilmPlayView
+from . import counters as film_counters
+from . import trending
+from . import rollups
+from .view_filter import unique_views
+
+logger = logging.getLogger(__name__)
+
+
+class PendingPlayback:
+    """
+    Coalesced events for one (film, viewer) pair since the last flush.
+    Heartbeats that arrive before the first play of the batch are kept apart
+    (`lead_*`) because the per-request path credits them to the previous play.
+    """
+    __slots__ = ("plays", "watch_time", "current_watch_time", "lead_heartbeats", "lead_watch_time")
+
+    def __init__(self):
+        self.plays = 0
+        self.watch_time = 0
+        self.current_watch_time = None  # last heartbeat value, None = no heartbeat
+        self.lead_heartbeats = 0
+        self.lead_watch_time = 0
+
+    def add_play(self):
+        self.plays += 1
+
+    def add_heartbeat(self, watch_time):
+        if not self.plays:
+            self.lead_heartbeats += 1
+            self.lead_watch_time += watch_time
+        self.watch_time += watch_time
+        self.current_watch_time = watch_time
+
+    def merge(self, older):
+        """Fold an older (failed) batch in front of this one."""
+        if older.plays:
+            self.lead_heartbeats = older.lead_heartbeats
+            self.lead_watch_time = older.lead_watch_time
+        else:
+            self.lead_heartbeats += older.lead_heartbeats
+            self.lead_watch_time += older.lead_watch_time
+        self.plays += older.plays
+        self.watch_time += older.watch_time
+        if self.current_watch_time is None:
+            self.current_watch_time = older.current_watch_time
+
+
+def apply_pending(pending):
+    """
+    Write a batch of coalesced events: {(film_id, viewer_id): PendingPlayback}.
+    Returns per-film counter deltas {film_id: {"total_views", "unique_views", "total_watch_time"}}.
+    """
+    if not pending:
+        return {}
+
+    started = time.monotonic()
+    film_ids = {film_id for film_id, _ in pending}
+    viewer_ids = {viewer_id for _, viewer_id in pending}
+    deltas = defaultdict(lambda: {"total_views": 0, "unique_views": 0, "total_watch_time": 0})
+
+    with transaction.atomic():
+        # ---- 1 query: existing unique-view rows for every pair in the batch ----
+        existing_views = {
+            (fv.film_id, fv.viewer_id): fv
+            for fv in FilmView.objects.filter(film_id__in=film_ids, viewer_id__in=viewer_ids)
+            .only("id", "film_id", "viewer_id")
+        }
+
+        # ---- 1 query: latest play row for pairs with heartbeats ahead of any new play ----
+        latest_plays = {}
+        lead_keys = [key for key, p in pending.items() if p.lead_heartbeats]
+        if lead_keys:
+            rows = (
+                FilmPlayView.objects.filter(
+                    film_id__in={k[0] for k in lead_keys},
+                    viewer_id__in={k[1] for k in lead_keys},
+                )
+                .order_by()
+                .values("film_id", "viewer_id")
+                .annotate(last_id=Max("id"))
+            )
+            latest_plays = {(r["film_id"], r["viewer_id"]): r["last_id"] for r in rows}
+
+        # ---- 1 query: pairs that already played today (daily unique viewers) ----
+        played = [key for key, p in pending.items() if p.plays]
+        seen_today = rollups.viewers_seen_today({k[0] for k in played}, {k[1] for k in played}) if played else set()
+        daily = defaultdict(lambda: {"plays": 0, "unique_viewers": 0, "watch_seconds": 0})
+        new_daily_viewers = defaultdict(list)
+
+        new_plays, play_updates = [], []
+        view_updates = []
+
+        for key, p in pending.items():
+            film_id, viewer_id = key
+            delta = deltas[film_id]
+            delta["total_views"] += p.plays
+            delta["total_watch_time"] += p.watch_time
+            day = daily[film_id]
+            day["plays"] += p.plays
+            day["watch_seconds"] += p.watch_time
+            if p.plays and key not in seen_today:
+                day["unique_viewers"] += 1
+                new_daily_viewers[film_id].append(viewer_id)
+
+            # Leading heartbeats belong to the previous play (or a fresh row if there is none)
+            if p.lead_heartbeats:
+                last_id = latest_plays.get(key)
+                if last_id:
+                    play_updates.append(FilmPlayView(id=last_id, watch_time=F("watch_time") + p.lead_watch_time))
+                else:
+                    new_plays.append(FilmPlayView(film_id=film_id, viewer_id=viewer_id, watch_time=p.lead_watch_time))
+
+            # Every play is its own FilmPlayView row; later heartbeats land on the newest one
+            for i in range(p.plays):
+                last = i == p.plays - 1
+                new_plays.append(FilmPlayView(
+                    film_id=film_id,
+                    viewer_id=viewer_id,
+                    watch_time=p.watch_time - p.lead_watch_time if last else 0,
+                ))
+
+            # One FilmView per (film, viewer); it is a unique view only if a play of
+            # this flush created it (another worker may have inserted it since the SELECT)
+            film_view = existing_views.get(key)
+            if film_view is None:
+                view_id, created = unique_views.get_or_create(film_id, viewer_id, defaults={
+                    "watch_time": p.watch_time,
+                    "current_watch_time": p.current_watch_time or 0,
+                })
+                if created:
+                    if p.plays and not p.lead_heartbeats:
+                        delta["unique_views"] += 1
+                    continue
+                film_view = FilmView(id=view_id, film_id=film_id, viewer_id=viewer_id)
+            if p.current_watch_time is not None:
+                film_view.watch_time = F("watch_time") + p.watch_time
+                film_view.current_watch_time = p.current_watch_time
+                view_updates.append(film_view)
+
+        if new_plays:
+            FilmPlayView.objects.bulk_create(new_plays)
+        if play_updates:
+            FilmPlayView.objects.bulk_update(play_updates, ["watch_time"])
+        if view_updates:
+            FilmView.objects.bulk_update(view_updates, ["watch_time", "current_watch_time"])
+
+        # ---- one aggregated counter UPDATE per film (on a counter shard) ----
+        film_counters.increment_many(deltas)
+        rollups.bump_many(daily)
+        for film_id, viewer_ids in new_daily_viewers.items():
+            rollups.add_viewers(film_id, viewer_ids)
+        for film_id, delta in deltas.items():
+            trending.record_plays(film_id, delta["total_views"])
+
+    write_latency.observe((time.monotonic() - started) / len(pending))  # per (film, viewer) pair
+    return dict(deltas)
+
+
+class TelemetryBuffer:
+    """
+    In-process buffer of playback events.
+
+    Thread-safe; flushed by a daemon timer every `TELEMETRY_FLUSH_INTERVAL`
+    seconds, or inline once `TELEMETRY_MAX_PENDING` events have queued up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._queued_events = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ---- config ----
+    @property
+    def enabled(self):
+        return getattr(settings, "TELEMETRY_BUFFERED", False)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, "TELEMETRY_FLUSH_INTERVAL", 2.0)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, "TELEMETRY_MAX_PENDING", 10000)
+
+    @property
+    def depth(self):
+        """Number of raw events waiting for the next flush."""
+        return self._queued_events
+
+    # ---- ingestion ----
+    def _entry(self, film_id, viewer_id):
+        key = (film_id, viewer_id)
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = PendingPlayback()
+        return entry
+
+    def record_view(self, film_id, viewer_id):
+        with self._lock:
+            self._entry(film_id, viewer_id).add_play()
+            self._queued_events += 1
+        self._after_enqueue()
+
+    def record_watch_time(self, film_id, viewer_id, watch_time):
+        with self._lock:
+            self._entry(film_id, viewer_id).add_heartbeat(watch_time)
+            self._queued_events += 1
+        self._after_enqueue()
+
+    def _after_enqueue(self):
+        if self._queued_events >= self.max_pending:
+            self.flush()
+        elif self.flush_interval and (self._thread is None or not self._thread.is_alive()):
+            self.start()
+
+    # ---- flushing ----
+    def flush(self):
+        """Swap out the pending batch and write it. Returns the per-film deltas."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                queued, self._queued_events = self._queued_events, 0
+            try:
+                deltas = apply_pending(pending)
+            except Exception:
+                self._requeue(pending, queued)
+                raise
+            rollups.pending.flush()  # request-path rollups ride along with the timer
+            return deltas
+
+    def _requeue(self, pending, queued):
+        """Put a batch that failed to write back in front of newer events."""
+        with self._lock:
+            for key, older in pending.items():
+                newer = self._pending.get(key)
+                if newer is None:
+                    self._pending[key] = older
+                else:
+                    newer.merge(older)
+            self._queued_events += queued
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="telemetry-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self, flush=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                write_latency.fail()
+                logger.exception("Telemetry flush failed; the batch stays queued")
+            finally:
+                close_old_connections()
+
+
+telemetry_buffer = TelemetryBuffer()
+
+
+# ---- backpressure ----
+class WriteLatency:
+    """Moving average (EWMA) of telemetry write time, in seconds, plus failed background flushes."""
+
+    def __init__(self, alpha=0.2):
+        self._lock = threading.Lock()
+        self.alpha = alpha
+        self.reset()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.value += self.alpha * (seconds - self.value)
+
+    def fail(self):
+        """A flush raised: count it, and report full load until writes recover."""
+        with self._lock:
+            self.failures += 1
+            self.last_failure = time.monotonic()
+
+    @property
+    def failing(self):
+        """True if a flush failed within the last TELEMETRY_REPORT_INTERVAL seconds."""
+        window = getattr(settings, "TELEMETRY_REPORT_INTERVAL", 30)
+        return self.last_failure is not None and time.monotonic() - self.last_failure < window
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+            self.failures = 0
+            self.last_failure = None
+
+
+write_latency = WriteLatency()
+
+
+def load():
+    """
+    0 = idle, 1 = saturated: the buffer share of TELEMETRY_MAX_PENDING, or how
+    far write latency is past TELEMETRY_TARGET_WRITE_LATENCY (2x target = 1).
+    Saturated while background flushes are failing.
+    """
+    if write_latency.failing:
+        return 1.0
+    target = getattr(settings, "TELEMETRY_TARGET_WRITE_LATENCY", 0.05)
+    queue = telemetry_buffer.depth / telemetry_buffer.max_pending if telemetry_buffer.enabled else 0
+    latency = write_latency.value / target - 1 if target else 0
+    return min(max(queue, latency, 0.0), 1.0)
+
+
+def next_report_in():
+    """
+    Seconds until the client's next heartbeat: TELEMETRY_REPORT_INTERVAL when
+    idle, up to TELEMETRY_REPORT_INTERVAL_MAX under load, +/- TELEMETRY_REPORT_JITTER
+    so clients that started together drift apart.
+    """
+    base = getattr(settings, "TELEMETRY_REPORT_INTERVAL", 30)
+    longest = max(getattr(settings, "TELEMETRY_REPORT_INTERVAL_MAX", 300), base)
+    jitter = getattr(settings, "TELEMETRY_REPORT_JITTER", 0.2)
+    interval = base + (longest - base) * load()
+    return max(1, round(interval * random.uniform(1 - jitter, 1 + jitter)))
+
+
+# ---- batch endpoint ----
+EVENT_TYPES = ("view", "watch_time")
+
+
+def _event_error(event, film, viewer_id):
+    if not isinstance(event, dict):
+        return "Event must be an object"
+    if event.get("type") not in EVENT_TYPES:
+        return f"type must be one of {', '.join(EVENT_TYPES)}"
+    if film is None:
+        return "Film not found"
+    if film.filmmaker_id == viewer_id:
+        return "Filmmakers cannot view their own films"
+    if event["type"] == "watch_time":
+        watch_time = event.get("watch_time")
+        if isinstance(watch_time, bool) or not isinstance(watch_time, int) or watch_time < 0:
+            return "watch_time must be a non-negative integer"
+    return None
+
+
+def record_batch(viewer_id, events):
+    """
+    Validate and record a client batch of mixed view / watch_time events for one
+    viewer: one `in_bulk` Film lookup, then either the telemetry buffer or ONE
+    grouped `apply_pending` write. Views already open in a playback session
+    are reported as "duplicate"; if the write fails the batch's claims are
+    released, so a retry isn't. Returns per-event results in request order.
+    """
+    from .models import Film
+    from . import playback
+
+    film_ids = {
+        str(event["film_id"]) for event in events
+        if isinstance(event, dict) and isinstance(event.get("film_id"), (str, int))
+    }
+    films = Film.objects.only("id", "filmmaker_id").in_bulk(list(film_ids))
+
+    results, pending, claimed = [], {}, []
+    for index, event in enumerate(events):
+        film = films.get(str(event.get("film_id"))) if isinstance(event, dict) else None
+        error = _event_error(event, film, viewer_id)
+        if error:
+            results.append({"index": index, "status": "error", "message": error})
+            continue
+
+        if event["type"] == "view":
+            if not playback.claim_play(film.pk, viewer_id):
+                results.append({"index": index, "status": "duplicate"})
+                continue
+            claimed.append(film.pk)
+            if telemetry_buffer.enabled:
+                telemetry_buffer.record_view(film.pk, viewer_id)
+            else:
+                pending.setdefault((film.pk, viewer_id), PendingPlayback()).add_play()
+        else:
+            if telemetry_buffer.enabled:
+                telemetry_buffer.record_watch_time(film.pk, viewer_id, event["watch_time"])
+            else:
+                pending.setdefault((film.pk, viewer_id), PendingPlayback()).add_heartbeat(event["watch_time"])
+        results.append({"index": index, "status": "accepted"})
+
+    try:
+        apply_pending(pending)
+    except Exception:
+        for film_id in claimed:
+            playback.release_play(film_id, viewer_id)
+        raise
+    return results
+
+
+@atexit.register
+def _flush_on_exit():
+    if telemetry_buffer.depth:
+        try:
+            telemetry_buffer.stop(flush=True)
+        except Exception:
+            logger.exception("Telemetry flush on exit failed; %d events dropped", telemetry_buffer.depth)
@@ -1,3 +1,1417 @@
+import json
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from .models import Film, Genre
+from .views import TrendingFilmsView, LatestFilmsView, FilmDetailsView
+
+THUMBNAIL = "https://res.cloudinary.com/demo/image/upload/v1/thumbnails/poster.jpg"
+
+
+def make_user(email, **extra):
+    return User.objects.create_user(email=email, password="pass1234", full_name=email, terms_agreed=True, **extra)
+
+
+def make_film(filmmaker, title, genres=(), **fields):
+    fields.setdefault("status", "PUBLISHED")
+    fields.setdefault("film_type", "MOVIE")
+    film = Film.objects.create(filmmaker=filmmaker, title=title, thumbnail=THUMBNAIL, **fields)
+    film.genre.set(genres)
+    return film
+
+
+class TelemetryBufferTests(TestCase):
+    def setUp(self):
+        from .playback import recent_plays
+        from .rollups import pending
+
+        cache.clear()
+        recent_plays.clear()
+        pending.clear()
+        self.addCleanup(pending.clear)
+        self.filmmaker = make_user("maker@example.com")
+        self.viewers = [make_user(f"viewer{i}@example.com") for i in range(3)]
+        self.films = [make_film(self.filmmaker, f"Buffered {i}") for i in range(2)]
+
+    def buffer(self):
+        from .telemetry import TelemetryBuffer
+
+        return TelemetryBuffer()
+
+    def test_events_for_one_pair_coalesce(self):
+        film, viewer = self.films[0], self.viewers[0]
+        buffer = self.buffer()
+        with self.settings(TELEMETRY_FLUSH_INTERVAL=0):
+            buffer.record_watch_time(film.id, viewer.id, 5)
+            buffer.record_view(film.id, viewer.id)
+            buffer.record_watch_time(film.id, viewer.id, 10)
+            buffer.record_watch_time(film.id, viewer.id, 20)
+
+        self.assertEqual((buffer.depth, len(buffer._pending)), (4, 1))
+        entry = buffer._pending[(film.id, viewer.id)]
+        self.assertEqual((entry.plays, entry.watch_time, entry.current_watch_time), (1, 35, 20))
+        self.assertEqual((entry.lead_heartbeats, entry.lead_watch_time), (1, 5))
+
+    def test_flush_writes_plays_views_and_counters_in_bulk(self):
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from . import telemetry
+        from .models import FilmPlayView, FilmView
+
+        for film in self.films:
+            for viewer in self.viewers[:2]:
+                FilmView.objects.create(film=film, viewer=viewer, watch_time=100, current_watch_time=100)
+
+        buffer = self.buffer()
+        with self.settings(TELEMETRY_FLUSH_INTERVAL=0):
+            for film in self.films:
+                for viewer in self.viewers:
+                    buffer.record_view(film.id, viewer.id)
+                    buffer.record_watch_time(film.id, viewer.id, 30)
+
+            with mock.patch.object(telemetry.film_counters, "increment",
+                                   wraps=telemetry.film_counters.increment) as increment, \
+                    CaptureQueriesContext(connection) as ctx:
+                deltas = buffer.flush()
+
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "movie_filmplayview"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "movie_filmview"')]), 1)
+        self.assertEqual(sorted(c.args[0] for c in increment.call_args_list), sorted(f.id for f in self.films))
+        for film in self.films:
+            self.assertEqual(deltas[film.id], {"total_views": 3, "unique_views": 1, "total_watch_time": 90})
+            film.refresh_from_db()
+            self.assertEqual((film.total_views, film.unique_views, film.total_watch_time), (3, 1, 90))
+
+        self.assertEqual(FilmPlayView.objects.count(), 6)
+        self.assertEqual(FilmView.objects.get(film=self.films[0], viewer=self.viewers[0]).watch_time, 130)
+        self.assertEqual(buffer.depth, 0)
+
+    def test_heartbeats_are_credited_to_the_queued_lead_play(self):
+        from .models import FilmPlayView
+
+        film, viewer = self.films[0], self.viewers[0]
+        earlier = FilmPlayView.objects.create(film=film, viewer=viewer, watch_time=50)
+        buffer = self.buffer()
+        with self.settings(TELEMETRY_FLUSH_INTERVAL=0):
+            buffer.record_watch_time(film.id, viewer.id, 10)  # still the earlier play
+            buffer.record_view(film.id, viewer.id)
+            buffer.record_watch_time(film.id, viewer.id, 20)
+            buffer.record_watch_time(film.id, viewer.id, 25)
+            buffer.flush()
+
+        earlier.refresh_from_db()
+        self.assertEqual(earlier.watch_time, 60)
+        queued = FilmPlayView.objects.exclude(pk=earlier.pk).get(film=film, viewer=viewer)
+        self.assertEqual(queued.watch_time, 45)
+
+    def test_failed_flush_requeues_and_merges_its_events(self):
+        from unittest import mock
+        from . import telemetry
+        from .models import FilmPlayView, FilmView
+
+        film, viewer = self.films[0], self.viewers[0]
+        buffer = self.buffer()
+        with self.settings(TELEMETRY_FLUSH_INTERVAL=0):
+            buffer.record_view(film.id, viewer.id)
+            buffer.record_watch_time(film.id, viewer.id, 30)
+            with mock.patch.object(telemetry, "apply_pending", side_effect=RuntimeError("db down")):
+                with self.assertRaises(RuntimeError):
+                    buffer.flush()
+            self.assertEqual(buffer.depth, 2)
+            self.assertFalse(FilmPlayView.objects.exists())
+
+            buffer.record_watch_time(film.id, viewer.id, 15)  # arrives while the batch is requeued
+            self.assertEqual((buffer.depth, len(buffer._pending)), (3, 1))
+            buffer.flush()
+
+        film.refresh_from_db()
+        self.assertEqual((film.total_views, film.unique_views, film.total_watch_time), (1, 1, 45))
+        self.assertEqual(FilmPlayView.objects.get(film=film, viewer=viewer).watch_time, 45)
+        view = FilmView.objects.get(film=film, viewer=viewer)
+        self.assertEqual((view.watch_time, view.current_watch_time), (45, 15))
+
+    def test_a_view_row_inserted_mid_flush_is_not_a_unique_view(self):
+        from unittest import mock
+        from . import telemetry
+        from .models import FilmPlayView, FilmView
+
+        film, viewer = self.films[0], self.viewers[0]
+        buffer = self.buffer()
+        seen_today = telemetry.rollups.viewers_seen_today
+
+        def other_worker_inserts(*args):
+            # runs after the FilmView SELECT, before this flush writes its rows
+            FilmView.objects.create(film=film, viewer=viewer, watch_time=40, current_watch_time=40)
+            return seen_today(*args)
+
+        with self.settings(TELEMETRY_FLUSH_INTERVAL=0):
+            buffer.record_view(film.id, viewer.id)
+            buffer.record_watch_time(film.id, viewer.id, 30)
+            with mock.patch.object(telemetry.rollups, "viewers_seen_today", side_effect=other_worker_inserts):
+                deltas = buffer.flush()
+
+        self.assertEqual(deltas[film.id]["unique_views"], 0)
+        film.refresh_from_db()
+        self.assertEqual((film.total_views, film.unique_views, film.total_watch_time), (1, 0, 30))
+        view = FilmView.objects.get(film=film, viewer=viewer)
+        self.assertEqual((view.watch_time, view.current_watch_time), (70, 30))
+        self.assertEqual(FilmPlayView.objects.get(film=film, viewer=viewer).watch_time, 30)
+
+    def test_buffered_endpoints_end_in_the_same_state_as_the_direct_path(self):
+        from unittest import mock
+        from rest_framework.test import force_authenticate
+        from . import telemetry
+        from .models import FilmPlayView, FilmView
+        from .views import RecordFilmViewAPIView, RecordWatchTimeAPIView
+
+        def post(view, viewer, data):
+            request = APIRequestFactory().post("/", data, format="json")
+            force_authenticate(request, user=viewer)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = view.as_view()(request)
+            self.assertIn(response.status_code, (200, 201))
+
+        def replay(film, flush):
+            first, second = self.viewers[:2]
+            post(RecordFilmViewAPIView, first, {"film_id": film.id})
+            post(RecordWatchTimeAPIView, first, {"film_id": film.id, "watch_time": 30})
+            post(RecordFilmViewAPIView, first, {"film_id": film.id})  # retry within the session window
+            post(RecordWatchTimeAPIView, first, {"film_id": film.id, "watch_time": 15})
+            post(RecordWatchTimeAPIView, second, {"film_id": film.id, "watch_time": 10})  # heartbeat before any play
+            post(RecordFilmViewAPIView, second, {"film_id": film.id})
+            post(RecordWatchTimeAPIView, second, {"film_id": film.id, "watch_time": 20})
+            flush()
+            post(RecordWatchTimeAPIView, first, {"film_id": film.id, "watch_time": 5})
+            flush()
+
+        def state(film):
+            film.refresh_from_db()
+            views = FilmView.objects.filter(film=film).order_by("viewer_id")
+            plays = FilmPlayView.objects.filter(film=film).order_by("viewer_id", "id")
+            return (
+                (film.total_views, film.unique_views, film.total_watch_time),
+                [(v.viewer_id, v.watch_time, v.current_watch_time) for v in views],
+                [(p.viewer_id, p.watch_time) for p in plays],
+            )
+
+        direct, buffered = self.films
+        replay(direct, flush=lambda: None)
+
+        buffer = self.buffer()
+        with mock.patch.object(telemetry, "telemetry_buffer", buffer), \
+                mock.patch("movie.views.telemetry_buffer", buffer), \
+                mock.patch("movie.playback.telemetry_buffer", buffer), \
+                self.settings(TELEMETRY_BUFFERED=True, TELEMETRY_FLUSH_INTERVAL=0):
+            replay(buffered, flush=buffer.flush)
+
+        self.assertEqual(state(buffered), state(direct))
+        self.assertEqual(state(direct)[0], (2, 1, 80))
+
+
+class FilmCounterShardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.filmmaker = make_user("maker@example.com")
+        self.films = [make_film(self.filmmaker, f"Counted {i}") for i in range(3)]
+
+    def film_columns(self, film):
+        film.refresh_from_db()
+        return film.total_views, film.unique_views, film.total_watch_time
+
+    def test_increments_land_on_shards_not_the_film_row(self):
+        from . import counters as film_counters
+        from .models import FilmCounterShard
+
+        film = self.films[0]
+        with self.settings(FILM_COUNTER_SHARDS=4):
+            for _ in range(20):
+                film_counters.increment(film.id, total_views=1, unique_views=1, total_watch_time=30)
+
+        self.assertEqual(self.film_columns(film), (0, 0, 0))
+        shards = FilmCounterShard.objects.filter(film=film)
+        self.assertTrue(all(0 <= s.shard < 4 for s in shards))
+        self.assertEqual(sum(s.total_views for s in shards), 20)
+        self.assertEqual(sum(s.total_watch_time for s in shards), 600)
+        self.assertEqual(
+            film_counters.totals(film.id, use_cache=False),
+            {"total_views": 20, "unique_views": 20, "total_watch_time": 600},
+        )
+
+    def test_zero_shards_update_the_film_row(self):
+        from . import counters as film_counters
+        from .models import FilmCounterShard
+
+        film = self.films[0]
+        with self.settings(FILM_COUNTER_SHARDS=0):
+            film_counters.increment(film.id, total_views=1, unique_views=1)
+            film_counters.increment(film.id, total_views=1, total_watch_time=45)
+
+        self.assertEqual(self.film_columns(film), (2, 1, 45))
+        self.assertFalse(FilmCounterShard.objects.exists())
+
+    def test_totals_for_several_films_are_one_query_then_cached(self):
+        from . import counters as film_counters
+
+        Film.objects.filter(pk=self.films[0].pk).update(total_views=100, unique_views=40, total_watch_time=9000)
+        with self.settings(FILM_COUNTER_SHARDS=4):
+            for film in self.films[:2]:
+                for _ in range(5):
+                    film_counters.increment(film.id, total_views=1, total_watch_time=10)
+
+        ids = [film.id for film in self.films]
+        with self.settings(FILM_COUNTER_CACHE_TTL=60):
+            with self.assertNumQueries(1):
+                totals = film_counters.totals_for_films(ids)
+            self.assertEqual(totals, {
+                ids[0]: {"total_views": 105, "unique_views": 40, "total_watch_time": 9050},
+                ids[1]: {"total_views": 5, "unique_views": 0, "total_watch_time": 50},
+                ids[2]: {"total_views": 0, "unique_views": 0, "total_watch_time": 0},
+            })
+
+            with self.settings(FILM_COUNTER_SHARDS=4):
+                film_counters.increment(ids[1], total_views=1)
+            # within the TTL the cached totals are served without a query
+            with self.assertNumQueries(0):
+                self.assertEqual(film_counters.totals_for_films(ids), totals)
+            self.assertEqual(film_counters.totals(ids[1], use_cache=False)["total_views"], 6)
+
+    def test_compact_folds_shards_into_the_film_columns(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from . import counters as film_counters
+        from .models import FilmCounterShard
+
+        Film.objects.filter(pk=self.films[0].pk).update(total_views=7, unique_views=3, total_watch_time=700)
+        with self.settings(FILM_COUNTER_SHARDS=8):
+            for i, film in enumerate(self.films):
+                for _ in range(10 * (i + 1)):
+                    film_counters.increment(film.id, total_views=1, unique_views=1, total_watch_time=15)
+
+        ids = [film.id for film in self.films]
+        before = film_counters.totals_for_films(ids, use_cache=False)
+        call_command("compact_film_counters", stdout=StringIO())
+
+        self.assertFalse(FilmCounterShard.objects.exists())
+        self.assertEqual(film_counters.totals_for_films(ids), before)
+        for film in self.films:
+            counts = before[film.id]
+            self.assertEqual(
+                self.film_columns(film),
+                (counts["total_views"], counts["unique_views"], counts["total_watch_time"]),
+            )
+        self.assertEqual(self.film_columns(self.films[0]), (17, 13, 850))
+        self.assertEqual(film_counters.compact(), 0)
+
+
+# Query budgets: film cards must cost the same number of queries for 2 or 10 films
+class FilmCardQueryBudgetTests(TestCase):
+    BUDGETS = {
+        "trending": 3,  # score index scan + films + genres
+        "latest": 2,    # films + genres
+        "details": 4,   # film + genres + related films + related genres
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filmmaker = make_user("maker@example.com")
+        cls.genres = [Genre.objects.create(name=name) for name in ("Drama", "Thriller", "Comedy")]
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def add_films(self, count):
+        return [make_film(self.filmmaker, f"Film {i}", genres=self.genres[:2], year=2020) for i in range(count)]
+
+    def get(self, view, data=None):
+        request = self.factory.generic("GET", "/", json.dumps(data or {}), content_type="application/json")
+        response = view.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        if hasattr(response, "render"):  # DRF Response (feeds return pre-rendered bytes)
+            response.render()
+        return json.loads(response.content)
+
+    def assert_budget(self, name, view, data_factory=None):
+        for count in (2, 10):
+            Film.objects.all().delete()
+            films = self.add_films(count)
+            cache.clear()
+            data = data_factory(films) if data_factory else None
+            with self.assertNumQueries(self.BUDGETS[name]):
+                payload = self.get(view, data)
+        return payload
+
+    def test_trending_query_budget(self):
+        payload = self.assert_budget("trending", TrendingFilmsView)
+        self.assertEqual(len(payload["data"]), 10)
+
+    def test_latest_query_budget(self):
+        payload = self.assert_budget("latest", LatestFilmsView)
+        card = payload["data"][0]
+        self.assertEqual(card["genre"], ["Drama", "Thriller"])
+        self.assertTrue(card["thumbnail"].startswith("https://res.cloudinary.com/"))
+        self.assertNotIn("full_film_duration", card)
+
+    def test_details_and_related_query_budget(self):
+        payload = self.assert_budget("details", FilmDetailsView, lambda films: {"film_id": films[0].id})
+        self.assertIn("full_film_duration", payload["film_details"])
+        self.assertEqual(len(payload["related_movies"]), 9)
+
+
+class FeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.filmmaker = make_user("maker@example.com")
+
+    def get_latest(self):
+        response = LatestFilmsView.as_view()(self.factory.get("/api/flims/latest"))
+        return json.loads(response.content)
+
+    def test_feed_is_served_from_cache_until_a_film_changes(self):
+        film = make_film(self.filmmaker, "First")
+        self.assertEqual([c["id"] for c in self.get_latest()["data"]], [film.id])
+
+        with self.assertNumQueries(0):
+            self.get_latest()
+
+        film.status = "REJECTED"
+        film.save()  # post_save bumps the feed version
+        self.assertEqual(self.get_latest()["data"], [])
+
+    def test_stale_feed_is_served_while_another_worker_rebuilds(self):
+        from . import feed_cache
+
+        make_film(self.filmmaker, "First")
+        first = self.get_latest()
+        feed_cache.bump_version()
+        cache.add("feed:latest:lock", 1)  # another worker holds the rebuild lock
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_latest(), first)
+
+
+class TrendingScoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+
+    def play(self, film, count, days_ago=0):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import FilmPlayView
+
+        plays = FilmPlayView.objects.bulk_create(FilmPlayView(film=film, viewer=self.viewer) for _ in range(count))
+        FilmPlayView.objects.filter(pk__in=[p.pk for p in plays]).update(
+            viewed_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_recent_plays_outrank_older_ones(self):
+        from . import trending
+
+        old_hit = make_film(self.filmmaker, "Old Hit")
+        new_hit = make_film(self.filmmaker, "New Hit")
+        unpublished = make_film(self.filmmaker, "Draft", status="REVIEW")
+        self.play(old_hit, 6, days_ago=10)
+        self.play(new_hit, 2)
+        self.play(unpublished, 50)
+
+        trending.recompute()
+        self.assertEqual(trending.top_film_ids(), [new_hit.id, old_hit.id])
+
+        # incremental plays move the ranking without a recompute
+        trending.record_plays(old_hit.id, plays=3)
+        self.assertEqual(trending.top_film_ids()[0], old_hit.id)
+
+        # publishing a film makes its score visible
+        unpublished.status = "PUBLISHED"
+        unpublished.save()
+        self.assertEqual(trending.top_film_ids()[0], unpublished.id)
+
+    def test_scores_survive_thousands_of_half_lives(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import trending
+        from .models import FilmTrendingScore
+
+        old_hit = make_film(self.filmmaker, "Old Hit")
+        new_hit = make_film(self.filmmaker, "New Hit")
+        far = timezone.now() + timedelta(days=5 * 365)
+        with self.settings(TRENDING_HALF_LIFE_HOURS=1):  # ~44k half-lives past the epoch
+            trending.record_plays(old_hit.id, plays=50, at=far - timedelta(hours=10))
+            trending.record_plays(new_hit.id, plays=1, at=far)
+            trending.record_plays(new_hit.id, plays=1, at=far)
+            self.assertEqual(trending.top_film_ids(), [new_hit.id, old_hit.id])
+            score = FilmTrendingScore.objects.get(film=new_hit).score
+            self.assertAlmostEqual(trending.decayed(score, now=far), 2.0)
+
+
+class FilmSearchTests(TestCase):
+    def setUp(self):
+        from . import search
+
+        search.reset_index()
+        self.addCleanup(search.reset_index)
+        filmmaker = make_user("maker@example.com")
+        noir = Genre.objects.create(name="Noir")
+        self.night = make_film(filmmaker, "Night Train", logline="A conductor keeps a secret", genres=[noir])
+        self.nightmare = make_film(filmmaker, "Nightmare Alley", logline="Carnival grifters")
+        self.train = make_film(filmmaker, "The Last Stop", logline="Night shift on the train")
+        self.draft = make_film(filmmaker, "Night Draft", status="REVIEW")
+
+    def assert_backends(self, query, expected):
+        """`expected` is a list of ranks; a set inside it means any order within that rank."""
+        from . import search
+
+        for backend in ("python", "fts5"):
+            index = search.make_index(backend)
+            index.build(search.documents_from_db())
+            found = [film_id for film_id, _ in index.search(query)]
+            ranks = [group if isinstance(group, set) else {group} for group in expected]
+            self.assertEqual(len(found), sum(len(r) for r in ranks), backend)
+            for rank in ranks:
+                self.assertEqual(set(found[:len(rank)]), rank, backend)
+                found = found[len(rank):]
+
+    def test_prefix_search_ranks_title_matches_first(self):
+        self.assert_backends("nigh", [{self.night.id, self.nightmare.id}, self.train.id])
+        self.assert_backends("night tr", [self.night.id, self.train.id])
+        self.assert_backends("noir", [self.night.id])
+
+    def test_substring_matches_fill_remaining_slots(self):
+        self.assert_backends("mare", [self.nightmare.id])
+
+    def test_index_follows_film_changes(self):
+        from . import search
+
+        index = search.get_index()
+        self.assertEqual([r[0] for r in index.search("draft")], [])
+
+        self.draft.status = "PUBLISHED"
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.draft.save()
+            raise RuntimeError("rolled back")
+        self.assertEqual(index.search("draft"), [])  # no phantom entry
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.save()
+        self.assertEqual([r[0] for r in index.search("draft")], [self.draft.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.delete()
+        self.assertEqual(index.search("draft"), [])
+
+    def test_file_index_is_shared_between_workers(self):
+        import os
+        import shutil
+        import tempfile
+        from . import search
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "search.sqlite3")
+        with self.settings(SEARCH_BACKEND="fts5", SEARCH_INDEX_PATH=path):
+            search.reset_index()
+            self.assertTrue(search.get_index().shared)
+            other_worker = search.make_index()  # a second process opening the same file
+            self.assertTrue(other_worker.is_built())
+            self.assertEqual(other_worker.search("draft"), [])
+
+            self.draft.status = "PUBLISHED"
+            with self.captureOnCommitCallbacks(execute=True):
+                self.draft.save()  # signal in "this" worker
+            self.assertEqual([r[0] for r in other_worker.search("draft")], [self.draft.id])
+
+    def test_saves_never_build_the_shared_index(self):
+        import os
+        import shutil
+        import tempfile
+        from . import search
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with self.settings(SEARCH_BACKEND="fts5", SEARCH_INDEX_PATH=os.path.join(directory, "search.sqlite3")):
+            search.reset_index()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.draft.save()
+            self.assertFalse(search.make_index().is_built())  # left to rebuild_search_index / the first search
+
+    def test_process_indexes_rebuild_when_the_version_moves(self):
+        from . import search
+
+        with self.settings(SEARCH_BACKEND="python"):
+            search.reset_index()
+            search.get_index()
+            # another worker publishes the film: only the shared version stamp tells us
+            Film.objects.filter(pk=self.draft.pk).update(status="PUBLISHED")
+            self.assertEqual(search.get_index().search("draft"), [])
+            search.bump_version()
+            self.assertEqual([r[0] for r in search.get_index().search("draft")], [self.draft.id])
+
+
+class FilmAnalyticsTests(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from subscription.models import Transaction
+        from .models import FilmPlayView
+
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+        self.film = make_film(self.filmmaker, "Charted")
+        self.today = timezone.localdate()
+        now = timezone.now()
+
+        for days_ago, count in ((0, 3), (2, 1), (6, 2), (7, 5)):  # day 7 is outside a 7 day window
+            plays = FilmPlayView.objects.bulk_create(FilmPlayView(film=self.film, viewer=self.viewer) for _ in range(count))
+            FilmPlayView.objects.filter(pk__in=[p.pk for p in plays]).update(viewed_at=now - timedelta(days=days_ago))
+
+        for weeks_ago, tx_type, amount in ((0, "purchase", 10), (0, "rent", 2.5), (1, "fund", 99), (3, "rent", 4)):
+            tx = Transaction.objects.create(
+                user=self.viewer, film=self.film, source="reelbux", tx_type=tx_type, amount=amount, status="completed"
+            )
+            Transaction.objects.filter(pk=tx.pk).update(created_at=now - timedelta(weeks=weeks_ago))
+
+        from . import rollups
+        rollups.backfill()
+
+    def test_series_are_one_query_each(self):
+        from . import analytics
+
+        with self.assertNumQueries(1):
+            views = analytics.views_by_period(self.film, count=7, granularity="day")
+        self.assertEqual([p["views"] for p in views], [2, 0, 0, 0, 1, 0, 3])
+        self.assertEqual(views[-1]["start"], self.today)
+
+        with self.assertNumQueries(1):
+            earnings = analytics.earnings_by_period(self.film, count=4, granularity="week")
+        self.assertEqual([float(p["earning"]) for p in earnings], [4.0, 0, 0, 12.5])
+
+        months = analytics.views_by_period(self.film, count=2, granularity="month")
+        self.assertEqual(sum(p["views"] for p in months), 11)  # two months always cover the last 8 days
+
+    def test_analytics_view_keeps_its_response_shape(self):
+        from datetime import date, timedelta
+        from rest_framework.test import force_authenticate
+        from .views import MyTitlesAnalyticsView
+
+        request = APIRequestFactory().generic(
+            "GET", "/?weeks=4", json.dumps({"film_id": self.film.id}), content_type="application/json"
+        )
+        force_authenticate(request, user=self.filmmaker)
+        response = MyTitlesAnalyticsView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["daily_views"]), 7)
+        self.assertEqual(response.data["daily_views"][-1], {"date": self.today.strftime("%Y-%m-%d"), "views": 3})
+        self.assertEqual(len(response.data["weekly_earnings"]), 4)
+        last_week = response.data["weekly_earnings"][-1]
+        self.assertEqual(last_week["earning"], 12.5)
+        self.assertEqual(
+            date.fromisoformat(last_week["week_end"]) - date.fromisoformat(last_week["week_start"]), timedelta(days=6)
+        )
+
+
+class FilmDailyStatsTests(TestCase):
+    def setUp(self):
+        from .playback import recent_plays
+        from .rollups import pending
+
+        cache.clear()
+        recent_plays.clear()
+        pending.clear()
+        self.addCleanup(pending.clear)
+        self.filmmaker = make_user("maker@example.com")
+        self.viewers = [make_user(f"viewer{i}@example.com") for i in range(2)]
+        self.film = make_film(self.filmmaker, "Rolled Up", buy_price=10)
+
+    def post(self, view, user, data):
+        from rest_framework.test import force_authenticate
+
+        request = APIRequestFactory().post("/", data, format="json")
+        force_authenticate(request, user=user)
+        with self.captureOnCommitCallbacks(execute=True):  # each request commits
+            return view.as_view()(request)
+
+    def test_live_rollups_match_a_backfill(self):
+        from .models import FilmDailyStats
+        from .views import RecordFilmViewAPIView, RecordWatchTimeAPIView
+        from . import rollups
+
+        for viewer in (self.viewers[0], self.viewers[0], self.viewers[1]):  # the repeat is deduplicated
+            self.post(RecordFilmViewAPIView, viewer, {"film_id": self.film.id})
+        self.post(RecordWatchTimeAPIView, self.viewers[0], {"film_id": self.film.id, "watch_time": 40})
+
+        # plays and heartbeats are queued, not written on the request path; one flush writes one row
+        self.assertFalse(FilmDailyStats.objects.filter(film=self.film).exists())
+        self.assertEqual(len(rollups.pending), 1)
+        rollups.pending.flush()
+        self.assertEqual(len(rollups.pending), 0)
+
+        # a ReelBux purchase bumps the earnings columns
+        from subscription.models import Wallet
+        from .reelbux_for_film_purchase import FilmPurchaseReelBuxView
+
+        make_user("platform@example.com", is_platform=True)
+        Wallet.objects.create(user=self.viewers[1], reel_bux_balance=50)
+        response = self.post(FilmPurchaseReelBuxView, self.viewers[1], {"film_id": self.film.id})
+        self.assertEqual(response.status_code, 201)
+
+        fields = ("plays", "unique_viewers", "watch_seconds", "buy_amount", "buy_earning", "commission_earning")
+        live = FilmDailyStats.objects.values(*fields).get(film=self.film)
+        self.assertEqual(
+            live,
+            {"plays": 2, "unique_viewers": 2, "watch_seconds": 40,
+             "buy_amount": Decimal("10.00"), "buy_earning": Decimal("7.00"), "commission_earning": Decimal("0.00")},
+        )
+
+        # the backfill rebuilds the same row from the raw tables; re-running it changes nothing
+        live_sketch = bytes(FilmDailyStats.objects.get(film=self.film).viewer_sketch)
+        for _ in range(2):
+            rollups.backfill()
+            self.assertEqual(FilmDailyStats.objects.values(*fields).get(film=self.film), live)
+            self.assertEqual(bytes(FilmDailyStats.objects.get(film=self.film).viewer_sketch), live_sketch)
+
+
+    def test_a_full_queue_is_flushed_inline(self):
+        from .models import FilmDailyStats
+        from .views import RecordFilmViewAPIView
+
+        with self.settings(ROLLUP_MAX_PENDING=1):
+            self.post(RecordFilmViewAPIView, self.viewers[0], {"film_id": self.film.id})
+        self.assertEqual(FilmDailyStats.objects.get(film=self.film).plays, 1)
+
+    def test_backfill_command_rebuilds_one_film_without_double_counting(self):
+        import io
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import FilmDailyStats
+        from .views import RecordFilmViewAPIView
+        from . import rollups
+
+        for viewer in self.viewers:
+            self.post(RecordFilmViewAPIView, viewer, {"film_id": self.film.id})
+        self.assertEqual(len(rollups.pending), 1)  # queued, not flushed yet
+        yesterday = timezone.localdate() - timedelta(days=1)
+        FilmDailyStats.objects.create(film=self.film, day=yesterday, plays=99)  # no plays behind it any more
+
+        out = io.StringIO()
+        call_command("backfill_film_daily_stats", "--film", self.film.id, "--since", yesterday.isoformat(), stdout=out)
+        self.assertIn("Wrote 1 daily stats row(s)", out.getvalue())
+        self.assertEqual(len(rollups.pending), 0)
+        rollups.pending.flush()
+        self.assertEqual(
+            list(FilmDailyStats.objects.filter(film=self.film).values_list("day", "plays", "unique_viewers")),
+            [(timezone.localdate(), 2, 2)],
+        )
+
+
+class StripeWebhookReplayTests(TestCase):
+    def test_replayed_checkout_is_recorded_once(self):
+        from types import SimpleNamespace
+        from unittest import mock
+        from .models import MyFilms
+        from .stripe_for_film_purchase import StripeWebhookPurchaseView, stripe
+        from subscription.models import Transaction, Wallet
+
+        make_user("platform@example.com", is_platform=True)
+        filmmaker = make_user("maker@example.com")
+        buyer = make_user("buyer@example.com")
+        film = make_film(filmmaker, "Paid Twice", buy_price=10)
+        event = {"type": "checkout.session.completed", "data": {"object": {
+            "payment_intent": "pi_1", "amount_total": 1000,
+            "metadata": {"user_id": buyer.id, "film_id": film.id, "amount": "10.00"},
+        }}}
+
+        with mock.patch.object(stripe.Webhook, "construct_event", return_value=event), \
+                mock.patch.object(stripe.PaymentIntent, "retrieve", return_value=SimpleNamespace(latest_charge="ch_1")), \
+                mock.patch.object(stripe.Charge, "retrieve", return_value=SimpleNamespace(balance_transaction=None)):
+            responses = [
+                StripeWebhookPurchaseView.as_view()(APIRequestFactory().post("/", {}, format="json"))
+                for _ in range(2)
+            ]
+
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        self.assertEqual(responses[1].data["status"], "already recorded")
+        self.assertEqual(MyFilms.objects.filter(user=buyer, film=film).count(), 1)
+        self.assertEqual(Transaction.objects.filter(txn_id="pi_1", user=buyer).count(), 1)
+        self.assertEqual(Wallet.objects.get(user=filmmaker).reel_bux_balance, Decimal("6.59"))  # 70% of the 9.41 net, once
+
+
+class PlaybackSessionTests(TestCase):
+    def setUp(self):
+        from .playback import recent_plays
+        from .rollups import pending
+
+        cache.clear()
+        recent_plays.clear()
+        pending.clear()
+        self.addCleanup(pending.clear)
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+        self.film = make_film(self.filmmaker, "Session Film")
+
+    def post(self, view, user, data):
+        from rest_framework.test import force_authenticate
+
+        request = APIRequestFactory().post("/", data, format="json")
+        force_authenticate(request, user=user)
+        with self.captureOnCommitCallbacks(execute=True):  # each request commits
+            return view.as_view()(request)
+
+    def test_repeated_starts_reuse_one_play(self):
+        from . import playback
+        from .models import FilmPlayView
+        from .views import PlaybackStartAPIView
+
+        first = self.post(PlaybackStartAPIView, self.viewer, {"film_id": self.film.id})
+        again = self.post(PlaybackStartAPIView, self.viewer, {"film_id": self.film.id})
+        self.assertEqual((first.status_code, again.status_code), (201, 200))
+        self.assertTrue(again.data["deduplicated"])
+        read = lambda response: playback.read_session_id(response.data["session_id"])[:4]  # ids are timestamped
+        self.assertEqual(read(first), read(again))
+        self.assertEqual(FilmPlayView.objects.filter(film=self.film).count(), 1)
+        self.assertEqual(again.data["total_views"], 1)
+
+    def test_a_failed_play_leaves_no_partial_rows(self):
+        from unittest import mock
+        from . import playback, rollups
+        from .models import FilmPlayView, FilmView, FilmTrendingScore
+
+        with mock.patch.object(playback.film_counters, "increment", side_effect=RuntimeError("db down")), \
+                self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                playback.record_play(self.film.id, self.viewer.id)
+        self.assertFalse(FilmPlayView.objects.exists())
+        self.assertFalse(FilmView.objects.exists())
+        self.assertFalse(FilmTrendingScore.objects.filter(film=self.film).exists())
+        self.assertEqual((len(rollups.pending), len(playback.recent_plays)), (0, 0))
+
+    def test_heartbeats_update_rows_by_primary_key(self):
+        from .models import FilmPlayView, FilmView
+        from .views import PlaybackStartAPIView, PlaybackHeartbeatAPIView
+
+        session_id = self.post(PlaybackStartAPIView, self.viewer, {"film_id": self.film.id}).data["session_id"]
+        # play UPDATE + view UPDATE + counter UPDATE in one savepoint
+        # (totals come from the counter cache, the rollup is queued)
+        with self.assertNumQueries(5):
+            response = self.post(PlaybackHeartbeatAPIView, self.viewer, {"session_id": session_id, "watch_time": 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data["next_report_in"], 0)
+        self.post(PlaybackHeartbeatAPIView, self.viewer, {"session_id": session_id, "watch_time": 15})
+
+        self.assertEqual(FilmPlayView.objects.get(film=self.film).watch_time, 45)
+        view = FilmView.objects.get(film=self.film, viewer=self.viewer)
+        self.assertEqual((view.watch_time, view.current_watch_time), (45, 15))
+
+    def test_legacy_watch_time_ignores_expired_sessions(self):
+        from unittest import mock
+        from . import playback
+        from .models import FilmView
+        from .views import PlaybackStartAPIView, RecordWatchTimeAPIView
+
+        self.post(PlaybackStartAPIView, self.viewer, {"film_id": self.film.id})
+        session = playback.recent_plays.latest(self.film.id, self.viewer.id)
+        with self.settings(PLAYBACK_SESSION_MAX_AGE=60), \
+                mock.patch.object(playback, "record_watch_time", wraps=playback.record_watch_time) as by_session:
+            self.post(RecordWatchTimeAPIView, self.viewer, {"film_id": self.film.id, "watch_time": 30})
+            playback.recent_plays.remember(session._replace(started=session.started - 61))
+            self.post(RecordWatchTimeAPIView, self.viewer, {"film_id": self.film.id, "watch_time": 15})
+
+        # only the fresh session is updated by primary key; the stale one takes the lookup path
+        self.assertEqual(by_session.call_count, 1)
+        self.assertEqual(FilmView.objects.get(film=self.film, viewer=self.viewer).watch_time, 45)
+
+    def test_session_ids_are_bound_to_their_viewer(self):
+        from .views import PlaybackStartAPIView, PlaybackHeartbeatAPIView
+
+        session_id = self.post(PlaybackStartAPIView, self.viewer, {"film_id": self.film.id}).data["session_id"]
+        other = make_user("other@example.com")
+        response = self.post(PlaybackHeartbeatAPIView, other, {"session_id": session_id, "watch_time": 30})
+        self.assertEqual(response.status_code, 403)
+        response = self.post(PlaybackHeartbeatAPIView, self.viewer, {"session_id": session_id + "x", "watch_time": 30})
+        self.assertEqual(response.status_code, 400)
+
+
+class TelemetryBatchTests(TestCase):
+    def setUp(self):
+        from .playback import recent_plays
+        from .rollups import pending
+
+        cache.clear()
+        recent_plays.clear()
+        pending.clear()
+        self.addCleanup(pending.clear)
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+        self.films = [make_film(self.filmmaker, f"Batch Film {i}") for i in range(3)]
+
+    def post(self, user, data):
+        from rest_framework.test import force_authenticate
+        from .views import TelemetryBatchAPIView
+
+        request = APIRequestFactory().post("/", data, format="json")
+        force_authenticate(request, user=user)
+        return TelemetryBatchAPIView.as_view()(request)
+
+    def test_mixed_batch_returns_per_event_results(self):
+        from .models import FilmPlayView, FilmView
+
+        events = [{"type": "view", "film_id": film.id} for film in self.films]
+        events += [{"type": "watch_time", "film_id": film.id, "watch_time": 20} for film in self.films]
+        events += [
+            {"type": "view", "film_id": self.films[0].id},     # already playing
+            {"type": "view", "film_id": "missing"},
+            {"type": "watch_time", "film_id": self.films[1].id, "watch_time": -5},
+            {"type": "rate", "film_id": self.films[1].id},
+            "not an event",
+        ]
+        response = self.post(self.viewer, {"events": events})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data["accepted"], response.data["duplicates"], response.data["rejected"]), (6, 1, 4)
+        )
+        statuses = [r["status"] for r in response.data["results"]]
+        self.assertEqual(statuses, ["accepted"] * 6 + ["duplicate"] + ["error"] * 4)
+        self.assertEqual([r["index"] for r in response.data["results"]], list(range(len(events))))
+
+        self.assertEqual(FilmPlayView.objects.filter(viewer=self.viewer).count(), 3)
+        for film in self.films:
+            view = FilmView.objects.get(film=film, viewer=self.viewer)
+            self.assertEqual((view.watch_time, view.current_watch_time), (20, 20))
+
+    def test_one_film_lookup_and_grouped_writes(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def batch(heartbeats):
+            events = [{"type": "view", "film_id": film.id} for film in self.films]
+            events += [{"type": "watch_time", "film_id": film.id, "watch_time": 10} for film in self.films] * heartbeats
+            return events
+
+        def queries(email, events):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.post(make_user(email), {"events": events}).status_code, 200)
+            film_lookups = [q for q in ctx.captured_queries if '"movie_film"."filmmaker_id"' in q["sql"]]
+            return len(ctx.captured_queries), len(film_lookups)
+
+        queries("warmup@example.com", batch(1))  # create today's rollup / trending rows
+        # the query count depends on the films in the batch, not on the number of events
+        self.assertEqual(queries("a@example.com", batch(2)), queries("b@example.com", batch(20)))
+        self.assertEqual(queries("c@example.com", batch(2))[1], 1)
+
+    def test_failed_write_releases_the_claimed_plays(self):
+        from unittest import mock
+        from . import telemetry
+        from .models import FilmPlayView
+
+        events = [{"type": "view", "film_id": film.id} for film in self.films]
+        with mock.patch.object(telemetry, "apply_pending", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                telemetry.record_batch(self.viewer.id, events)
+
+        # the retry is recorded, not reported as duplicate
+        results = telemetry.record_batch(self.viewer.id, events)
+        self.assertEqual({r["status"] for r in results}, {"accepted"})
+        self.assertEqual(FilmPlayView.objects.filter(viewer=self.viewer).count(), 3)
+
+    def test_rejects_own_films_and_oversized_batches(self):
+        response = self.post(self.filmmaker, {"events": [{"type": "view", "film_id": self.films[0].id}]})
+        self.assertEqual(response.data["results"][0]["status"], "error")
+        with self.settings(TELEMETRY_BATCH_MAX_EVENTS=2):
+            response = self.post(self.viewer, {"events": [{"type": "view", "film_id": self.films[0].id}] * 3})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post(self.viewer, {"events": []}).status_code, 400)
+
+
+class HeartbeatBackpressureTests(TestCase):
+    def setUp(self):
+        from .telemetry import write_latency
+
+        write_latency.reset()
+        self.addCleanup(write_latency.reset)
+
+    def intervals(self, n=200):
+        from .telemetry import next_report_in
+
+        return [next_report_in() for _ in range(n)]
+
+    def test_idle_interval_is_jittered_around_the_base(self):
+        with self.settings(TELEMETRY_REPORT_INTERVAL=30, TELEMETRY_REPORT_JITTER=0.2):
+            intervals = self.intervals()
+        self.assertTrue(all(24 <= i <= 36 for i in intervals))
+        self.assertGreater(len(set(intervals)), 1)
+
+    def test_slow_writes_stretch_the_interval(self):
+        from .telemetry import write_latency
+
+        with self.settings(TELEMETRY_REPORT_INTERVAL=30, TELEMETRY_REPORT_INTERVAL_MAX=300,
+                           TELEMETRY_REPORT_JITTER=0, TELEMETRY_TARGET_WRITE_LATENCY=0.05):
+            for _ in range(50):
+                write_latency.observe(0.075)  # 1.5x target: halfway to the max
+            self.assertEqual(set(self.intervals(10)), {165})
+            for _ in range(50):
+                write_latency.observe(1.0)
+            self.assertEqual(set(self.intervals(10)), {300})
+
+    def test_failed_background_flushes_are_logged_and_shed_load(self):
+        from unittest import mock
+        from .telemetry import TelemetryBuffer, write_latency
+
+        buffer = TelemetryBuffer()
+
+        def broken_flush():
+            buffer._stop.set()  # one round of the timer loop
+            raise RuntimeError("db down")
+
+        with mock.patch.object(buffer, "flush", side_effect=broken_flush), \
+                self.settings(TELEMETRY_FLUSH_INTERVAL=0), self.assertLogs("movie.telemetry", "ERROR") as logs:
+            buffer._run()
+        self.assertIn("db down", logs.output[0])
+        self.assertEqual(write_latency.failures, 1)
+        with self.settings(TELEMETRY_REPORT_INTERVAL=30, TELEMETRY_REPORT_INTERVAL_MAX=300, TELEMETRY_REPORT_JITTER=0):
+            self.assertEqual(set(self.intervals(10)), {300})
+
+    def test_buffer_depth_stretches_the_interval(self):
+        from unittest import mock
+        from . import telemetry
+
+        buffer = telemetry.TelemetryBuffer()
+        with mock.patch.object(telemetry, "telemetry_buffer", buffer), \
+                self.settings(TELEMETRY_BUFFERED=True, TELEMETRY_MAX_PENDING=100, TELEMETRY_FLUSH_INTERVAL=0,
+                              TELEMETRY_REPORT_INTERVAL=30, TELEMETRY_REPORT_INTERVAL_MAX=130, TELEMETRY_REPORT_JITTER=0):
+            for i in range(50):
+                buffer.record_watch_time("film", f"viewer{i}", 10)  # half full, never flushed
+            self.assertEqual(set(self.intervals(10)), {80})
+
+
+class UniqueViewFilterTests(TestCase):
+    def setUp(self):
+        from .playback import recent_plays
+        from .view_filter import unique_views
+
+        cache.clear()
+        recent_plays.clear()
+        unique_views.clear()
+        self.addCleanup(unique_views.clear)
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+        self.film = make_film(self.filmmaker, "Filtered Film")
+
+    def test_bloom_filter_has_no_false_negatives_and_meets_its_error_rate(self):
+        from .view_filter import BloomFilter
+
+        bloom = BloomFilter(capacity=2000, error_rate=0.01)
+        for i in range(2000):
+            bloom.add(f"film:{i}")
+        self.assertTrue(all(f"film:{i}" in bloom for i in range(2000)))
+        false_positives = sum(f"other:{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.02)
+        self.assertAlmostEqual(bloom.false_positive_rate(), 0.01, delta=0.005)
+        self.assertLess(bloom.memory_bytes, 2500)  # ~9.6 bits per item
+
+    def test_saved_filter_is_topped_up_with_newer_rows(self):
+        import os
+        import tempfile
+        from .models import FilmView
+        from .view_filter import UniqueViewFilter
+
+        FilmView.objects.create(film=self.film, viewer=self.viewer)
+        with tempfile.TemporaryDirectory() as tmp, self.settings(VIEW_FILTER_PATH=os.path.join(tmp, "views.bloom")):
+            first = UniqueViewFilter()
+            first.build()
+            first.save()
+
+            later = make_user("later@example.com")
+            FilmView.objects.create(film=self.film, viewer=later)
+            loaded = UniqueViewFilter()
+            self.assertTrue(loaded.might_contain(self.film.id, self.viewer.id))
+            self.assertTrue(loaded.might_contain(self.film.id, later.id))
+            self.assertEqual(loaded.stats()["items"], 2)
+
+    def test_requests_load_the_built_filter_but_never_build_it(self):
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from .models import FilmView
+        from .view_filter import UniqueViewFilter
+
+        FilmView.objects.create(film=self.film, viewer=self.viewer)
+        with tempfile.TemporaryDirectory() as tmp, \
+                self.settings(VIEW_FILTER_PATH=os.path.join(tmp, "filters", "views.bloom")):
+            cold = UniqueViewFilter()
+            with self.assertNumQueries(0), self.assertLogs("movie.view_filter", "WARNING"):
+                self.assertTrue(cold.might_contain(self.film.id, "someone-else"))  # no file: plain get_or_create
+            self.assertEqual(cold.stats()["items"], 0)
+
+            call_command("build_view_filter", stdout=io.StringIO())
+            warm = UniqueViewFilter()
+            self.assertTrue(warm.might_contain(self.film.id, self.viewer.id))
+            self.assertFalse(warm.might_contain(self.film.id, "someone-else"))
+
+    def test_new_viewers_skip_the_select(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .view_filter import unique_views
+
+        unique_views.build()
+        with CaptureQueriesContext(connection) as ctx:
+            view_id, created = unique_views.get_or_create(self.film.id, self.viewer.id)
+        self.assertTrue(created)
+        self.assertFalse(any(q["sql"].startswith("SELECT") for q in ctx.captured_queries))
+
+        again_id, created = unique_views.get_or_create(self.film.id, self.viewer.id)
+        self.assertEqual((again_id, created), (view_id, False))
+        self.assertEqual(unique_views.stats()["definite_misses"], 1)
+        self.assertEqual(unique_views.stats()["probable_hits"], 1)
+
+    def test_stale_filter_still_counts_unique_views_once(self):
+        from .models import FilmView
+        from .playback import record_play
+        from .view_filter import unique_views
+
+        unique_views.build()
+        FilmView.objects.create(film=self.film, viewer=self.viewer)  # e.g. inserted by another process
+        record_play(self.film.id, self.viewer.id)
+
+        self.assertEqual(FilmView.objects.filter(film=self.film, viewer=self.viewer).count(), 1)
+        self.assertEqual(unique_views.stats()["stale_misses"], 1)
+        self.film.refresh_from_db()
+        self.assertEqual((self.film.total_views, self.film.unique_views), (1, 0))
+
+
+class UniqueViewerSketchTests(TestCase):
+    def test_estimates_are_close_and_merges_are_unions(self):
+        from .hll import HyperLogLog, merge
+
+        monday = HyperLogLog().update(f"viewer{i}" for i in range(5000))
+        tuesday = HyperLogLog().update(f"viewer{i}" for i in range(2500, 10000))  # half of Monday returns
+        self.assertAlmostEqual(monday.count(), 5000, delta=5000 * 0.07)
+        week = merge([monday.to_bytes(), b"", tuesday.to_bytes()])
+        self.assertAlmostEqual(week.count(), 10000, delta=10000 * 0.07)
+        self.assertEqual(HyperLogLog().update(["a", "b", "c", "a"]).count(), 3)
+        self.assertLess(len(HyperLogLog().update(["a"]).to_bytes()), 100)
+
+    def test_analytics_reports_recent_unique_viewers(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .hll import HyperLogLog
+        from .models import FilmDailyStats
+        from .views import MyTitlesAnalyticsView
+        from rest_framework.test import force_authenticate
+
+        filmmaker = make_user("maker@example.com")
+        film = make_film(filmmaker, "Sketched")
+        today = timezone.localdate()
+        for days_ago, viewers in ((0, range(0, 40)), (3, range(20, 60)), (20, range(100, 130))):
+            FilmDailyStats.objects.create(
+                film=film, day=today - timedelta(days=days_ago),
+                viewer_sketch=HyperLogLog().update(f"v{i}" for i in viewers).to_bytes(),
+            )
+
+        request = APIRequestFactory().generic("GET", "/", json.dumps({"film_id": film.id}), content_type="application/json")
+        force_authenticate(request, user=filmmaker)
+        response = MyTitlesAnalyticsView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        # estimates: v0..v59 (the overlap counted once), then 30 more viewers 20 days ago
+        self.assertAlmostEqual(response.data["unique_viewers_last_7_days"], 60, delta=3)
+        self.assertAlmostEqual(response.data["unique_viewers_last_30_days"], 90, delta=4)
+
+
+class MyLibraryTests(TestCase):
+    def setUp(self):
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+
+    def get(self, **params):
+        from rest_framework.test import force_authenticate
+        from .views import MyLibraryView
+
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.viewer)
+        return MyLibraryView.as_view()(request)
+
+    def add_titles(self, count, access_type="Buy", **fields):
+        from .models import FilmView, MyFilms
+
+        for i in range(count):
+            film = make_film(self.filmmaker, f"{access_type} {i} {MyFilms.objects.count()}", full_film_duration=200)
+            MyFilms.objects.create(user=self.viewer, film=film, access_type=access_type, **fields)
+            FilmView.objects.create(film=film, viewer=self.viewer, current_watch_time=50)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.add_titles(2)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(len(self.get(page_size=2).data["data"]), 2)
+        self.add_titles(18)
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.get(page_size=20)
+        self.assertEqual(len(response.data["data"]), 20)
+        self.assertEqual(len(small.captured_queries), 3)  # stats aggregate + page count + page rows
+        self.assertEqual(response.data["data"][0]["current_watch_time"], 50)
+        self.assertEqual(response.data["data"][0]["watch_progress"], 25.0)
+
+    def test_expired_rentals_are_hidden_without_writes(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import MyFilms
+
+        self.add_titles(1, "Buy")
+        self.add_titles(1, "Rent", end_date=timezone.now() + timedelta(hours=1))
+        self.add_titles(1, "Rent", end_date=timezone.now() - timedelta(hours=1))
+
+        response = self.get()
+        self.assertEqual(response.data["stats"], {"total_buy": 1, "total_rent": 1})
+        self.assertEqual(response.data["count"], 2)
+        self.assertFalse(MyFilms.objects.exclude(status="Active").exists())
+
+
+class RentalExpiryTests(TestCase):
+    def setUp(self):
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+
+    def rent(self, hours, title):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import MyFilms
+
+        film = make_film(self.filmmaker, title)
+        return MyFilms.objects.create(
+            user=self.viewer, film=film, access_type="Rent", status="active", end_date=timezone.now() + timedelta(hours=hours)
+        )
+
+    def test_expires_due_rentals_in_batches_with_one_event_each(self):
+        from .models import MyFilms
+        from .rentals import expire_due, rental_expired
+
+        ended = [self.rent(-i - 1, f"Ended {i}") for i in range(5)]
+        running = self.rent(2, "Running")
+
+        events = []
+        receiver = lambda sender, **kwargs: events.append(kwargs["my_film_id"])
+        rental_expired.connect(receiver)
+        self.addCleanup(rental_expired.disconnect, receiver)
+
+        self.assertEqual(expire_due(batch_size=2, max_batches=1), 2)
+        self.assertEqual(expire_due(batch_size=2), 3)
+        self.assertEqual(expire_due(batch_size=2), 0)
+        self.assertEqual(sorted(events), sorted(r.id for r in ended))
+        self.assertEqual(MyFilms.objects.get(pk=running.pk).status, "active")
+        self.assertEqual(set(MyFilms.objects.filter(status="expired").values_list("id", flat=True)), {r.id for r in ended})
+
+    def test_ended_rental_does_not_block_access_checks(self):
+        from .rentals import has_access
+
+        ended = self.rent(-1, "Ended")
+        running = self.rent(1, "Running")
+        self.assertFalse(has_access(self.viewer, ended.film))  # before the scheduler runs
+        self.assertTrue(has_access(self.viewer, running.film))
+
+
+class EntitlementCacheTests(TestCase):
+    def setUp(self):
+        from . import entitlements
+
+        cache.clear()
+        entitlements.stats.reset()
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+        self.bought, self.rented, self.other = (make_film(self.filmmaker, title) for title in ("Bought", "Rented", "Other"))
+
+    def grant(self, film, access_type, end_date=None):
+        from .models import MyFilms
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return MyFilms.objects.create(
+                user=self.viewer, film=film, access_type=access_type, status="active", end_date=end_date
+            )
+
+    def test_checks_are_served_from_the_cache_with_write_through(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import entitlements
+
+        self.grant(self.bought, "Buy")
+        with self.assertNumQueries(1):  # first check loads the user's entitlements
+            self.assertTrue(entitlements.can_watch(self.viewer, self.bought))
+        end = timezone.now() + timedelta(hours=2)
+        self.grant(self.rented, "Rent", end_date=end)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(entitlements.can_watch(self.viewer, self.bought))
+            self.assertTrue(entitlements.can_watch(self.viewer, self.rented))
+        with self.assertNumQueries(2):  # a "no" is never taken from the cache
+            self.assertFalse(entitlements.can_watch(self.viewer, self.other))
+            self.assertFalse(entitlements.can_watch(self.viewer, self.rented, now=end + timedelta(seconds=1)))
+        self.assertEqual(entitlements.stats.snapshot()["hit_rate"], round(4 / 7, 4))
+
+    def test_a_stale_cached_no_is_rechecked(self):
+        from .models import MyFilms
+        from . import entitlements
+
+        self.assertFalse(entitlements.can_watch(self.viewer, self.bought))
+        # recorded by another worker: this process's cache never saw the write-through
+        MyFilms.objects.bulk_create([MyFilms(user=self.viewer, film=self.bought, access_type="Buy", status="active")])
+        self.assertTrue(entitlements.can_watch(self.viewer, self.bought))
+        with self.assertNumQueries(0):
+            self.assertTrue(entitlements.can_watch(self.viewer, self.bought))  # the refreshed entry
+
+    def test_per_process_caches_get_a_short_ttl(self):
+        from . import entitlements
+
+        with self.settings(ENTITLEMENT_CACHE_TTL=3600):
+            self.assertEqual(entitlements._ttl(), entitlements.LOCAL_TTL)  # the test cache is locmem
+
+    def test_expired_rentals_drop_the_cached_entry(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import entitlements
+        from .rentals import expire_due
+
+        self.grant(self.rented, "Rent", end_date=timezone.now() + timedelta(hours=1))
+        self.assertTrue(entitlements.can_watch(self.viewer, self.rented))
+        expire_due(now=timezone.now() + timedelta(hours=2))
+        self.assertIsNone(cache.get(entitlements.user_key(self.viewer.id)))
+        self.assertFalse(entitlements.can_watch(self.viewer, self.rented))
+
+    def test_playback_start_only_releases_the_stream_to_entitled_viewers(self):
+        from rest_framework.test import force_authenticate
+        from .models import Film
+        from .views import PlaybackStartAPIView
+
+        Film.objects.filter(pk__in=[self.bought.pk, self.other.pk]).update(film_hls_url="https://cdn.example.com/f.m3u8")
+        self.grant(self.bought, "Buy")
+        for film, expected in ((self.bought, "https://cdn.example.com/f.m3u8"), (self.other, None)):
+            request = APIRequestFactory().post("/", {"film_id": film.id}, format="json")
+            force_authenticate(request, user=self.viewer)
+            response = PlaybackStartAPIView.as_view()(request)
+            self.assertEqual(response.data["film_hls_url"], expected)
+
+
+class PlaybackTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.filmmaker = make_user("maker@example.com")
+        self.viewer = make_user("viewer@example.com")
+        self.film = make_film(self.filmmaker, "Tokenized")
+
+    def request_token(self, user):
+        from rest_framework.test import force_authenticate
+        from .views import PlaybackTokenAPIView
+
+        request = APIRequestFactory().post("/", {"film_id": self.film.id}, format="json")
+        force_authenticate(request, user=user)
+        return PlaybackTokenAPIView.as_view()(request)
+
+    def test_tokens_are_bound_to_user_film_and_expiry(self):
+        import time
+        from .playback_tokens import InvalidToken, issue, verify
+
+        token, expires = issue("u1", "f1", now=1000)
+        self.assertEqual(verify(token, film_id="f1", now=1001), ("u1", "f1", expires))
+        for kwargs in ({"film_id": "f2", "now": 1001}, {"now": expires}):
+            with self.assertRaises(InvalidToken):
+                verify(token, **kwargs)
+        signature = token.split(".")[1]
+        forged = issue("u2", "f1", now=1000)[0].split(".")[0] + "." + signature
+        for bad in (forged, "garbage", "", token + "x"):
+            with self.assertRaises(InvalidToken):
+                verify(bad, now=1001)
+        # a rental ending sooner than the TTL caps the token
+        self.assertEqual(issue("u1", "f1", not_after=time.time() + 60)[1], int(time.time() + 60))
+
+    def test_issue_requires_entitlement_and_verify_needs_no_db(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import MyFilms
+
+        self.assertEqual(self.request_token(self.viewer).status_code, 403)
+        end = timezone.now() + timedelta(minutes=30)  # sooner than PLAYBACK_TOKEN_TTL
+        with self.captureOnCommitCallbacks(execute=True):
+            MyFilms.objects.create(user=self.viewer, film=self.film, access_type="Rent", status="active", end_date=end)
+        response = self.request_token(self.viewer)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["expires_at"], int(end.timestamp()))
+        self.assertEqual(self.request_token(self.filmmaker).status_code, 201)
+
+        from django.urls import reverse
+
+        url = reverse("movie:playback_verify")
+        with self.assertNumQueries(0):
+            ok = self.client.get(url, {"token": response.data["token"], "film_id": self.film.id})
+            wrong_film = self.client.get(url, {"token": response.data["token"], "film_id": "x"})
+        self.assertEqual((ok.status_code, ok["X-Playback-User"]), (204, self.viewer.id))
+        self.assertEqual(wrong_film.status_code, 403)
+
+    def test_unpublished_films_only_stream_to_their_filmmaker(self):
+        from rest_framework.test import force_authenticate
+        from .models import Film, MyFilms
+        from .views import PlaybackStartAPIView
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MyFilms.objects.create(user=self.viewer, film=self.film, access_type="Buy", status="active")
+        Film.objects.filter(pk=self.film.pk).update(status="REVIEW")
+
+        self.assertEqual(self.request_token(self.viewer).status_code, 404)
+        self.assertEqual(self.request_token(self.filmmaker).status_code, 201)
+        request = APIRequestFactory().post("/", {"film_id": self.film.id}, format="json")
+        force_authenticate(request, user=self.viewer)
+        self.assertEqual(PlaybackStartAPIView.as_view()(request).status_code, 404)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Film
+
+        cache.clear()
+        self.filmmaker = make_user("maker@example.com")
+        for i in range(25):
+            make_film(self.filmmaker, f"Title {i}")
+        # ties on created_at are broken by id
+        Film.objects.filter(title__in=[f"Title {i}" for i in range(5, 15)]).update(created_at=timezone.now())
+
+    def get(self, url="/", **params):
+        from rest_framework.test import force_authenticate
+        from .views import MyTitlesView
+
+        request = APIRequestFactory().get(url, params)
+        force_authenticate(request, user=self.filmmaker)
+        return MyTitlesView.as_view()(request)
+
+    def test_cursor_walk_matches_page_numbers_in_both_directions(self):
+        from urllib.parse import parse_qs, urlparse
+
+        by_page = [t["title"] for p in (1, 2, 3) for t in self.get(page=p).data["results"]["data"]]
+
+        def cursor_of(link):
+            return parse_qs(urlparse(link).query)["cursor"][0]
+
+        pages, response = [], self.get(pagination="cursor")
+        self.assertIsNone(response.data["count"])
+        self.assertIsNone(response.data["previous"])
+        while True:
+            pages.append([t["title"] for t in response.data["results"]["data"]])
+            if not response.data["next"]:
+                break
+            response = self.get(cursor=cursor_of(response.data["next"]))
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), by_page)
 
-# Create your tests here.
+        back = self.get(cursor=cursor_of(response.data["previous"]))
+        self.assertEqual([t["title"] for t in back.data["results"]["data"]], pages[1])
+        self.assertEqual(self.get(pagination="cursor", with_count="1").data["count"], 25)
+        self.assertEqual(self.get(cursor="not-a-cursor").status_code, 404)
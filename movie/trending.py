@@ -0,0 +1,149 @@
+"""
+Time-decayed trending engine.
+
+Each play adds 2^((t - TRENDING_EPOCH) / half-life) to the film's forward
+decayed play sum ("forward decay"). Dividing every sum by the same
+2^((now - epoch) / half-life) gives the classic exponentially decayed play
+count, so the ranking never needs old scores to be re-decayed.
+
+`FilmTrendingScore.score` stores log2 of that sum: the exponent grows by one
+per half-life forever, so the sum itself would overflow a float after ~1000
+half-lives (weeks with a short TRENDING_HALF_LIFE_HOURS). The log is just
+hours since epoch / half-life, and adding a play is still a single
+`score = log2(2^score + 2^w)` UPDATE (computed as max + log2(1 + 2^(min - max))).
+Trending is an index range scan on (is_published, -score).
+
+`python manage.py recompute_trending` rebuilds all scores from FilmPlayView.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Value
+from django.db.models.functions import Greatest, Least, Log, Power, TruncHour
+from django.utils import timezone
+
+from .models import Film, FilmPlayView, FilmStatus, FilmTrendingScore, NO_TRENDING_PLAYS
+
+NO_PLAYS = NO_TRENDING_PLAYS  # log-score of a film without plays (2^NO_PLAYS == 0)
+
+
+def half_life_seconds():
+    return getattr(settings, "TRENDING_HALF_LIFE_HOURS", 48) * 3600
+
+
+def epoch():
+    value = getattr(settings, "TRENDING_EPOCH", "2025-01-01")
+    return datetime.fromisoformat(value).replace(tzinfo=dt_timezone.utc)
+
+
+def log_weight(at=None):
+    """log2 of the forward-decay weight of one play at time `at`."""
+    at = at or timezone.now()
+    return (at - epoch()).total_seconds() / half_life_seconds()
+
+
+def log_add(a, b):
+    """log2(2^a + 2^b) without leaving log space."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+
+def decayed(score, now=None):
+    """Convert a stored log-score into a decayed play count as of `now`."""
+    if score <= NO_PLAYS:
+        return 0.0
+    return 2.0 ** min(score - log_weight(now), 1000.0)
+
+
+def record_plays(film_id, plays=1, at=None):
+    """Add `plays` plays at time `at` to a film's trending score."""
+    if not plays:
+        return
+    increment = log_weight(at) + math.log2(plays)
+    value = Value(increment, output_field=FloatField())
+    high = Greatest(F("score"), value)
+    low = Least(F("score"), value)
+    added = high + Log(Value(2.0), Value(1.0) + Power(Value(2.0), low - high))
+    if FilmTrendingScore.objects.filter(film_id=film_id).update(score=added):
+        return
+    try:
+        with transaction.atomic():
+            is_published = Film.objects.filter(pk=film_id, status=FilmStatus.PUBLISHED).exists()
+            FilmTrendingScore.objects.create(film_id=film_id, score=increment, is_published=is_published)
+    except IntegrityError:
+        FilmTrendingScore.objects.filter(film_id=film_id).update(score=added)
+
+
+def sync_status(film):
+    """Keep the denormalized published flag in step with Film.status."""
+    FilmTrendingScore.objects.filter(film_id=film.pk).update(is_published=film.status == FilmStatus.PUBLISHED)
+
+
+def top_film_ids(limit=10):
+    return list(
+        FilmTrendingScore.objects.filter(is_published=True, score__gt=NO_PLAYS)
+        .order_by("-score")
+        .values_list("film_id", flat=True)[:limit]
+    )
+
+
+def top_films(limit=10, fields=None):
+    """
+    Top `limit` published films by decayed score, topped up with the
+    all-time most viewed films when fewer have recent plays.
+    """
+    ids = top_film_ids(limit)
+    films = Film.objects.all()
+    if fields:
+        films = films.only(*fields)
+
+    ranked = []
+    if ids:
+        by_id = films.in_bulk(ids)
+        ranked = [by_id[i] for i in ids if i in by_id]
+    if len(ranked) < limit:
+        ranked += list(
+            films.filter(status=FilmStatus.PUBLISHED).exclude(pk__in=ids)
+            .order_by("-unique_views")[:limit - len(ranked)]
+        )
+    return ranked
+
+
+def recompute(window_days=None, batch_size=1000):
+    """
+    Rebuild every film's score from FilmPlayView in one GROUP BY over hourly
+    buckets. Plays older than `window_days` weigh < 2^-(window / half-life)
+    and are ignored. Returns the number of films written.
+    """
+    if window_days is None:
+        window_days = getattr(settings, "TRENDING_WINDOW_DAYS", 30)
+    since = timezone.now() - timedelta(days=window_days)
+
+    buckets = (
+        FilmPlayView.objects.filter(viewed_at__gte=since)
+        .order_by()
+        .annotate(hour=TruncHour("viewed_at"))
+        .values("film_id", "hour")
+        .annotate(plays=Count("id"))
+    )
+    scores = {}
+    for row in buckets:
+        # weight each bucket at its midpoint
+        at = row["hour"] + timedelta(minutes=30)
+        bucket = log_weight(at) + math.log2(row["plays"])
+        scores[row["film_id"]] = log_add(scores.get(row["film_id"], NO_PLAYS), bucket)
+
+    rows = [
+        FilmTrendingScore(film_id=film_id, score=scores.get(film_id, NO_PLAYS), is_published=status == FilmStatus.PUBLISHED)
+        for film_id, status in Film.objects.values_list("id", "status").iterator(chunk_size=batch_size)
+    ]
+    FilmTrendingScore.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["film"],
+        update_fields=["score", "is_published", "updated_at"],
+    )
+    return len(rows)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import FilmUploadView, cloudinary_webhook, FilmDetailsView, RecordFilmViewAPIView, RecordWatchTimeAPIView, TrendingFilmsView, LatestFilmsView, MyTitlesView, MyTitlesAnalyticsView, GenreListView, GlobalSearchListView, MyLibraryView
+from .views import FilmUploadView, cloudinary_webhook, FilmDetailsView, RecordFilmViewAPIView, RecordWatchTimeAPIView, PlaybackStartAPIView, PlaybackHeartbeatAPIView, PlaybackTokenAPIView, verify_playback_token, TelemetryBatchAPIView, TrendingFilmsView, LatestFilmsView, MyTitlesView, MyTitlesAnalyticsView, GenreListView, GlobalSearchListView, MyLibraryView
 from .reelbux_for_film_purchase import *
 from .reelbux_for_film_rented import *
 from .paypal_for_film_purchase import *
@@ -19,6 +19,11 @@ urlpatterns = [
     # ----------- Extra ------------#
     path("views-count", RecordFilmViewAPIView.as_view(), name="views_count"),
     path("watch-time-count", RecordWatchTimeAPIView.as_view(), name="watch_time_count"),
+    path("playback/start", PlaybackStartAPIView.as_view(), name="playback_start"),
+    path("playback/heartbeat", PlaybackHeartbeatAPIView.as_view(), name="playback_heartbeat"),
+    path("playback/token", PlaybackTokenAPIView.as_view(), name="playback_token"),
+    path("playback/verify", verify_playback_token, name="playback_verify"),
+    path("telemetry/batch", TelemetryBatchAPIView.as_view(), name="telemetry_batch"),
     # ----------- End -------------#
 
     # trending, latest & film details
@@ -0,0 +1,260 @@
+"""
+Bloom-filter fast path for unique-view detection.
+
+Every play used to run `FilmView.objects.get_or_create(film, viewer)` just to
+decide whether `unique_views` moves, and most plays come from repeat viewers.
+`unique_views` keeps a Bloom filter of (film_id, viewer_id) pairs that have a
+`FilmView` row:
+
+  * definite miss -> straight INSERT (no SELECT first),
+  * probable hit  -> the usual get_or_create (a false positive costs what every
+    play used to cost).
+
+The filter is built from `FilmView` by `python manage.py build_view_filter`
+(run it after migrating) and saved as a compact bit array to VIEW_FILTER_PATH
+(default var/view_filter-<db name>.bloom). Each process loads the file on first
+use, tops it up with the rows inserted after it was written, and saves it again
+on exit; requests never scan FilmView. Until a file exists every play takes the
+plain get_or_create path (the file is looked for again every RELOAD_INTERVAL
+seconds). A stale filter can only cause a "miss" for a row that exists (another
+process inserted it): the INSERT hits the (film, viewer) unique constraint and
+we fall back to reading the row, so counts stay correct.
+"""
+import atexit
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import FilmView
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RLBF1"
+HEADER = struct.Struct(">5sQIQQ")  # magic, bits, hashes, items, last FilmView id
+RELOAD_INTERVAL = 60  # seconds between looks for a filter file that wasn't there
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for `capacity` items at `error_rate` false positives."""
+
+    def __init__(self, capacity=1_000_000, error_rate=0.01, bits=None, hashes=None):
+        capacity = max(int(capacity), 1)
+        self.bits = bits or max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.items = 0
+
+    def _positions(self, key):
+        # double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        """Add `key`; returns False if it was (probably) already there."""
+        new = False
+        for pos in self._positions(key):
+            byte, bit = divmod(pos, 8)
+            if not self.array[byte] & (1 << bit):
+                self.array[byte] |= 1 << bit
+                new = True
+        if new:
+            self.items += 1
+        return new
+
+    def __contains__(self, key):
+        return all(self.array[pos // 8] & (1 << (pos % 8)) for pos in self._positions(key))
+
+    @property
+    def memory_bytes(self):
+        return len(self.array)
+
+    def false_positive_rate(self):
+        """Expected false-positive rate at the current fill: (1 - e^(-kn/m))^k."""
+        return (1 - math.exp(-self.hashes * self.items / self.bits)) ** self.hashes
+
+    # ---- persistence ----
+    def save(self, path, last_id=0):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.bits, self.hashes, self.items, last_id))
+            f.write(self.array)
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    @classmethod
+    def load(cls, path):
+        """(filter, last_id), or (None, 0) if the file is missing or not a filter."""
+        try:
+            with open(path, "rb") as f:
+                magic, bits, hashes, items, last_id = HEADER.unpack(f.read(HEADER.size))
+                array = f.read()
+        except (OSError, struct.error):
+            return None, 0
+        if magic != MAGIC or len(array) != (bits + 7) // 8:
+            return None, 0
+        bloom = cls(bits=bits, hashes=hashes)
+        bloom.array = bytearray(array)
+        bloom.items = items
+        return bloom, last_id
+
+
+def _key(film_id, viewer_id):
+    return f"{film_id}:{viewer_id}"
+
+
+class UniqueViewFilter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._looked_at = None  # monotonic time of the last load attempt that found no file
+        self.last_id = 0  # highest FilmView id folded in at build/load time
+        self.reset_stats()
+
+    @property
+    def path(self):
+        """VIEW_FILTER_PATH, or by default var/view_filter-<db name>.bloom ("" for an in-memory test DB)."""
+        path = getattr(settings, "VIEW_FILTER_PATH", "")
+        if path:
+            return path
+        from django.db import connection
+
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            return ""
+        name = os.path.splitext(os.path.basename(str(connection.settings_dict["NAME"])))[0]
+        return os.path.join(settings.BASE_DIR, "var", f"view_filter-{name}.bloom")
+
+    @property
+    def enabled(self):
+        return getattr(settings, "VIEW_FILTER_ENABLED", True)
+
+    def reset_stats(self):
+        self.definite_misses = 0
+        self.probable_hits = 0
+        self.false_positives = 0  # probable hit, but the pair was new
+        self.stale_misses = 0     # definite miss, but the row existed
+
+    # ---- build ----
+    def build(self, batch_size=10000):
+        """Rebuild from every FilmView row (sized for twice the current rows)."""
+        rows = FilmView.objects.count()
+        bloom = BloomFilter(
+            capacity=max(getattr(settings, "VIEW_FILTER_CAPACITY", 1_000_000), 2 * rows),
+            error_rate=getattr(settings, "VIEW_FILTER_ERROR_RATE", 0.01),
+        )
+        last_id = self._fold_in(bloom, FilmView.objects.all(), batch_size)
+        with self._lock:
+            self._bloom, self.last_id = bloom, last_id
+        return bloom
+
+    def _fold_in(self, bloom, queryset, batch_size=10000):
+        last_id = 0
+        for pk, film_id, viewer_id in queryset.order_by().values_list("id", "film_id", "viewer_id").iterator(
+            chunk_size=batch_size
+        ):
+            bloom.add(_key(film_id, viewer_id))
+            last_id = max(last_id, pk)
+        return last_id
+
+    def _ensure(self):
+        """The loaded filter, or None if build_view_filter hasn't written one yet."""
+        if self._bloom is not None:
+            return self._bloom
+        if self._looked_at is not None and time.monotonic() - self._looked_at < RELOAD_INTERVAL:
+            return None
+        with self._lock:
+            if self._bloom is None:
+                path = self.path
+                bloom, last_id = BloomFilter.load(path) if path else (None, 0)
+                if bloom is not None:
+                    # rows inserted since the file was written (an id range scan)
+                    self.last_id = max(last_id, self._fold_in(bloom, FilmView.objects.filter(id__gt=last_id)))
+                    self._bloom = bloom
+                else:
+                    if self._looked_at is None and path:
+                        logger.warning("No unique-view filter at %r: run `manage.py build_view_filter`", path)
+                    self._looked_at = time.monotonic()
+        return self._bloom
+
+    def save(self):
+        path = self.path
+        if self._bloom is not None and path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._lock:
+                self._bloom.save(path, self.last_id)
+
+    def clear(self):
+        with self._lock:
+            self._bloom, self._looked_at, self.last_id = None, None, 0
+        self.reset_stats()
+
+    # ---- lookups ----
+    def add(self, film_id, viewer_id):
+        if self._bloom is not None:
+            with self._lock:
+                self._bloom.add(_key(film_id, viewer_id))
+
+    def might_contain(self, film_id, viewer_id):
+        """True unless the filter rules the pair out (always True while no filter is loaded)."""
+        bloom = self._ensure()
+        return bloom is None or _key(film_id, viewer_id) in bloom
+
+    def get_or_create(self, film_id, viewer_id, defaults=None):
+        """
+        (FilmView id, created) for the pair: like FilmView.objects.get_or_create,
+        without the SELECT when the filter rules the pair out.
+        """
+        defaults = defaults or {}
+        if not self.enabled:
+            film_view, created = FilmView.objects.get_or_create(film_id=film_id, viewer_id=viewer_id, defaults=defaults)
+            return film_view.pk, created
+
+        if self.might_contain(film_id, viewer_id):
+            self.probable_hits += 1
+            film_view, created = FilmView.objects.get_or_create(film_id=film_id, viewer_id=viewer_id, defaults=defaults)
+            if created:
+                self.false_positives += 1
+            return film_view.pk, created
+
+        self.definite_misses += 1
+        self.add(film_id, viewer_id)
+        try:
+            with transaction.atomic():
+                return FilmView.objects.create(film_id=film_id, viewer_id=viewer_id, **defaults).pk, True
+        except IntegrityError:
+            self.stale_misses += 1
+            return FilmView.objects.filter(film_id=film_id, viewer_id=viewer_id).values_list("id", flat=True).get(), False
+
+    def stats(self):
+        """Size, expected and observed false-positive rate, memory footprint."""
+        bloom = self._bloom
+        new_pairs = self.false_positives + self.definite_misses - self.stale_misses
+        return {
+            "items": bloom.items if bloom else 0,
+            "bits": bloom.bits if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "memory_bytes": bloom.memory_bytes if bloom else 0,
+            "expected_fp_rate": bloom.false_positive_rate() if bloom else 0.0,
+            "observed_fp_rate": self.false_positives / new_pairs if new_pairs else 0.0,
+            "definite_misses": self.definite_misses,
+            "probable_hits": self.probable_hits,
+            "false_positives": self.false_positives,
+            "stale_misses": self.stale_misses,
+        }
+
+
+unique_views = UniqueViewFilter()
+
+
+@atexit.register
+def _save_on_exit():
+    try:
+        unique_views.save()
+    except Exception:
+        logger.exception("Saving the unique-view filter on exit failed")
@@ -2,17 +2,31 @@ from rest_framework.views import APIView
 import cloudinary
 import cloudinary.uploader
 import json
-from django.http import JsonResponse
+import time
+from django.http import JsonResponse, HttpResponse
+from django.core import signing
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404, render
 from rest_framework.permissions import IsAuthenticated
-from .models import Film, Genre, FilmView, FilmPlayView
+from .models import Film, FilmStatus, Genre, FilmView, FilmPlayView, FilmDailyStats
 from .serializers import FilmSerializer, GenreSerializer
-from datetime import date, timedelta
+from .film_cards import CARD_FIELDS, card_queryset, film_card, film_cards
+from . import feed_cache
+from . import trending
+from . import search
+from . import analytics
+from . import rollups
+from . import playback
+from . import library
+from . import entitlements
+from . import playback_tokens
+from .view_filter import unique_views
+from collections import Counter
+from datetime import timedelta
 from django.db.models import Sum
-from subscription.models import Transaction
 
 
 class FilmUploadView(APIView):
@@ -143,63 +157,18 @@ class FilmDetailsView(APIView):
         # film_id = request.GET.get("film_id", "").strip()
 
         # Fetch film with case-insensitive status check
-        film = get_object_or_404(Film, id=film_id, status__iexact='published')
+        film = get_object_or_404(card_queryset(Film.objects.all()), id=film_id, status__iexact='published')
 
         # Build film details
-        film_details = {
-            "id": film.id,
-            # "filmmaker": str(film.filmmaker),
-            "title": film.title,
-            "slug":film.slug,
-            "year": film.year,
-            "logline": film.logline,
-            "film_type": film.get_film_type_display(),
-            "genre": [g.name for g in film.genre.all()] if hasattr(film.genre, "all") else film.genre,
-            # "status": film.status,
-            "buy_price": film.buy_price,
-            "rent_price": film.rent_price,
-            # "rental_hours": film.rental_hours,
-            "full_film_duration": film.full_film_duration,
-            # "unique_views": film.unique_views,
-            # "total_earning": film.total_earning,
-            "thumbnail": film.thumbnail.url if film.thumbnail else None,
-            "trailer_hls_url": film.trailer_hls_url,
-        }
+        film_details = film_card(film, with_duration=True)
 
         # 🔹 Fetch related films by shared genre
-        if hasattr(film.genre, "all"):
-            related_films = Film.objects.filter(
-                genre__in=film.genre.all(),
-                status__iexact='published'
-            ).exclude(id=film.id).distinct()[:10]
-        else:
-            related_films = Film.objects.filter(
-                genre=film.genre,
-                status__iexact='published'
-            ).exclude(id=film.id)[:10]
+        related_films = Film.objects.filter(
+            genre__in=[g.id for g in film.genre.all()],
+            status__iexact='published'
+        ).exclude(id=film.id).distinct()[:10]
 
-        related_data = [
-            {
-                "id": f.id,
-                # "filmmaker": str(f.filmmaker),
-                "title": f.title,
-                "slug":f.slug,
-                "year": f.year,
-                "logline": f.logline,
-                "film_type": f.get_film_type_display(),
-                "genre": [g.name for g in f.genre.all()] if hasattr(f.genre, "all") else f.genre,
-                # "status": f.status,
-                "buy_price": f.buy_price,
-                "rent_price": f.rent_price,
-                # "rental_hours": f.rental_hours,
-                "full_film_duration": f.full_film_duration,
-                # "unique_views": f.unique_views,
-                # "total_earning": f.total_earning,
-                "thumbnail": f.thumbnail.url if f.thumbnail else None,
-                "trailer_hls_url": f.trailer_hls_url,
-            }
-            for f in related_films
-        ]
+        related_data = film_cards(related_films, with_duration=True)
 
         return Response({
             "status": "success",
@@ -211,6 +180,8 @@ class FilmDetailsView(APIView):
 
 #
 from django.db.models import F
+from .telemetry import telemetry_buffer, record_batch, write_latency, next_report_in
+from . import counters as film_counters
 class RecordFilmViewAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -223,32 +194,30 @@ class RecordFilmViewAPIView(APIView):
         except Film.DoesNotExist:
             return Response({"message": "Film not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if film.filmmaker == viewer:
+        if film.filmmaker_id == viewer.id:
             return Response({"message": "Filmmakers cannot view their own films"})
 
-        # increment total views
-        film.total_views = F("total_views") + 1
-        film.save(update_fields=["total_views"])
-        film.refresh_from_db(fields=["total_views"])
+        # Buffered path: queue the play, counters are written on the next flush
+        # (repeats within the playback session window are dropped, see playback.py)
+        if telemetry_buffer.enabled:
+            playback.start_buffered(film.id, viewer.id)
+            counts = film_counters.totals(film.id)
+            return Response({
+                "message": "View recorded",
+                "unique_views": counts["unique_views"],
+                "total_views": counts["total_views"],
+                "next_report_in": next_report_in()
+            }, status=status.HTTP_201_CREATED)
 
-        # record every play
-        FilmPlayView.objects.create(film=film, viewer=viewer)
-
-        # handle unique view
-        obj, created = FilmView.objects.get_or_create(
-            film=film,
-            viewer=viewer,
-            defaults={"watch_time": 0}
-        )
-        if created:
-            film.unique_views = F("unique_views") + 1
-            film.save(update_fields=["unique_views"])
-            film.refresh_from_db(fields=["unique_views"])
+        # record the play (retries within the playback session window reuse the open one)
+        playback.start(film.id, viewer.id)
+        counts = film_counters.totals(film.id, use_cache=False)
 
         return Response({
             "message": "View recorded",
-            "unique_views": film.unique_views,
-            "total_views": film.total_views
+            "unique_views": counts["unique_views"],
+            "total_views": counts["total_views"],
+            "next_report_in": next_report_in()
         }, status=status.HTTP_201_CREATED)
 
 
@@ -267,13 +236,31 @@ class RecordWatchTimeAPIView(APIView):
         except Film.DoesNotExist:
             return Response({"message": "Film not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if film.filmmaker == viewer:
+        if film.filmmaker_id == viewer.id:
             return Response({"message": "Filmmakers cannot watch their own films"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Increment total watch time on Film
-        film.total_watch_time = F("total_watch_time") + watch_time
-        film.save(update_fields=["total_watch_time"])
-        film.refresh_from_db(fields=["total_watch_time"])
+        # Buffered path: coalesced with other heartbeats for this (film, viewer)
+        if telemetry_buffer.enabled:
+            telemetry_buffer.record_watch_time(film.id, viewer.id, watch_time)
+            return Response({
+                "message": "Watch time recorded",
+                "total_watch_time": film_counters.totals(film.id)["total_watch_time"],
+                "next_report_in": next_report_in()
+            }, status=status.HTTP_200_OK)
+
+        # Play started by this process (and not expired): update its rows by primary key
+        session = playback.recent_plays.live(film.id, viewer.id)
+        if session is not None and session.play_id is not None and playback.record_watch_time(session, watch_time):
+            return Response({
+                "message": "Watch time recorded",
+                "total_watch_time": film_counters.totals(film.id, use_cache=False)["total_watch_time"],
+                "next_report_in": next_report_in()
+            }, status=status.HTTP_200_OK)
+
+        started = time.monotonic()
+        # Increment total watch time on a counter shard
+        film_counters.increment(film.id, total_watch_time=watch_time)
+        rollups.pending.add(film.id, watch_seconds=watch_time)
 
         # Update FilmView for this viewer and film (latest entry)
         last_film_view = FilmView.objects.filter(film=film, viewer=viewer).order_by('-viewed_at').first()
@@ -286,6 +273,7 @@ class RecordWatchTimeAPIView(APIView):
         else:
             # If no FilmView exists, create one
             FilmView.objects.create(film=film, viewer=viewer, watch_time=watch_time, current_watch_time=watch_time)
+            unique_views.add(film.id, viewer.id)
 
         # Update FilmPlayView for this viewer and film (latest entry)
         last_play_view = FilmPlayView.objects.filter(film=film, viewer=viewer).order_by('-viewed_at').first()
@@ -295,80 +283,176 @@ class RecordWatchTimeAPIView(APIView):
         else:
             # If no FilmPlayView exists, create one
             FilmPlayView.objects.create(film=film, viewer=viewer, watch_time=watch_time)
+        write_latency.observe(time.monotonic() - started)
 
         return Response({
             "message": "Watch time recorded",
-            "total_watch_time": film.total_watch_time
+            "total_watch_time": film_counters.totals(film.id, use_cache=False)["total_watch_time"],
+            "next_report_in": next_report_in()
+        }, status=status.HTTP_200_OK)
+
+
+# Playback sessions: start once, then heartbeat by session id (see playback.py)
+class PlaybackStartAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        viewer = request.user
+        film_id = request.data.get("film_id")
+
+        film = Film.objects.filter(id=film_id, status=FilmStatus.PUBLISHED).only("id", "filmmaker_id", "film_hls_url").first()
+        if not film:
+            return Response({"message": "Film not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if film.filmmaker_id == viewer.id:
+            return Response({"message": "Filmmakers cannot view their own films"}, status=status.HTTP_400_BAD_REQUEST)
+
+        session, deduplicated = playback.start(film.id, viewer.id)
+        counts = film_counters.totals(film.id, use_cache=not deduplicated)
+        # the full film stream is only released to owners / active renters (cached, see entitlements.py)
+        can_watch = entitlements.can_watch(viewer, film)
+        return Response({
+            "message": "Playback started",
+            "session_id": playback.session_id(session),
+            "deduplicated": deduplicated,
+            "can_watch": can_watch,
+            "film_hls_url": film.film_hls_url if can_watch else None,
+            "unique_views": counts["unique_views"],
+            "total_views": counts["total_views"],
+            "next_report_in": next_report_in()
+        }, status=status.HTTP_200_OK if deduplicated else status.HTTP_201_CREATED)
+
+
+class PlaybackHeartbeatAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            session = playback.read_session_id(request.data.get("session_id", ""))
+            watch_time = int(request.data.get("watch_time", 0))
+        except signing.BadSignature:
+            return Response({"message": "Invalid or expired session"}, status=status.HTTP_400_BAD_REQUEST)
+        except (TypeError, ValueError):
+            return Response({"message": "watch_time must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if session.viewer_id != request.user.id:
+            return Response({"message": "Session belongs to another user"}, status=status.HTTP_403_FORBIDDEN)
+        if watch_time < 0:
+            return Response({"message": "watch_time must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not playback.record_watch_time(session, watch_time):
+            return Response({"message": "Session not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "message": "Watch time recorded",
+            "total_watch_time": film_counters.totals(session.film_id)["total_watch_time"],
+            "next_report_in": next_report_in()
+        }, status=status.HTTP_200_OK)
+
+
+# Signed playback tokens: one entitlement check, then DB-free verification (see playback_tokens.py)
+class PlaybackTokenAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        viewer = request.user
+        film = Film.objects.filter(id=request.data.get("film_id")).only(
+            "id", "filmmaker_id", "film_hls_url", "status"
+        ).first()
+        # films under review / rejected only stream to their filmmaker
+        if not film or (film.status != FilmStatus.PUBLISHED and film.filmmaker_id != viewer.id):
+            return Response({"message": "Film not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        rental_end = None
+        if film.filmmaker_id != viewer.id:
+            allowed, rental_end = entitlements.lookup(viewer, film)
+            if not allowed:
+                return Response({"message": "You don't own or rent this film"}, status=status.HTTP_403_FORBIDDEN)
+
+        token, expires = playback_tokens.issue(viewer.id, film.id, not_after=rental_end)
+        return Response({
+            "message": "Playback token issued",
+            "token": token,
+            "expires_at": expires,
+            "film_hls_url": film.film_hls_url
+        }, status=status.HTTP_201_CREATED)
+
+
+# Manifest / segment gatekeeper (e.g. nginx auth_request): no auth backend, no DB
+def verify_playback_token(request):
+    token = request.GET.get("token") or request.headers.get("X-Playback-Token", "")
+    try:
+        grant = playback_tokens.verify(token, film_id=request.GET.get("film_id"))
+    except playback_tokens.InvalidToken as e:
+        return JsonResponse({"message": str(e)}, status=403)
+
+    response = HttpResponse(status=204)
+    response["X-Playback-User"] = grant.user_id
+    response["X-Playback-Film"] = grant.film_id
+    response["X-Playback-Expires"] = str(grant.expires)
+    return response
+
+
+# Many playback events per request (mobile / TV clients flushing every ~30s)
+class TelemetryBatchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        events = request.data.get("events")
+        if not isinstance(events, list) or not events:
+            return Response({"message": "events must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_events = getattr(settings, "TELEMETRY_BATCH_MAX_EVENTS", 500)
+        if len(events) > max_events:
+            return Response({"message": f"At most {max_events} events per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = record_batch(request.user.id, events)
+        counts = Counter(r["status"] for r in results)
+        return Response({
+            "message": "Batch recorded",
+            "accepted": counts["accepted"],
+            "duplicates": counts["duplicate"],
+            "rejected": counts["error"],
+            "results": results,
+            "next_report_in": next_report_in()
         }, status=status.HTTP_200_OK)
 
 
 #
 class TrendingFilmsView(APIView):
     def get(self, request):
-        # Get top trending published films by views
-        trending_films = Film.objects.filter(status="PUBLISHED").order_by('-unique_views')[:10]
+        # Same payload for every user: served as cached JSON bytes (see feed_cache.py)
+        body = feed_cache.cached_feed("trending", self.build)
+        return HttpResponse(body, content_type="application/json")
 
-        trending_data = [
-            {
-                "id": f.id,
-                # "filmmaker": str(f.filmmaker),
-                "title": f.title,
-                "slug":f.slug,
-                "year": f.year,
-                "logline": f.logline,
-                "film_type": f.get_film_type_display(),
-                "genre": [g.name for g in f.genre.all()] if hasattr(f.genre, "all") else f.genre,
-                # "status": f.status,
-                "buy_price": f.buy_price,
-                "rent_price": f.rent_price,
-                # "unique_views": f.unique_views,
-                # "total_earning": f.total_earning,
-                "thumbnail": f.thumbnail.url if f.thumbnail else None,
-                "trailer_hls_url": f.trailer_hls_url,
-                # "release_date": f.created_at.date(),
-            }
-            for f in trending_films
-        ]
+    def build(self):
+        # Top published films by time-decayed play score (index range scan, see trending.py)
+        trending_films = trending.top_films(limit=10, fields=CARD_FIELDS)
 
-        return Response({
+        trending_data = film_cards(trending_films)
+
+        return {
             "status": "success",
             "message": "Trending films fetched successfully",
             "data": trending_data
-        })
+        }
 
 
 class LatestFilmsView(APIView):
     def get(self, request):
+        body = feed_cache.cached_feed("latest", self.build)
+        return HttpResponse(body, content_type="application/json")
+
+    def build(self):
         # Get latest published films by creation date
         latest_films = Film.objects.filter(status="PUBLISHED").order_by('-created_at')[:10]
+        latest_data = film_cards(latest_films)
 
-        latest_data = [
-            {
-                "id": f.id,
-                # "filmmaker": str(f.filmmaker),
-                "title": f.title,
-                "slug":f.slug,
-                "year": f.year,
-                "logline": f.logline,
-                "film_type": f.get_film_type_display(),
-                "genre": [g.name for g in f.genre.all()] if hasattr(f.genre, "all") else f.genre,
-                # "status": f.status,
-                "buy_price": f.buy_price,
-                "rent_price": f.rent_price,
-                # "unique_views": f.unique_views,
-                # "total_earning": f.total_earning,
-                "thumbnail": f.thumbnail.url if f.thumbnail else None,
-                "trailer_hls_url": f.trailer_hls_url,
-                # "release_date": f.created_at.date(),
-            }
-            for f in latest_films
-        ]
-
-        return Response({
+        return {
             "status": "success",
             "message": "Latest films fetched successfully",
             "data": latest_data
-        })
+        }
 
 
 
@@ -423,12 +507,8 @@ class LatestFilmsView(APIView):
 #         })
 
 
-# Pagination
-from rest_framework.pagination import PageNumberPagination
-class MyPagination(PageNumberPagination):
-    page_size = 10                   # default items per page
-    page_size_query_param = "page_size"  # frontend can set ?page_size=20
-    max_page_size = 100
+# Pagination (page numbers, or opt-in keyset cursors: ?pagination=cursor, see pagination.py)
+from .pagination import MyPagination
 
 from django.db.models import Q
 class MyTitlesView(APIView):
@@ -437,14 +517,18 @@ class MyTitlesView(APIView):
     def get(self, request):
         user = request.user
         # print(user)
-        my_titles = Film.objects.filter(filmmaker=user).order_by("-created_at")
+        my_titles = Film.objects.filter(filmmaker=user).order_by("-created_at", "-id")  # id breaks ties
 
-        # ---- Stats ----
+        # ---- Stats (views / earning from the daily rollups) ----
+        totals = FilmDailyStats.objects.filter(film__filmmaker=user).aggregate(
+            views=Sum("plays"),
+            earning=Sum(F("buy_earning") + F("rent_earning")),
+        )
         stats = {
             "total_films": my_titles.count(),
             "published_films": my_titles.filter(status__iexact="published").count(),
-            "total_views": my_titles.aggregate(Sum("total_views"))["total_views__sum"] or 0,
-            "total_earning": my_titles.aggregate(Sum("total_earning"))["total_earning__sum"] or 0,
+            "total_views": totals["views"] or 0,
+            "total_earning": totals["earning"] or 0,
         }
 
         # ---- Filters ----
@@ -459,15 +543,16 @@ class MyTitlesView(APIView):
             my_titles = my_titles.filter(Q(title__icontains=search_param))
 
         # ---- Pagination ----
-        paginator = MyPagination()
+        paginator = MyPagination(ordering=("-created_at", "-id"))
         result_page = paginator.paginate_queryset(my_titles, request)
+        live = film_counters.totals_for_films([t.id for t in result_page])
 
         data = [
             {
                 "title": t.title,
                 "status": t.get_status_display(),
                 "film_type": t.get_film_type_display(),
-                "views": t.total_views,
+                "views": live.get(t.id, {}).get("total_views", t.total_views),
                 "total_earning": t.total_earning
             }
             for t in result_page
@@ -535,50 +620,40 @@ class MyTitlesAnalyticsView(APIView):
         if not film:
             return Response({"message": "Film not found"}, status=404)
         
-        today = date.today()
-
-        # ---- 1. Totals from Film table ----
-        total_views = film.total_views
-        unique_viewers = film.unique_views
+        # ---- 1. Totals from Film table (+ unfolded counter shards) ----
+        counts = film_counters.totals(film.id)
+        total_views = counts["total_views"]
+        unique_viewers = counts["unique_views"]
         total_earning = film.total_earning
-        total_watch_time = film.total_watch_time
-
-        # ---- 2. Daily Views (last 7 days) ----
-        daily_views = []
-        for i in range(7):
-            day = today - timedelta(days=i)
-            day_views = FilmPlayView.objects.filter(
-                film=film,
-                viewed_at__date=day
-            ).count()
-            daily_views.append({
-                "date": day.strftime("%Y-%m-%d"),
-                "views": day_views
-            })
-        daily_views.reverse()  # so oldest day is first
-
-        # ---- 3. Weekly Earnings (last 7 weeks) ----
-        weekly_earnings = []
-        for i in range(7):
-            week_start = today - timedelta(days=today.weekday() + i * 7)
-            week_end = week_start + timedelta(days=6)
-            week_earning = Transaction.objects.filter(
-                film=film,
-                tx_type__in=["purchase", "rent"],
-                created_at__date__gte=week_start,
-                created_at__date__lte=week_end
-            ).aggregate(total=Sum("amount"))["total"] or 0
-            weekly_earnings.append({
-                "week_start": week_start.strftime("%Y-%m-%d"),
-                "week_end": week_end.strftime("%Y-%m-%d"),
-                "earning": float(week_earning)
-            })
-        weekly_earnings.reverse()  # so oldest week is first
+        total_watch_time = counts["total_watch_time"]
+
+        # optional chart windows: ?days=30&weeks=12
+        days = self._window(request, "days", 7, 366)
+        weeks = self._window(request, "weeks", 7, 104)
+
+        # ---- 2. Daily Views (last N days, one GROUP BY) ----
+        daily_views = [
+            {"date": p["start"].strftime("%Y-%m-%d"), "views": p["views"]}
+            for p in analytics.views_by_period(film, count=days, granularity="day")
+        ]
+
+        # ---- 3. Weekly Earnings (last N weeks, one GROUP BY) ----
+        weekly_earnings = [
+            {
+                "week_start": p["start"].strftime("%Y-%m-%d"),
+                "week_end": (p["end"] - timedelta(days=1)).strftime("%Y-%m-%d"),
+                "earning": float(p["earning"]),
+            }
+            for p in analytics.earnings_by_period(film, count=weeks, granularity="week")
+        ]
 
         # ---- 4. Average Watch Time per view ----
         average_watch_time = total_watch_time / total_views if total_views else 0
 
-        # ---- 5. Revenue Breakdown ----
+        # ---- 5. Unique viewers in the last 7 / 30 days (HyperLogLog estimates) ----
+        recent_viewers = analytics.unique_viewers(film, windows=(7, 30))
+
+        # ---- 6. Revenue Breakdown ----
         total_buy_earning = film.total_buy_earning
         total_rent_earning = film.total_rent_earning
 
@@ -587,6 +662,8 @@ class MyTitlesAnalyticsView(APIView):
             "total_views": total_views,
             "total_earning": float(total_earning),
             "unique_viewers": unique_viewers,
+            "unique_viewers_last_7_days": recent_viewers[7],
+            "unique_viewers_last_30_days": recent_viewers[30],
             "daily_views": daily_views,
             "weekly_earnings": weekly_earnings,
             "average_watch_time_seconds": round(average_watch_time, 2),
@@ -594,6 +671,13 @@ class MyTitlesAnalyticsView(APIView):
             "total_rent_earning": float(total_rent_earning)
         })
 
+    def _window(self, request, name, default, maximum):
+        try:
+            value = int(request.query_params.get(name, default))
+        except (TypeError, ValueError):
+            value = default
+        return min(max(value, 1), maximum)
+
 
 # -------------------------------------M.Alom----------------------------------
 # Search Api
@@ -601,21 +685,17 @@ class GlobalSearchListView(APIView):
     def get(self, request):
         search_param = request.GET.get("search", "").strip()
 
-        # Only search published films
-        films_qs = Film.objects.filter(
-            Q(title__icontains=search_param),
-            status__iexact="published"
-        )[:10]
-
-
-        if films_qs.exists():
+        # Only search published films: ranked prefix search over the in-process
+        # index (title / genres / logline), no table scan (see search.py)
+        if search_param:
             data = [
-                {
-                    "id": film.id,
-                    "title": film.title,
-                }
-                for film in films_qs
+                {"id": film_id, "title": title}
+                for film_id, title in search.get_index().search(search_param, limit=10)
             ]
+        else:
+            data = list(Film.objects.filter(status__iexact="published").values("id", "title")[:10])
+
+        if data:
             return Response({
                 "status": "success",
                 "message": "Search films fetched successfully",
@@ -630,29 +710,18 @@ class GlobalSearchListView(APIView):
 
 
 # -------------------------------------M.Alom----------------------------------
-# My Library
-from .models import MyFilms
-from django.utils import timezone
-
+# My Library (read model in library.py)
 class MyLibraryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        now = timezone.now()
-
-        # ---- Auto-expire rentals ----
-        MyFilms.objects.filter(
-            user=user, access_type="Rent", end_date__lt=now, status="active"
-        ).update(status="expired")
 
-        my_library = MyFilms.objects.filter(user=user, status__iexact="active").order_by("-start_date")
+        # rentals past their end_date are left out at read time (no UPDATE on GET)
+        my_library = library.library_queryset(user)
 
-        # ---- Stats ---- (only active)
-        stats = {
-            "total_buy": my_library.filter(access_type__iexact="Buy", status__iexact="active").count(),
-            "total_rent": my_library.filter(access_type__iexact="Rent", status__iexact="active").count(),
-        }
+        # ---- Stats ---- (only active, one conditional aggregate)
+        stats = library.library_stats(my_library)
 
         # ---- Filters ----
         access_type_param = request.GET.get("access_type")
@@ -664,35 +733,10 @@ class MyLibraryView(APIView):
         if search_param:
             my_library = my_library.filter(film__title__icontains=search_param)
 
-        # ---- Pagination ----
-        paginator = MyPagination()
-        result_page = paginator.paginate_queryset(my_library, request)
-
-        data = []
-        for t in result_page:
-            # Get last watched record for this user & film
-            last_film_view = FilmView.objects.filter(film=t.film, viewer=user).first()
-            current_watch_time = last_film_view.current_watch_time if last_film_view else 0
-
-            full_duration = t.film.full_film_duration or 1  # avoid division by zero
-            progress_percent = round((current_watch_time / full_duration) * 100, 2)
-            # cap at 100%
-            if progress_percent > 100:
-                progress_percent = 100.0
-
-            data.append({
-                "film_id": t.film.id,
-                "title": t.film.title,
-                "film_type": t.film.get_film_type_display(),
-                "full_film_duration": t.film.full_film_duration,
-                "access_type": "Purchase" if t.access_type == "Buy" else "Rented",
-                "status": t.status,
-                "expiry_time": t.end_date if t.access_type == "Rent" else None,
-                "thumbnail": t.film.thumbnail.url if t.film.thumbnail else None,
-                "film_hls_url": None if t.status == "Expired" else t.film.film_hls_url,
-                "watch_progress": progress_percent,
-                "current_watch_time":current_watch_time
-            })
+        # ---- Pagination ---- (film columns + watch progress in the page query)
+        paginator = MyPagination(ordering=("-start_date", "-id"))
+        result_page = paginator.paginate_queryset(library.with_watch_progress(my_library, user), request)
+        data = [library.library_entry(t) for t in result_page]
 
         # return paginator.get_paginated_response({
         #     "status": "success",
@@ -702,7 +746,7 @@ class MyLibraryView(APIView):
         # })
         
         return Response({
-            "count": paginator.page.paginator.count,
+            "count": paginator.get_count(),
             "next": paginator.get_next_link(),
             "previous": paginator.get_previous_link(),
             "status": "success",
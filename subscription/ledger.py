@@ -0,0 +1,174 @@
+"""
+Wallet ledger engine.
+
+Collect wallet movements and `Transaction` rows on a `Ledger`, then `commit()`
+applies them as one atomic unit:
+
+  1. lock every touched wallet (SELECT ... FOR UPDATE ordered by user_id, so
+     two ledgers touching the same wallets can never deadlock),
+  2. check debits against the locked balances,
+  3. ONE UPDATE with F() increments for all wallets (no read-modify-write),
+  4. ONE bulk_create for all ledger rows.
+
+`FilmSale` is the buy/rent revenue split (filmmaker 70%, affiliate 20% when
+referred, platform the rest) shared by the ReelBux / Stripe / PayPal paths.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from movie.models import Film
+from .models import Wallet, Transaction
+
+CENT = Decimal("0.01")
+FILMMAKER_RATE = Decimal("0.70")
+AFFILIATE_RATE = Decimal("0.20")
+
+BALANCE_FIELDS = {
+    "reelbux": "reel_bux_balance",
+    "distro": "distro_balance",
+}
+
+Split = namedtuple("Split", "filmmaker affiliate platform")
+
+
+class PreconditionFailed(Exception):
+    """The `precondition` passed to Ledger.commit() returned False."""
+
+
+class InsufficientBalance(Exception):
+    def __init__(self, user_id, balance_type):
+        super().__init__(f"Insufficient {balance_type} balance")
+        self.user_id = user_id
+        self.balance_type = balance_type
+
+
+def split_revenue(amount, with_affiliate=False):
+    """Filmmaker / affiliate / platform shares of `amount`, in cents, summing to `amount`."""
+    amount = Decimal(amount).quantize(CENT)
+    filmmaker = (amount * FILMMAKER_RATE).quantize(CENT)
+    affiliate = (amount * AFFILIATE_RATE).quantize(CENT) if with_affiliate else Decimal("0.00")
+    return Split(filmmaker, affiliate, amount - filmmaker - affiliate)
+
+
+def _user_id(user):
+    return getattr(user, "pk", user)
+
+
+class Ledger:
+    def __init__(self):
+        self.movements = defaultdict(Decimal)  # (user_id, balance_type) -> delta
+        self.debits = defaultdict(Decimal)     # (user_id, balance_type) -> amount that must be covered
+        self.transactions = []
+
+    def record(self, user, amount, **tx_fields):
+        """A ledger row without a wallet movement (e.g. a card payment)."""
+        self.transactions.append(Transaction(user_id=_user_id(user), amount=amount, **tx_fields))
+
+    def credit(self, user, balance_type, amount, **tx_fields):
+        self.movements[(_user_id(user), balance_type)] += Decimal(amount)
+        self.record(user, amount, balance_type=balance_type, **tx_fields)
+
+    def debit(self, user, balance_type, amount, **tx_fields):
+        """Take `amount` from the wallet; commit() raises InsufficientBalance if it is not covered."""
+        self.movements[(_user_id(user), balance_type)] -= Decimal(amount)
+        self.debits[(_user_id(user), balance_type)] += Decimal(amount)
+        self.record(user, amount, balance_type=balance_type, **tx_fields)
+
+    def apply(self):
+        """Hook for extra writes in the same atomic unit (see FilmSale)."""
+
+    def commit(self, precondition=None):
+        """
+        Apply everything atomically. Returns {user_id: Wallet} with the new balances.
+        `precondition()` runs once the wallets are locked (e.g. "buyer doesn't own
+        the film yet"); if it returns False nothing is written and
+        PreconditionFailed is raised.
+        """
+        with transaction.atomic():
+            wallets = self._lock_wallets(sorted({user_id for user_id, _ in self.movements}))
+            if precondition is not None and not precondition():
+                raise PreconditionFailed()
+
+            for (user_id, balance_type), amount in self.debits.items():
+                if getattr(wallets[user_id], BALANCE_FIELDS[balance_type]) < amount:
+                    raise InsufficientBalance(user_id, balance_type)
+
+            updates = defaultdict(list)
+            for (user_id, balance_type), delta in self.movements.items():
+                if delta:
+                    field = BALANCE_FIELDS[balance_type]
+                    updates[field].append(When(user_id=user_id, then=F(field) + delta))
+                    setattr(wallets[user_id], field, getattr(wallets[user_id], field) + delta)
+            if updates:
+                Wallet.objects.filter(user_id__in=list(wallets)).update(
+                    updated_at=timezone.now(),
+                    **{
+                        field: Case(*whens, default=F(field), output_field=Wallet._meta.get_field(field))
+                        for field, whens in updates.items()
+                    },
+                )
+
+            Transaction.objects.bulk_create(self.transactions)
+            self.apply()
+        return wallets
+
+    def _lock_wallets(self, user_ids):
+        if not user_ids:
+            return {}
+        wallets = {w.user_id: w for w in Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by("user_id")}
+        missing = [user_id for user_id in user_ids if user_id not in wallets]
+        if missing:
+            Wallet.objects.bulk_create([Wallet(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+            wallets.update(
+                (w.user_id, w)
+                for w in Wallet.objects.select_for_update().filter(user_id__in=missing).order_by("user_id")
+            )
+        return wallets
+
+
+class FilmSale(Ledger):
+    """
+    One buy (`access="buy"`) or rent (`access="rent"`) of `film`: shares of
+    `net_amount` (default `amount`) go to the filmmaker, the referrer and the
+    platform; the film's earning totals and daily rollup move in the same unit.
+    The buyer's own debit/record is added by the caller.
+    """
+
+    def __init__(self, film, access, source, txn_id, amount, platform_user, referrer=None, net_amount=None):
+        super().__init__()
+        self.film = film
+        self.access = access
+        self.amount = Decimal(amount)
+        self.split = split_revenue(self.amount if net_amount is None else net_amount, with_affiliate=referrer is not None)
+
+        common = {"film": film, "source": source, "status": "completed"}
+        if referrer is not None:
+            self.credit(
+                referrer, "distro", self.split.affiliate, tx_type="commission", txn_id=f"aff_{txn_id}",
+                description=f"Affiliate commission for film {film.title}", **common,
+            )
+        if film.filmmaker_id:
+            self.credit(
+                film.filmmaker_id, "reelbux", self.split.filmmaker, tx_type="filmmaker_earning", txn_id=f"maker_{txn_id}",
+                description=f"Earning for film {film.title}", **common,
+            )
+        self.credit(
+            platform_user, "reelbux", self.split.platform, tx_type="platform_earning", txn_id=f"platform_{txn_id}",
+            description=f"Platform earning for film {film.title}", **common,
+        )
+
+    def apply(self):
+        from movie import rollups
+
+        earning = self.split.filmmaker
+        Film.objects.filter(pk=self.film.pk).update(**{
+            "total_earning": F("total_earning") + earning,
+            f"total_{self.access}_earning": F(f"total_{self.access}_earning") + earning,
+        })
+        rollups.record_sale(
+            self.film.pk, self.access, amount=self.amount, earning=earning, commission=self.split.affiliate
+        )
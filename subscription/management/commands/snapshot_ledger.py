@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from subscription import snapshots
+
+
+class Command(BaseCommand):
+    help = "Dump the Transaction ledger into memory-mappable column files for NumPy analytics (see subscription/snapshots.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=None, help="Snapshot root (default: LEDGER_SNAPSHOT_DIR).")
+        parser.add_argument("--keep", type=int, default=None, help="Snapshots to keep (default: LEDGER_SNAPSHOT_KEEP).")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Rows per DB fetch.")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        path = snapshots.build(opts["dir"], opts["keep"], opts["chunk_size"])
+        snapshot = snapshots.Snapshot(path)
+        self.stdout.write(
+            f"Snapshot {path}: {len(snapshot)} transaction(s) in {time.perf_counter() - started:.1f}s"
+        )
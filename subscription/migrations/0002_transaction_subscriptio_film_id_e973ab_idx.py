@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0008_filmplayview_movie_filmp_film_id_a688ac_idx'),
+        ('subscription', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['film', 'tx_type', 'created_at'], name='subscriptio_film_id_e973ab_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0012_keyset_pagination_indexes'),
+        ('subscription', '0002_transaction_subscriptio_film_id_e973ab_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['tx_type', 'created_at'], name='subscriptio_tx_type_ba8422_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['source', 'tx_type', 'created_at'], name='subscriptio_source_35e816_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0013_ledger_export_indexes'),
+        ('subscription', '0003_payments_overview_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at', 'id'], name='subscriptio_created_ee48a0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['requested_at', 'id'], name='subscriptio_request_087f9f_idx'),
+        ),
+    ]
@@ -82,6 +82,10 @@ class Transaction(models.Model):
             models.Index(fields=["tx_type"]),
             models.Index(fields=["balance_type"]),
             models.Index(fields=["film"]),  # optional, for faster film queries
+            models.Index(fields=["film", "tx_type", "created_at"]),  # per-film earnings ranges
+            models.Index(fields=["tx_type", "created_at"]),  # payments overview date ranges
+            models.Index(fields=["source", "tx_type", "created_at"]),  # ... filtered by payment method
+            models.Index(fields=["created_at", "id"]),  # ledger export (resume point)
         ]
 
     def __str__(self):
@@ -110,6 +114,9 @@ class Withdrawal(models.Model):
         verbose_name = "Withdrawal"
         verbose_name_plural = "Withdrawals"
         ordering = ["-requested_at"]
+        indexes = [
+            models.Index(fields=["requested_at", "id"]),  # ledger export (resume point)
+        ]
 
     def __str__(self):
         return f"Withdrawal {self.amount} by {self.user.email} ({self.status})"
@@ -1,3 +1,178 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from movie.models import Film, FilmDailyStats
+from movie.reelbux_for_film_purchase import FilmPurchaseReelBuxView
+from . import snapshots
+from .ledger import Ledger, InsufficientBalance, split_revenue
+from .models import Wallet, Transaction
 
 # Create your tests here.
+
+
+def make_user(email, **extra):
+    return User.objects.create_user(email=email, password="pass1234", full_name=email, terms_agreed=True, **extra)
+
+
+class LedgerTests(TestCase):
+    def test_split_always_adds_up_to_the_amount(self):
+        for amount in ("9.99", "0.01", "13.37", "100"):
+            for with_affiliate in (False, True):
+                split = split_revenue(amount, with_affiliate)
+                self.assertEqual(sum(split), Decimal(amount))
+
+    def test_failed_debit_writes_nothing(self):
+        buyer, seller = make_user("buyer@example.com"), make_user("seller@example.com")
+        Wallet.objects.create(user=buyer, reel_bux_balance=5)
+
+        ledger = Ledger()
+        ledger.debit(buyer, "reelbux", 10, source="reelbux", tx_type="purchase", status="completed")
+        ledger.credit(seller, "reelbux", 10, source="reelbux", tx_type="filmmaker_earning", status="completed")
+        with self.assertRaises(InsufficientBalance):
+            ledger.commit()
+
+        self.assertEqual(Wallet.objects.get(user=buyer).reel_bux_balance, 5)
+        self.assertFalse(Wallet.objects.filter(user=seller, reel_bux_balance__gt=0).exists())
+        self.assertFalse(Transaction.objects.exists())
+
+
+# Parallel purchases of one film all credit the same filmmaker / platform / affiliate wallets
+class LedgerConcurrencyTests(TransactionTestCase):
+    BUYERS = 8
+    PRICE = Decimal("10.00")
+
+    def setUp(self):
+        cache.clear()
+        self.filmmaker = make_user("maker@example.com")
+        self.platform = make_user("platform@example.com", is_platform=True)
+        self.affiliate = make_user("affiliate@example.com")
+        User.objects.filter(pk=self.affiliate.pk).update(distro_code="AFF123")
+        self.film = Film.objects.create(
+            filmmaker=self.filmmaker, title="Hot Release", status="PUBLISHED", film_type="MOVIE", buy_price=self.PRICE
+        )
+        self.buyers = [make_user(f"buyer{i}@example.com") for i in range(self.BUYERS)]
+        Wallet.objects.bulk_create(Wallet(user=buyer, reel_bux_balance=50) for buyer in self.buyers)
+
+    def buy(self, buyer, results):
+        factory = APIRequestFactory()
+        try:
+            while True:
+                request = factory.post("/", {"film_id": self.film.id, "distro_code": "AFF123"}, format="json")
+                force_authenticate(request, user=buyer)
+                # SQLite serializes writers by failing them ("database table is locked"): retry
+                try:
+                    response = FilmPurchaseReelBuxView.as_view()(request)
+                except OperationalError:
+                    continue
+                if response.status_code == 500 and "locked" in response.data.get("error", ""):
+                    continue
+                results.append(response.status_code)
+                return
+        finally:
+            connection.close()
+
+    def test_parallel_purchases_lose_no_updates(self):
+        results = []
+        threads = [threading.Thread(target=self.buy, args=(buyer, results)) for buyer in self.buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [201] * self.BUYERS)
+
+        split = split_revenue(self.PRICE, with_affiliate=True)
+        balances = {w.user_id: w for w in Wallet.objects.all()}
+        self.assertEqual(balances[self.filmmaker.id].reel_bux_balance, split.filmmaker * self.BUYERS)
+        self.assertEqual(balances[self.platform.id].reel_bux_balance, split.platform * self.BUYERS)
+        self.assertEqual(balances[self.affiliate.id].distro_balance, split.affiliate * self.BUYERS)
+        for buyer in self.buyers:
+            self.assertEqual(balances[buyer.id].reel_bux_balance, 50 - self.PRICE)
+
+        self.film.refresh_from_db()
+        self.assertEqual(self.film.total_buy_earning, split.filmmaker * self.BUYERS)
+        self.assertEqual(Transaction.objects.filter(film=self.film).count(), 4 * self.BUYERS)
+        self.assertEqual(FilmDailyStats.objects.get(film=self.film).buy_amount, self.PRICE * self.BUYERS)
+
+
+class LedgerSnapshotTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.filmmaker = make_user("maker@example.com")
+        self.buyer = make_user("buyer@example.com")
+        self.film = Film.objects.create(filmmaker=self.filmmaker, title="Snapshot", status="PUBLISHED")
+        for source, tx_type, amount in [
+            ("stripe", "purchase", "10.00"), ("stripe", "rent", "3.50"), ("paypal", "purchase", "12.00"),
+            ("reelbux", "purchase", "8.25"), ("stripe", "fund", "50.00"),
+        ]:
+            Transaction.objects.create(
+                user=self.buyer, film=None if tx_type == "fund" else self.film, source=source, tx_type=tx_type,
+                amount=Decimal(amount), status="completed",
+            )
+
+    def test_columns_round_trip_through_memmap(self):
+        snapshots.build(self.root, chunk=2)
+        snap = snapshots.Snapshot.open(self.root)
+        self.assertEqual(len(snap), 5)
+        self.assertIsInstance(snap["amount"], np.memmap)
+        self.assertEqual(int(snap["amount"].sum()), 8375)
+        self.assertEqual(snap.decode("user", snap["user"][0]), self.buyer.id)
+        self.assertEqual(snap.decode("filmmaker", snap["filmmaker"][-1]), None)  # a fund has no film
+
+    def test_group_by_matches_the_orm(self):
+        snapshots.build(self.root)
+        snap = snapshots.Snapshot.open(self.root)
+        sales = snap.where(tx_type=["purchase", "rent"])
+        today = timezone.localdate(Transaction.objects.first().created_at)
+
+        by_source = snap.group_sum(["day", "source"], mask=sales)
+        self.assertEqual(by_source, {(today, "paypal"): 1200, (today, "reelbux"): 825, (today, "stripe"): 1350})
+        self.assertEqual(snap.group_count("tx_type"), {"fund": 1, "purchase": 3, "rent": 1})
+        self.assertEqual(snap.percentiles("filmmaker", (50,), mask=sales), {self.filmmaker.id: [912.5]})
+        self.assertFalse(snap.where(source="distro").any())
+
+    def test_empty_selection_groups_to_nothing(self):
+        snapshots.build(self.root)
+        snap = snapshots.Snapshot.open(self.root)
+        nothing = snap.where(tx_type="nope")
+
+        self.assertEqual(snap.group_sum("filmmaker", mask=nothing), {})
+        self.assertEqual(snap.group_count("filmmaker", mask=nothing), {})
+        self.assertEqual(snap.percentiles("filmmaker", (50,), mask=nothing), {})
+
+    def test_days_use_the_rollup_day_boundary(self):
+        from datetime import datetime
+
+        late = datetime(2026, 3, 1, 20, 30, tzinfo=dt_timezone.utc)  # already March 2nd in Dhaka (UTC+6)
+        Transaction.objects.update(created_at=late)
+        with self.settings(TIME_ZONE="Asia/Dhaka"):
+            snapshots.build(self.root)
+            snap = snapshots.Snapshot.open(self.root)
+            self.assertEqual(snap.group_count("day"), {timezone.localdate(late): 5})
+            self.assertEqual(timezone.localdate(late).isoformat(), "2026-03-02")
+
+    def test_old_snapshots_are_pruned(self):
+        for _ in range(3):
+            snapshots.build(self.root, keep=2)
+        self.assertEqual(len([n for n in os.listdir(self.root) if n != "LATEST"]), 2)
+        with self.settings(LEDGER_SNAPSHOT_KEEP=5):
+            latest = snapshots.build(self.root, keep=0)  # 0 is honoured, not the setting: only the new one stays
+        self.assertEqual(os.listdir(self.root).count(os.path.basename(latest)), 1)
+        self.assertEqual(len([n for n in os.listdir(self.root) if n != "LATEST"]), 1)
+        Transaction.objects.all().delete()
+        latest = snapshots.build(self.root, keep=2)
+        self.assertEqual(snapshots.Snapshot.open(self.root).path, latest)
+        self.assertEqual(snapshots.Snapshot.open(self.root).group_sum("source"), {})